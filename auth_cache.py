@@ -0,0 +1,89 @@
+"""
+API KEY CACHE
+Bounded LRU + TTL cache of api_key -> (user_id, email) for the auth hot path
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class ApiKeyCache:
+    """
+    Keeps recently seen API keys in memory so authenticated calls cost a
+    dict lookup. Unknown keys are cached too (negative caching, shorter TTL)
+    so a client hammering with a bad key does not hit the database either.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 300.0, negative_ttl: float = 30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    def get(self, api_key: str):
+        """Cached user tuple, None for a cached bad key, or _MISSING"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(api_key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._entries[api_key]
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(api_key)
+            if entry[0] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[0]
+
+    def put(self, api_key: str, user):
+        ttl = self.ttl if user is not None else self.negative_ttl
+        with self._lock:
+            self._entries[api_key] = (user, time.monotonic() + ttl)
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def lookup(self, api_key: str, loader):
+        """Return the cached user, calling loader(api_key) on a miss"""
+        user = self.get(api_key)
+        if user is _MISSING:
+            user = loader(api_key)
+            self.put(api_key, user)
+        return user
+
+    async def lookup_async(self, api_key: str, loader):
+        """lookup() for async handlers; loader is awaited on a miss"""
+        user = self.get(api_key)
+        if user is _MISSING:
+            user = await loader(api_key)
+            self.put(api_key, user)
+        return user
+
+    def invalidate(self, api_key: str):
+        with self._lock:
+            self._entries.pop(api_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            'size': len(self._entries),
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,358 @@
+"""
+AGENT RUNTIME
+Thousands of periodic DeFi agents multiplexed on one event loop
+
+Agents are entries in a hashed timer wheel, not tasks or threads: one
+driver wakes every `tick` seconds, takes the due entries from a single
+bucket and reschedules them. An idle agent is a DeFiYieldAgent holding a
+view of a shared index, plus one small entry in the wheel.
+
+Each agent fires every `interval` seconds, stretched or shortened by up
+to `jitter` of it, and its first scan comes at a random point within
+`jitter` * `interval` of spawning, so agents started together drift
+apart rather than all scanning on the same boundary.
+
+Data is shared twice over. Each protocol has one ProtocolFeed: an agent
+that fires reuses the last fetch if it is younger than `max_age`, or
+joins the fetch already in flight, so upstream load is at most one
+request per protocol per `max_age`, however many agents watch it; each
+fetch is recorded in the APY history once. Agents watching the same set
+of protocols form a WatchGroup with one YieldIndex, synced once per new
+fetch; each agent only diffs its own top-k view and publishes what
+changed.
+
+    async with AgentRuntime() as runtime:
+        for i in range(5000):
+            runtime.spawn(f"defi-{i}", protocols=['Aave', 'Compound'])
+        await runtime.wait_closed()
+"""
+import asyncio
+import logging
+import random
+import time
+from typing import Dict, FrozenSet, List, Optional
+
+import aiohttp
+
+from backend.agents.apy_history import ApyHistory, get_history
+from backend.agents.defi_agent import DeFiYieldAgent
+from backend.agents.defi_protocols import ProtocolAdapter, build_adapters, fetch_all
+from backend.agents.opportunity_buffer import OpportunityBuffer, get_buffer
+from backend.agents.yield_index import YieldIndex
+from backend.http_cache import HttpCache, get_cache
+
+logger = logging.getLogger(__name__)
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel: `size` buckets of `tick` seconds each. Scheduling
+    and cancelling are O(1); advancing visits only the buckets of the
+    ticks that passed. A deadline more than one turn away waits in its
+    bucket until its turn comes round.
+    """
+    __slots__ = ('tick', 'buckets', 'current', 'count')
+
+    def __init__(self, tick: float = 1.0, size: int = 512, now: float = 0.0):
+        self.tick = tick
+        self.buckets: List[list] = [[] for _ in range(size)]
+        self.current = int(now // tick)
+        self.count = 0
+
+    def schedule(self, entry, deadline: float):
+        """File `entry` (anything with a `tick` slot) under `deadline`; a past deadline fires on the next advance"""
+        if entry.tick is not None:
+            self.count -= 1
+        tick = max(int(deadline // self.tick), self.current)
+        entry.tick = tick
+        # The bucket keeps the tick it was filed under, so an entry that was
+        # cancelled or rescheduled since is recognised and dropped
+        self.buckets[tick % len(self.buckets)].append((tick, entry))
+        self.count += 1
+
+    def cancel(self, entry):
+        if entry.tick is not None:
+            entry.tick = None
+            self.count -= 1
+
+    def advance(self, now: float) -> list:
+        """Entries due by `now`, removed from the wheel"""
+        end = int(now // self.tick)
+        size = len(self.buckets)
+        due = []
+        for tick in range(self.current, min(end, self.current + size - 1) + 1):
+            bucket = self.buckets[tick % size]
+            if not bucket:
+                continue
+            keep = []
+            for filed, entry in bucket:
+                if entry.tick != filed:
+                    continue
+                if filed <= end:
+                    entry.tick = None
+                    due.append(entry)
+                else:
+                    keep.append((filed, entry))
+            self.buckets[tick % size] = keep
+        self.current = max(self.current, end + 1)
+        self.count -= len(due)
+        return due
+
+    def __len__(self):
+        return self.count
+
+
+class ProtocolFeed:
+    """One protocol's latest fetch, shared by every agent watching it and recorded once in `history`"""
+    __slots__ = ('adapter', 'history', 'yields', 'status', 'fetched_at', 'fetches', '_pending')
+
+    def __init__(self, adapter: ProtocolAdapter, history: ApyHistory):
+        self.adapter = adapter
+        self.history = history
+        self.yields: List[dict] = []
+        self.status: Optional[dict] = None
+        self.fetched_at = 0.0
+        self.fetches = 0
+        self._pending: Optional[asyncio.Task] = None
+
+    async def get(self, session: aiohttp.ClientSession, cache: Optional[HttpCache], max_age: float):
+        """Fetch unless the last result is younger than `max_age`; concurrent callers share one fetch"""
+        if self._pending is None and time.time() - self.fetched_at > max_age:
+            self._pending = asyncio.ensure_future(self._fetch(session, cache))
+        if self._pending is not None:
+            # Shielded: a caller that gives up doesn't cancel the others' fetch
+            await asyncio.shield(self._pending)
+
+    async def _fetch(self, session, cache):
+        try:
+            yields, statuses = await fetch_all(session, [self.adapter], cache)
+            self.status = statuses[self.adapter.name]
+            self.fetched_at = time.time()
+            if self.status['ok']:
+                self.yields = yields
+                self.history.add_many(yields, self.fetched_at)
+            self.fetches += 1
+        finally:
+            self._pending = None
+
+
+class WatchGroup:
+    """Agents watching the same protocols, and the one index they share"""
+    __slots__ = ('names', 'feeds', 'adapters', 'index', 'statuses', 'synced', 'agents')
+
+    def __init__(self, names: FrozenSet[str], feeds: List[ProtocolFeed]):
+        self.names = names
+        self.feeds = feeds
+        self.adapters = [feed.adapter for feed in feeds]
+        self.index = YieldIndex()
+        self.statuses: Dict[str, dict] = {}
+        self.synced: Dict[str, float] = {}
+        self.agents = 0
+
+    async def refresh(self, runtime: 'AgentRuntime'):
+        """Bring the index up to date with the feeds, fetching the stale ones first"""
+        await asyncio.gather(*(feed.get(runtime.session, runtime.http_cache, runtime.max_age) for feed in self.feeds))
+        statuses = {}
+        for feed in self.feeds:
+            name = feed.adapter.name
+            statuses[name] = feed.status
+            if self.synced.get(name) == feed.fetched_at:
+                continue
+            self.synced[name] = feed.fetched_at
+            # A protocol that failed keeps its last known pools
+            if feed.status['ok']:
+                self.index.sync(name, feed.yields)
+        self.statuses = statuses
+
+
+class Scheduled:
+    """An agent's place in the timer wheel"""
+    __slots__ = ('agent', 'group', 'interval', 'deadline', 'tick')
+
+    def __init__(self, agent: DeFiYieldAgent, group: WatchGroup, interval: float, deadline: float):
+        self.agent = agent
+        self.group = group
+        self.interval = interval
+        self.deadline = deadline
+        self.tick = None
+
+
+class AgentRuntime:
+    """
+    Runs periodic DeFiYieldAgents on the current event loop
+    Agents are created with spawn() and share the runtime's session,
+    HTTP cache, APY history, opportunity buffer (process-wide defaults)
+    and protocol adapters (every registered one by default).
+    """
+
+    def __init__(self, adapters: Optional[List[ProtocolAdapter]] = None, buffer: Optional[OpportunityBuffer] = None,
+                 http_cache: Optional[HttpCache] = None, history: Optional[ApyHistory] = None,
+                 session: Optional[aiohttp.ClientSession] = None, tick: float = 1.0, wheel_size: int = 512,
+                 jitter: float = 0.1, max_age: float = 60.0, seed: Optional[int] = None):
+        self.buffer = buffer if buffer is not None else get_buffer()
+        self.http_cache = http_cache if http_cache is not None else get_cache()
+        self.history = history if history is not None else get_history()
+        self.session = session
+        self._owns_session = session is None
+        self.feeds = {adapter.name: ProtocolFeed(adapter, self.history) for adapter in (adapters or build_adapters())}
+        self.groups: Dict[FrozenSet[str], WatchGroup] = {}
+        self.entries: Dict[str, Scheduled] = {}
+        self.tick = tick
+        self.wheel_size = wheel_size
+        self.wheel: Optional[TimerWheel] = None
+        self.jitter = jitter
+        self.max_age = max_age
+        self.random = random.Random(seed)
+        self.scans = 0
+        self.fired = 0
+        self.errors = 0
+        self.max_lateness = 0.0
+        self.busiest_tick = 0
+        self._tasks = set()
+        self._driver: Optional[asyncio.Task] = None
+
+    async def open(self):
+        """Create the shared session and start the driver; later calls are no-ops"""
+        if self._driver is not None:
+            return self
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(ttl_dns_cache=300))
+        now = asyncio.get_running_loop().time()
+        if self.wheel is None:
+            self.wheel = TimerWheel(self.tick, self.wheel_size, now)
+            # Agents spawned before the loop started hold their first delay
+            for entry in self.entries.values():
+                entry.deadline += now
+                self.wheel.schedule(entry, entry.deadline)
+        self._driver = asyncio.ensure_future(self._drive())
+        return self
+
+    async def close(self):
+        if self._driver is not None:
+            self._driver.cancel()
+            await asyncio.gather(self._driver, return_exceptions=True)
+            self._driver = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+        self.history.flush()
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def wait_closed(self):
+        """Block until the driver stops (close() or cancellation)"""
+        if self._driver is not None:
+            await asyncio.gather(self._driver, return_exceptions=True)
+
+    def _group(self, protocols: Optional[List[str]]) -> WatchGroup:
+        names = frozenset(protocols) if protocols else frozenset(self.feeds)
+        group = self.groups.get(names)
+        if group is None:
+            unknown = names - self.feeds.keys()
+            if unknown:
+                raise ValueError(f"Unknown protocols: {', '.join(sorted(unknown))}")
+            group = self.groups[names] = WatchGroup(names, [self.feeds[name] for name in sorted(names)])
+        return group
+
+    def spawn(self, agent_id: str, protocols: Optional[List[str]] = None, interval: float = 300.0,
+              top_k: int = 10) -> DeFiYieldAgent:
+        """Create and schedule an agent watching `protocols` (all of them by default)"""
+        if agent_id in self.entries:
+            raise ValueError(f"Agent {agent_id} already exists")
+        group = self._group(protocols)
+        agent = DeFiYieldAgent(agent_id, buffer=self.buffer, adapters=group.adapters, session=self.session,
+                               scan_seconds=interval, http_cache=self.http_cache, top_k=top_k,
+                               history=self.history, index=group.index)
+        agent._owns_session = False
+        group.agents += 1
+        now = asyncio.get_running_loop().time() if self.wheel is not None else 0.0
+        entry = self.entries[agent_id] = Scheduled(agent, group, interval,
+                                                   now + self.random.uniform(0, self.jitter * interval))
+        if self.wheel is not None:
+            self.wheel.schedule(entry, entry.deadline)
+        return agent
+
+    def remove(self, agent_id: str) -> bool:
+        entry = self.entries.pop(agent_id, None)
+        if entry is None:
+            return False
+        entry.agent.running = False
+        if self.wheel is not None:
+            self.wheel.cancel(entry)
+        entry.group.agents -= 1
+        if not entry.group.agents:
+            del self.groups[entry.group.names]
+        return True
+
+    async def _drive(self):
+        loop = asyncio.get_running_loop()
+        wheel = self.wheel
+        while True:
+            now = loop.time()
+            due = wheel.advance(now)
+            if due:
+                self._dispatch(due, now)
+            await asyncio.sleep(wheel.tick - now % wheel.tick)
+
+    def _dispatch(self, due: List[Scheduled], now: float):
+        by_group: Dict[FrozenSet[str], list] = {}
+        # Counted by scheduled tick: a late driver catching up several
+        # ticks at once is not a herd
+        per_tick: Dict[int, int] = {}
+        for entry in due:
+            tick = int(entry.deadline // self.tick)
+            per_tick[tick] = per_tick.get(tick, 0) + 1
+            by_group.setdefault(entry.group.names, []).append((entry.agent, entry.deadline))
+            # The next deadline follows the schedule, not the (possibly late) firing
+            entry.deadline += entry.interval * self.random.uniform(1 - self.jitter, 1 + self.jitter)
+            if entry.deadline <= now:
+                entry.deadline = now + entry.interval * self.random.uniform(0, self.jitter)
+            self.wheel.schedule(entry, entry.deadline)
+        self.fired += len(due)
+        self.busiest_tick = max(self.busiest_tick, max(per_tick.values()))
+        for names, agents in by_group.items():
+            task = asyncio.ensure_future(self._scan(self.groups.get(names), agents))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _scan(self, group: Optional[WatchGroup], agents: list):
+        """Refresh the group once, then let each due agent publish its changes"""
+        if group is None:
+            return
+        try:
+            await group.refresh(self)
+        except Exception:
+            logger.exception("Refreshing %s failed", ', '.join(sorted(group.names)))
+            self.errors += 1
+            return
+        self.scans += 1
+        loop = asyncio.get_running_loop()
+        for agent, deadline in agents:
+            if not agent.running:
+                continue
+            agent.last_scan = group.statuses
+            try:
+                agent.publish()
+            except Exception:
+                logger.exception("%s publish failed", agent.agent_id)
+                self.errors += 1
+            self.max_lateness = max(self.max_lateness, loop.time() - deadline)
+
+    def stats(self):
+        return {
+            'agents': len(self.entries),
+            'groups': len(self.groups),
+            'scheduled': len(self.wheel) if self.wheel is not None else 0,
+            'fired': self.fired,
+            'scans': self.scans,
+            'errors': self.errors,
+            'max_lateness': self.max_lateness,
+            'busiest_tick': self.busiest_tick,
+            'fetches': {name: feed.fetches for name, feed in self.feeds.items()},
+        }
@@ -0,0 +1,321 @@
+"""
+APY HISTORY
+Fixed-memory APY time series per (protocol, asset), memory-mapped on disk
+
+Each series gets a preallocated slot in every tier:
+
+    raw  the last `raw_len` samples (ts, apy)
+    1h   the last `hourly_len` hours (ts, mean, min, max)
+    1d   the last `daily_len` days, likewise
+
+Samples are only written to raw; hourly and daily buckets accumulate in
+the series' state and are written out when a sample lands in the next
+bucket. The state row also carries the rolling statistics, updated on
+every insert in O(1): mean and volatility over the last `window` raw
+samples (running sums, shifted by the series' first value for
+precision), and an EWMA and EW volatility with a `halflife` in seconds.
+All the series of one scan are updated together, column-wise.
+
+With `path`, every array is an np.memmap in that directory (plus a small
+meta.json naming the series), so reopening after a restart maps the
+history back instead of reloading it; without, it lives in memory.
+
+    history = ApyHistory('.apy_history')
+    history.add_many(yields, ts=time.time())
+    history.stats('Aave', 'USDC')   # {'mean': ..., 'volatility': ..., 'zscore': ...}
+"""
+import json
+import math
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+HISTORY_DIR = os.environ.get('APEX_APY_HISTORY_DIR', '.apy_history')
+
+HOUR, DAY = 3600.0, 86400.0
+
+# Columns of the per-series state row
+(COUNT, SHIFT, WIN_SUM, WIN_SQ, EWMA, EWVAR, LAST_TS, LAST,
+ H_COUNT, H_START, H_SUM, H_MIN, H_MAX, H_N,
+ D_COUNT, D_START, D_SUM, D_MIN, D_MAX, D_N) = range(20)
+STATE_FIELDS = 20
+
+# Downsampled tier values
+MEAN, MIN, MAX = range(3)
+
+SeriesKey = Tuple[str, str]
+
+
+class ApyHistory:
+    """Raw, hourly and daily APY tiers plus rolling statistics for many series"""
+
+    def __init__(self, path: Optional[str] = None, capacity: int = 256, raw_len: int = 576, hourly_len: int = 720,
+                 daily_len: int = 365, window: int = 288, halflife: float = 6 * HOUR):
+        self.path = path
+        meta = _read_meta(path) if path else None
+        if meta is not None:
+            # An existing store keeps the shape it was created with
+            raw_len, hourly_len, daily_len = meta['raw_len'], meta['hourly_len'], meta['daily_len']
+            window, halflife, capacity = meta['window'], meta['halflife'], meta['capacity']
+        self.raw_len = raw_len
+        self.hourly_len = hourly_len
+        self.daily_len = daily_len
+        self.window = min(window, raw_len)
+        self.halflife = halflife
+        self._tau = halflife / math.log(2)
+        self.keys: List[SeriesKey] = [tuple(k) for k in meta['keys']] if meta else []
+        self._ids: Dict[SeriesKey, int] = {k: i for i, k in enumerate(self.keys)}
+        self._saved = len(self.keys)
+        self.capacity = 0
+        self._allocate(capacity)
+
+    # Storage
+
+    def _layout(self):
+        return {
+            'state': (np.float64, (STATE_FIELDS,)),
+            'raw_ts': (np.float64, (self.raw_len,)),
+            'raw_apy': (np.float32, (self.raw_len,)),
+            'hour_ts': (np.float64, (self.hourly_len,)),
+            'hour': (np.float32, (self.hourly_len, 3)),
+            'day_ts': (np.float64, (self.daily_len,)),
+            'day': (np.float32, (self.daily_len, 3)),
+        }
+
+    def _allocate(self, capacity: int):
+        """Grow every array to `capacity` series; on disk the files are extended in place"""
+        for name, (dtype, shape) in self._layout().items():
+            old = getattr(self, name, None)
+            if self.path:
+                os.makedirs(self.path, exist_ok=True)
+                file = os.path.join(self.path, f"{name}.bin")
+                if old is not None:
+                    old.flush()
+                with open(file, 'ab') as f:
+                    # Rows are contiguous, so new series are appended at the end
+                    f.truncate(capacity * int(np.prod(shape)) * np.dtype(dtype).itemsize)
+                array = np.memmap(file, dtype=dtype, mode='r+', shape=(capacity,) + shape)
+            else:
+                array = np.zeros((capacity,) + shape, dtype=dtype)
+                if old is not None:
+                    array[:self.capacity] = old
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def series_id(self, protocol: str, asset: str) -> int:
+        key = (protocol, asset)
+        sid = self._ids.get(key)
+        if sid is None:
+            sid = self._ids[key] = len(self.keys)
+            self.keys.append(key)
+            if sid >= self.capacity:
+                self._allocate(max(2 * self.capacity, sid + 1))
+        return sid
+
+    def flush(self):
+        """Write mapped pages and the series list; a no-op in memory"""
+        if not self.path:
+            return
+        for name in self._layout():
+            getattr(self, name).flush()
+        self._write_meta()
+
+    def _write_meta(self):
+        meta = {
+            'version': 1,
+            'capacity': self.capacity,
+            'raw_len': self.raw_len,
+            'hourly_len': self.hourly_len,
+            'daily_len': self.daily_len,
+            'window': self.window,
+            'halflife': self.halflife,
+            'keys': self.keys,
+        }
+        tmp = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, 'meta.json'))
+        self._saved = len(self.keys)
+
+    close = flush
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Inserting
+
+    def add(self, protocol: str, asset: str, apy: float, ts: Optional[float] = None) -> bool:
+        return self.add_many([{'protocol': protocol, 'asset': asset, 'apy': apy}], ts) == 1
+
+    def add_many(self, yields: Iterable[dict], ts: Optional[float] = None) -> int:
+        """
+        One scan's yields ({'protocol', 'asset', 'apy'}), all stamped `ts`;
+        returns how many were recorded. A series takes one sample per
+        timestamp (the last given) and ignores samples older than its latest.
+        """
+        samples = {}
+        for y in yields:
+            apy = y['apy']
+            if math.isfinite(apy):
+                samples[self.series_id(y['protocol'], y['asset'])] = apy
+        if not samples:
+            return 0
+        ids = np.fromiter(samples, dtype=np.int64, count=len(samples))
+        values = np.fromiter(samples.values(), dtype=np.float64, count=len(samples))
+        recorded = self._insert(ids, values, time.time() if ts is None else ts)
+        if self.path and len(self.keys) != self._saved:
+            # Samples reach the file through the mapping; new series names
+            # have to be written out or a crash would orphan their slots
+            self._write_meta()
+        return recorded
+
+    def _insert(self, ids: np.ndarray, v: np.ndarray, ts: float) -> int:
+        state = self.state
+        s = state[ids]
+        keep = (s[:, COUNT] == 0) | (ts > s[:, LAST_TS])
+        if not keep.all():
+            ids, v, s = ids[keep], v[keep], s[keep]
+        if not len(ids):
+            return 0
+        count = s[:, COUNT].astype(np.int64)
+        first = count == 0
+        s[first, SHIFT] = v[first]
+        s[first, EWMA] = v[first]
+
+        # Rolling window: add the new sample, drop the one leaving the window
+        L, W = self.raw_len, self.window
+        x = v - s[:, SHIFT]
+        leaving = count >= W
+        old = np.where(leaving, self.raw_apy[ids, (count - W) % L] - s[:, SHIFT], 0.0)
+        s[:, WIN_SUM] += x - old
+        s[:, WIN_SQ] += x * x - old * old
+        slot = count % L
+        self.raw_ts[ids, slot] = ts
+        self.raw_apy[ids, slot] = v
+
+        # Time-aware EWMA: a longer gap since the last sample weighs the new one more
+        dt = np.maximum(ts - s[:, LAST_TS], 0.0)
+        alpha = np.where(first, 1.0, -np.expm1(-dt / self._tau))
+        delta = v - s[:, EWMA]
+        s[:, EWMA] += alpha * delta
+        s[:, EWVAR] = (1.0 - alpha) * (s[:, EWVAR] + alpha * delta * delta)
+
+        self._bucket(ids, s, v, ts, HOUR, (H_COUNT, H_START, H_SUM, H_MIN, H_MAX, H_N), self.hour_ts, self.hour)
+        self._bucket(ids, s, v, ts, DAY, (D_COUNT, D_START, D_SUM, D_MIN, D_MAX, D_N), self.day_ts, self.day)
+
+        s[:, COUNT] += 1
+        s[:, LAST_TS] = ts
+        s[:, LAST] = v
+        # Re-sum each window exactly once per W inserts so float error can't accumulate
+        exact = (count + 1) % W == 0
+        if exact.any():
+            rows = np.nonzero(exact)[0]
+            positions = (count[rows, None] + 1 - W + np.arange(W)) % L
+            window = self.raw_apy[ids[rows, None], positions] - s[rows, SHIFT, None]
+            s[rows, WIN_SUM] = window.sum(axis=1)
+            s[rows, WIN_SQ] = (window * window).sum(axis=1)
+        state[ids] = s
+        return len(ids)
+
+    @staticmethod
+    def _bucket(ids, s, v, ts, size, columns, tier_ts, tier):
+        count, start, total, low, high, n = columns
+        bucket = math.floor(ts / size) * size
+        roll = (s[:, n] > 0) & (bucket > s[:, start])
+        if roll.any():
+            rows = np.nonzero(roll)[0]
+            slot = s[rows, count].astype(np.int64) % tier_ts.shape[1]
+            tier_ts[ids[rows], slot] = s[rows, start]
+            tier[ids[rows], slot] = np.stack([s[rows, total] / s[rows, n], s[rows, low], s[rows, high]], axis=1)
+            s[rows, count] += 1
+            s[rows, n] = 0
+        empty = s[:, n] == 0
+        s[empty, start] = bucket
+        s[empty, total] = 0.0
+        s[empty, low] = np.inf
+        s[empty, high] = -np.inf
+        s[:, total] += v
+        s[:, low] = np.minimum(s[:, low], v)
+        s[:, high] = np.maximum(s[:, high], v)
+        s[:, n] += 1
+
+    # Reading
+
+    def stats(self, protocol: str, asset: str) -> Optional[dict]:
+        """Rolling statistics for one series, None if it has no samples"""
+        sid = self._ids.get((protocol, asset))
+        if sid is None:
+            return None
+        # One conversion to Python floats beats a numpy scalar per field
+        s = self.state[sid].tolist()
+        if not s[COUNT]:
+            return None
+        n = min(int(s[COUNT]), self.window)
+        mean = s[WIN_SUM] / n
+        volatility = math.sqrt(max(s[WIN_SQ] / n - mean * mean, 0.0))
+        mean += s[SHIFT]
+        return {
+            'samples': int(s[COUNT]),
+            'last': s[LAST],
+            'mean': mean,
+            'volatility': volatility,
+            'ewma': s[EWMA],
+            'ew_volatility': math.sqrt(s[EWVAR]),
+            'zscore': (s[LAST] - mean) / volatility if volatility > 0 else 0.0,
+            'updated': s[LAST_TS],
+        }
+
+    def series(self, protocol: str, asset: str, tier: str = 'raw') -> Dict[str, np.ndarray]:
+        """
+        One tier of a series, oldest first: {'ts', 'apy'} for raw,
+        {'ts', 'mean', 'min', 'max'} for '1h' / '1d' (completed buckets only)
+        """
+        sid = self._ids.get((protocol, asset))
+        if tier == 'raw':
+            n = 0 if sid is None else int(self.state[sid, COUNT])
+            order = _ring_order(n, self.raw_len)
+            return {'ts': self.raw_ts[sid, order] if n else np.empty(0),
+                    'apy': self.raw_apy[sid, order] if n else np.empty(0, np.float32)}
+        count, tier_ts, values = {'1h': (H_COUNT, self.hour_ts, self.hour), '1d': (D_COUNT, self.day_ts, self.day)}[tier]
+        n = 0 if sid is None else int(self.state[sid, count])
+        order = _ring_order(n, tier_ts.shape[1])
+        rows = values[sid, order] if n else np.empty((0, 3), np.float32)
+        return {'ts': tier_ts[sid, order] if n else np.empty(0),
+                'mean': rows[:, MEAN], 'min': rows[:, MIN], 'max': rows[:, MAX]}
+
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self._layout())
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def _ring_order(count: int, length: int) -> np.ndarray:
+    """Slot indices of a ring holding `count` writes, oldest first"""
+    if count <= length:
+        return np.arange(count)
+    return (np.arange(length) + count) % length
+
+
+def _read_meta(path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+_history: Optional[ApyHistory] = None
+
+
+def get_history(**kwargs) -> ApyHistory:
+    """The process-wide store at HISTORY_DIR, opened on first use (kwargs apply only then)"""
+    global _history
+    if _history is None:
+        _history = ApyHistory(kwargs.pop('path', HISTORY_DIR), **kwargs)
+    return _history
@@ -3,45 +3,155 @@ CRYPTO ARBITRAGE AGENT
 Finds real arbitrage opportunities across exchanges
 NO AI needed - pure math and logic
 """
-import ccxt
+import aiohttp
 import asyncio
-from typing import List, Dict
+from functools import partial
+import logging
+from typing import List, Dict, Optional
 import time
 
+from backend.agents.depth import size_opportunity
+from backend.agents.market_cache import LazyExchange, MarketCache
+from backend.agents.market_stream import BookFeed, LatencyStats
+from backend.agents.opportunity_buffer import OpportunityBuffer, get_buffer
+from backend.agents.scan_scheduler import ScanScheduler
+from backend.agents.spread_matrix import SpreadMatrix
+from backend.agents.triangular import CurrencyGraph
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SYMBOLS = ['BTC/USDT', 'ETH/USDT']
+
+# (attribute, our name) - coinbasepro was renamed coinbaseexchange in ccxt 4
+EXCHANGES = [
+    ('binance', 'binance'),
+    ('coinbaseexchange', 'coinbase'),
+    ('kraken', 'kraken'),
+]
+
+
+def _ccxt_client(attr: str, session):
+    # Importing ccxt loads every exchange module (about a second), so wait until a client is needed
+    import ccxt.async_support as ccxt
+    return getattr(ccxt, attr)({'enableRateLimit': True, 'session': session})
+
+
+def build_exchanges(session, market_cache: Optional[MarketCache] = None):
+    """
+    Public-data ccxt clients for EXCHANGES, all on one aiohttp session
+    Each is built on first use, with its markets served from `market_cache`
+    """
+    cache = market_cache if market_cache is not None else MarketCache()
+    # Free public APIs - no keys needed for price data
+    return {name: LazyExchange(name, partial(_ccxt_client, attr, session), cache) for attr, name in EXCHANGES}
+
 class ArbitrageAgent:
     """
     Monitors multiple exchanges for price differences
     Finds profitable arbitrage opportunities
     Works 24/7 without AI
+
+    Exchange clients are async and share one pooled HTTP session, so use
+    the agent as `async with ArbitrageAgent(...) as agent:` (run() does
+    this itself). Pass `exchanges` to supply your own clients, e.g.
+    StubExchangeClient instances (benchmarks/stub_exchange) pointed at
+    a local stub server.
+
+    Tickers are fetched through a ScanScheduler: bulk requests where the
+    exchange supports them, rate-limited per exchange, and paced across
+    each `cycle_seconds` scan in run().
+
+    Top-of-book spreads are only a first filter: every candidate is then
+    walked against the order books on both sides, and only those with a
+    positive realized profit after taker fees and withdrawal survive,
+    carrying their executable `quantity` and `net_profit`.
+
+    find_triangular() looks for cycles within one exchange instead
+    (e.g. USDT -> ETH -> BTC -> USDT) over a persistent CurrencyGraph.
+
+    Clients are built lazily and load markets from a MarketCache on disk
+    (see market_cache), so a restart with warm metadata is near-instant.
+
+    With `hub` (a MarketDataHub, usually get_hub()) the agent owns no
+    clients: it shares the hub's, and run() takes snapshots from the hub
+    instead of polling, so a hundred agents cost one set of requests.
+
+    Set `recorder` to a TickRecorder to keep every scan and feed message
+    for offline replay (see backtest.Backtester).
+
+    Opportunities are published to `buffer` (the process-wide
+    OpportunityBuffer by default), which the API reads and streams; set
+    `console` to also print them.
     """
     
-    def __init__(self, agent_id: str):
+    def __init__(self, agent_id: str, exchanges: Optional[Dict] = None, symbols: Optional[List[str]] = None,
+                 cycle_seconds: float = 30.0, rate_limits: Optional[Dict[str, float]] = None, hub=None,
+                 market_cache: Optional[MarketCache] = None, buffer: Optional[OpportunityBuffer] = None):
         self.agent_id = agent_id
-        self.exchanges = self._init_exchanges()
+        self.hub = hub
+        self.market_cache = market_cache
+        self.exchanges = exchanges if exchanges is not None else {}
+        self._owns_exchanges = exchanges is None and hub is None
+        self.symbols = list(symbols or DEFAULT_SYMBOLS)
+        self.cycle_seconds = cycle_seconds
+        self.rate_limits = rate_limits
+        self.scheduler = None
+        self.session = None
+        self.min_profit_pct = 0.5  # net of taker fees, top of book
+        self.min_net_profit = 0.0  # quote currency, after walking the books
+        self.book_depth = 100
+        self.max_trade_qty = None
+        self.withdrawal_fees = {}  # {exchange: {currency: fee}}, overrides the client's
+        self._books = {}
+        self._graph = None
+        self.cycle_budget = 0.05  # seconds of Bellman-Ford per triangular scan
+        self.fee_overrides = {}  # {exchange: taker fee}, e.g. for backtests without clients
+        self.recorder = None  # TickRecorder for scans and feed messages
+        self.buffer = buffer if buffer is not None else get_buffer()
+        self.console = False  # print opportunities as well as publishing them
+        self._spreads = None
+        self._stream_matrix = None
+        self.signal_latency = LatencyStats()  # message received -> evaluated
+        self.event_latency = LatencyStats()   # exchange event time -> evaluated
         self.opportunities_found = 0
         self.running = True
+
+    async def open(self):
+        """Create the shared HTTP session and exchange clients"""
+        if self.hub is not None:
+            # Share the hub's clients and its scheduler's rate limits
+            await self.hub.open()
+            self.exchanges = self.hub.exchanges
+            self.scheduler = self.hub.scheduler
+        elif self._owns_exchanges and self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=10, ttl_dns_cache=300))
+            self.exchanges = self._init_exchanges()
+            self.scheduler = None
+        return self
+
+    def _get_scheduler(self):
+        if self.scheduler is None or self.scheduler.exchanges is not self.exchanges:
+            self.scheduler = ScanScheduler(self.exchanges, self.symbols, self.cycle_seconds, self.rate_limits)
+        return self.scheduler
+
+    async def close(self):
+        """Close the exchange clients and the session they share"""
+        if self._owns_exchanges:
+            await asyncio.gather(*(ex.close() for ex in self.exchanges.values()), return_exceptions=True)
+            self.exchanges = {}
+            if self.session is not None:
+                await self.session.close()
+                self.session = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
         
     def _init_exchanges(self):
         """Initialize exchange connections (testnet mode)"""
-        exchanges = {}
-        
-        # Free public APIs - no keys needed for price data
-        try:
-            exchanges['binance'] = ccxt.binance({'enableRateLimit': True})
-        except:
-            pass
-            
-        try:
-            exchanges['coinbase'] = ccxt.coinbasepro({'enableRateLimit': True})
-        except:
-            pass
-            
-        try:
-            exchanges['kraken'] = ccxt.kraken({'enableRateLimit': True})
-        except:
-            pass
-        
-        return exchanges
+        return build_exchanges(self.session, self.market_cache)
     
     async def get_price(self, exchange_name: str, symbol: str):
         """Get current price from exchange"""
@@ -58,80 +168,246 @@ class ArbitrageAgent:
         except Exception as e:
             return None
     
-    async def find_arbitrage(self, symbols: List[str] = ['BTC/USDT', 'ETH/USDT']):
+    async def find_arbitrage(self, symbols: Optional[List[str]] = None):
         """Find arbitrage opportunities"""
-        opportunities = []
-        
-        for symbol in symbols:
-            prices = {}
-            
-            # Get prices from all exchanges
-            tasks = [self.get_price(ex, symbol) for ex in self.exchanges.keys()]
-            results = await asyncio.gather(*tasks)
-            
-            for result in results:
-                if result:
-                    prices[result['exchange']] = result
-            
-            # Find arbitrage
-            if len(prices) >= 2:
-                exchanges_list = list(prices.keys())
-                
-                for i in range(len(exchanges_list)):
-                    for j in range(i + 1, len(exchanges_list)):
-                        buy_ex = exchanges_list[i]
-                        sell_ex = exchanges_list[j]
-                        
-                        buy_price = prices[buy_ex]['ask']
-                        sell_price = prices[sell_ex]['bid']
-                        
-                        if buy_price and sell_price:
-                            profit_pct = ((sell_price - buy_price) / buy_price) * 100
-                            
-                            if profit_pct > 0.5:  # More than 0.5% profit
-                                opportunity = {
-                                    'symbol': symbol,
-                                    'buy_exchange': buy_ex,
-                                    'sell_exchange': sell_ex,
-                                    'buy_price': buy_price,
-                                    'sell_price': sell_price,
-                                    'profit_pct': profit_pct,
-                                    'timestamp': time.time()
-                                }
-                                opportunities.append(opportunity)
-                                self.opportunities_found += 1
-        
+        # Every exchange fetched at once (bulk where supported) - one round-trip
+        prices = await self._get_scheduler().refresh(symbols or self.symbols)
+        if self.recorder is not None:
+            self.recorder.record_scan(prices)
+        opportunities = await self.check_depth(self.evaluate(prices))
+        self.opportunities_found += len(opportunities)
+        return opportunities
+
+    async def find_triangular(self, min_profit_pct: Optional[float] = None):
+        """
+        Triangular and longer cyclic opportunities within each exchange,
+        from one bulk fetch of all its tickers. The currency graph persists
+        between scans, so only triangles whose quotes moved are re-scored.
+        """
+        scheduler = self._get_scheduler()
+        if self._graph is None:
+            self._graph = CurrencyGraph(self.taker_fees())
+        names = list(self.exchanges)
+        for name, tickers in zip(names, await asyncio.gather(*(scheduler.fetch_all_tickers(n) for n in names))):
+            self._graph.load_tickers(name, tickers)
+
+        threshold = self.min_profit_pct if min_profit_pct is None else min_profit_pct
+        found = self._graph.triangles(threshold)
+        if self.cycle_budget:
+            cycle = self._graph.negative_cycle(budget=self.cycle_budget)
+            if cycle and len(cycle['markets']) > 3 and cycle['profit_pct'] > threshold:
+                found.append(cycle)
+        now = time.time()
+        for opp in found:
+            opp['timestamp'] = now
+        self.opportunities_found += len(found)
+        return found
+
+    def taker_fees(self):
+        """Taker fee per exchange as published by the client (0 if unknown)"""
+        fees = {}
+        for name, exchange in self.exchanges.items():
+            trading = (getattr(exchange, 'fees', None) or {}).get('trading', {})
+            fees[name] = trading.get('taker') or 0.0
+        fees.update(self.fee_overrides)
+        return fees
+
+    def withdrawal_fee(self, exchange: str, symbol: str) -> float:
+        """Cost, in base units, of withdrawing the bought coins from `exchange`"""
+        base = symbol.split('/')[0]
+        fee = self.withdrawal_fees.get(exchange, {}).get(base)
+        if fee is None:
+            currencies = getattr(self.exchanges.get(exchange), 'currencies', None) or {}
+            fee = (currencies.get(base) or {}).get('fee')
+        return fee or 0.0
+
+    def size(self, opp, buy_book, sell_book, fees: Optional[Dict[str, float]] = None) -> bool:
+        """
+        Walk the books behind a top-of-book opportunity, adding its
+        executable quantity and realized profit; False if not tradable
+        """
+        fees = self.taker_fees() if fees is None else fees
+        result = size_opportunity(
+            buy_book, sell_book,
+            fees.get(opp['buy_exchange'], 0.0), fees.get(opp['sell_exchange'], 0.0),
+            self.withdrawal_fee(opp['buy_exchange'], opp['symbol']),
+            self.book_depth, self.max_trade_qty,
+        )
+        if result is None or result['net_profit'] <= self.min_net_profit:
+            return False
+        opp.update(result)
+        return True
+
+    async def check_depth(self, opportunities: List[dict]):
+        """
+        Fetch the order books behind each opportunity and keep the ones
+        that are tradable. Exchanges without fetchOrderBook can't be
+        checked, so their opportunities pass through unsized.
+        """
+        if not opportunities:
+            return opportunities
+        scheduler = self._get_scheduler()
+        keys = {(opp[side], opp['symbol']) for opp in opportunities for side in ('buy_exchange', 'sell_exchange')}
+        keys = [k for k in keys if (getattr(self.exchanges.get(k[0]), 'has', None) or {}).get('fetchOrderBook')]
+        books = dict(zip(keys, await asyncio.gather(*(scheduler.fetch_order_book(name, symbol, self.book_depth)
+                                                      for name, symbol in keys))))
+        fees = self.taker_fees()
+        tradable = []
+        for opp in opportunities:
+            buy_key, sell_key = (opp['buy_exchange'], opp['symbol']), (opp['sell_exchange'], opp['symbol'])
+            if buy_key not in books or sell_key not in books:
+                tradable.append(opp)
+            elif books[buy_key] and books[sell_key] and self.size(opp, books[buy_key], books[sell_key], fees):
+                tradable.append(opp)
+        return tradable
+
+    def evaluate(self, prices: Dict[str, Dict[str, dict]]):
+        """
+        Score every buy/sell exchange pair, fees included, for
+        {symbol: {exchange: quote}} in one vectorized pass
+        """
+        exchanges = sorted({ex for quotes in prices.values() for ex in quotes})
+        if self._spreads is None or self._spreads.symbols != list(prices) or self._spreads.exchanges != exchanges:
+            self._spreads = SpreadMatrix(list(prices), exchanges, self.taker_fees())
+        self._spreads.load(prices)
+        opportunities = self._spreads.opportunities(self.min_profit_pct, time.time())
+        for opp in opportunities:
+            # Age of the older leg, when quotes came from the scheduler
+            ages = [prices[opp['symbol']][ex].get('age') for ex in (opp['buy_exchange'], opp['sell_exchange'])]
+            if None not in ages:
+                opp['quote_age'] = max(ages)
         return opportunities
     
+    def on_book_change(self, book, received: float):
+        """
+        Streaming-mode hook: fold one book's new top into the matrix and
+        re-score only that symbol
+        """
+        matrix = self._stream_matrix
+        if book.exchange not in matrix.exchange_index:
+            # New exchange on the feed: widen the matrix, keeping quotes
+            old = matrix
+            matrix = self._stream_matrix = SpreadMatrix(old.symbols, old.exchanges + [book.exchange], self.taker_fees())
+            matrix.bids[:, :len(old.exchanges)] = old.bids
+            matrix.asks[:, :len(old.exchanges)] = old.asks
+        row = matrix.symbol_index.get(book.symbol)
+        if row is None:
+            return []
+        bid, ask = book.top()
+        matrix.update(book.symbol, book.exchange, bid, ask)
+        opportunities = matrix.opportunities(self.min_profit_pct, time.time(), rows=[row])
+        if opportunities:
+            books, fees = self._books, self.taker_fees()
+            opportunities = [opp for opp in opportunities if self.size(
+                opp, books[(opp['buy_exchange'], opp['symbol'])], books[(opp['sell_exchange'], opp['symbol'])], fees)]
+        self.signal_latency.add(time.perf_counter() - received)
+        if book.timestamp:
+            self.event_latency.add(time.time() - book.timestamp / 1000.0)
+        self.opportunities_found += len(opportunities)
+        for opp in opportunities:
+            self.report(opp)
+        return opportunities
+
+    def stream_feed(self) -> BookFeed:
+        """A BookFeed wired to on_book_change, with fresh books and spread matrix"""
+        self._stream_matrix = SpreadMatrix(self.symbols, [], self.taker_fees())
+        feed = BookFeed(self.on_book_change, self.symbols, recorder=self.recorder)
+        self._books = feed.books
+        return feed
+
+    async def run_streaming(self, source, duration: Optional[float] = None):
+        """
+        Streaming mode: keep local L2 books from a feed (see market_stream)
+        and re-evaluate a symbol whenever its top of book moves, instead of
+        polling REST tickers every cycle. `source` is a WebSocket URL
+        speaking the feed protocol, or an async iterable of feed messages
+        (e.g. ccxt_pro_messages() for a live exchange), or a list of them,
+        consumed together. A source that fails raises here.
+        """
+        feed = self.stream_feed()
+        if isinstance(source, str):
+            described, runs = source, [feed.connect(source)]
+        else:
+            sources = source if isinstance(source, (list, tuple)) else [source]
+            described, runs = f"{len(sources)} message source(s)", [feed.consume(s) for s in sources]
+        if self.console:
+            print(f"🚀 {self.agent_id} started - Streaming order books from {described}")
+        try:
+            await asyncio.wait_for(asyncio.gather(*runs), duration)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            feed.stop()
+        latency = self.signal_latency.summary()
+        if self.console:
+            print(f"{self.agent_id} stream ended: {feed.messages} messages, {feed.top_changes} top-of-book changes, "
+                  f"tick-to-signal p50 {latency.get('p50_ms', 0):.3f} ms / p99 {latency.get('p99_ms', 0):.3f} ms")
+        return feed
+
+    def report(self, opp):
+        """Publish an opportunity; identical repeats collapse into one record"""
+        self.buffer.publish(self.agent_id, 'arbitrage', (opp['symbol'], opp['buy_exchange'], opp['sell_exchange']),
+                            opp['profit_pct'], opp, opp.get('timestamp'))
+        if not self.console:
+            return
+        print(f"💰 ARBITRAGE FOUND!")
+        print(f"   {opp['symbol']}: Buy on {opp['buy_exchange']} @ ${opp['buy_price']:.2f}")
+        print(f"   Sell on {opp['sell_exchange']} @ ${opp['sell_price']:.2f}")
+        print(f"   Profit: {opp['profit_pct']:.2f}% (quotes {opp.get('quote_age', 0):.1f}s old)")
+        if 'quantity' in opp:
+            print(f"   Size: {opp['quantity']:.6g} -> ${opp['net_profit']:.2f} net ({opp['net_profit_pct']:.2f}%) "
+                  f"after ${opp['fees']:.2f} fees, ${opp['withdrawal_cost']:.2f} withdrawal")
+        print()
+
     async def run(self):
         """Run agent continuously"""
-        print(f"🚀 {self.agent_id} started - Monitoring arbitrage...")
-        
+        async with self:
+            await self._run()
+
+    async def _run(self):
+        if self.console:
+            print(f"🚀 {self.agent_id} started - Monitoring arbitrage...")
+        subscription = self.hub.subscribe(self.symbols) if self.hub is not None else None
+        try:
+            await self._loop(subscription)
+        finally:
+            if subscription is not None:
+                self.hub.unsubscribe(subscription)
+        if self.console:
+            print(f"{self.agent_id} stopped. Found {self.opportunities_found} opportunities.")
+
+    async def _loop(self, subscription):
         while self.running:
             try:
-                opportunities = await self.find_arbitrage()
-                
-                if opportunities:
-                    for opp in opportunities:
-                        print(f"💰 ARBITRAGE FOUND!")
-                        print(f"   {opp['symbol']}: Buy on {opp['buy_exchange']} @ ${opp['buy_price']:.2f}")
-                        print(f"   Sell on {opp['sell_exchange']} @ ${opp['sell_price']:.2f}")
-                        print(f"   Profit: {opp['profit_pct']:.2f}%")
-                        print()
-                
-                # Check every 30 seconds
-                await asyncio.sleep(30)
+                if subscription is not None:
+                    # The hub polls once for every agent watching these symbols
+                    prices = await subscription.get()
+                else:
+                    # One paced scan per cycle - requests are spread across it
+                    prices = await self._get_scheduler().run_cycle()
+                if self.recorder is not None:
+                    self.recorder.record_scan(prices)
+                opportunities = await self.check_depth(self.evaluate(prices))
+                self.opportunities_found += len(opportunities)
                 
+                for opp in opportunities:
+                    self.report(opp)
+
+                if subscription is None:
+                    # Evaluated while fresh; now wait for the next cycle
+                    await self._get_scheduler().wait_next_cycle()
+
             except KeyboardInterrupt:
                 self.running = False
                 break
             except Exception as e:
-                print(f"Error: {e}")
+                logger.exception("%s scan failed", self.agent_id)
+                if self.console:
+                    print(f"Error: {e}")
                 await asyncio.sleep(60)
-        
-        print(f"{self.agent_id} stopped. Found {self.opportunities_found} opportunities.")
 
 # Usage
 if __name__ == "__main__":
     agent = ArbitrageAgent("arbitrage-001")
+    agent.console = True
     asyncio.run(agent.run())
@@ -3,108 +3,171 @@ DEFI YIELD FARMING AGENT
 Scans DeFi protocols for best yields
 NO AI needed - just data collection
 """
-import requests
-from typing import List, Dict
+import aiohttp
+import asyncio
+import logging
+from typing import List, Dict, Optional
 import time
 
+from backend.agents.apy_history import ApyHistory, get_history
+from backend.agents.defi_protocols import ProtocolAdapter, build_adapters, fetch_all
+from backend.agents.opportunity_buffer import OpportunityBuffer, get_buffer
+from backend.agents.yield_index import YieldIndex
+from backend.http_cache import HttpCache, get_cache
+
+logger = logging.getLogger(__name__)
+
 class DeFiYieldAgent:
     """
     Monitors DeFi protocols for yield opportunities
     Compares APYs across platforms
     Finds best farming opportunities
+
+    Protocols are the adapters in defi_protocols (every registered one by
+    default), fetched concurrently over one pooled aiohttp session with a
+    timeout each, so a scan costs the slowest protocol, not the sum. Use
+    the agent as `async with DeFiYieldAgent(...) as agent:` (run() does
+    this itself). `last_scan` holds each protocol's status from the most
+    recent scan. Requests go through `http_cache` (the shared HttpCache by
+    default), so a payload that hasn't changed is not downloaded again.
+
+    Every pool a scan returns goes into a persistent YieldIndex, updated
+    only where APYs moved; `top` follows the best `top_k` overall and
+    index.view() gives rankings by protocol, asset or type. Agents watching
+    the same protocols can share one `index` (AgentRuntime does), each
+    keeping only its own view of it.
+
+    Every scanned APY is also recorded in `history` (the process-wide
+    ApyHistory by default, memory-mapped so it survives restarts), and
+    published changes carry that pool's rolling mean, volatility and
+    z-score, so a sudden 40% can be told from a sustained one.
+
+    Changes to the top ranking (pools entering, leaving or moving) are
+    published to `buffer` (the process-wide OpportunityBuffer by
+    default). Set `console` to also print the table.
     """
-    
-    def __init__(self, agent_id: str):
+
+    def __init__(self, agent_id: str, buffer: Optional[OpportunityBuffer] = None,
+                 adapters: Optional[List[ProtocolAdapter]] = None, session: Optional[aiohttp.ClientSession] = None,
+                 scan_seconds: float = 300.0, http_cache: Optional[HttpCache] = None, top_k: int = 10,
+                 history: Optional[ApyHistory] = None, index: Optional[YieldIndex] = None):
         self.agent_id = agent_id
+        self.buffer = buffer if buffer is not None else get_buffer()
+        self.adapters = adapters if adapters is not None else build_adapters()
+        self.session = session
+        self._owns_session = session is None
+        self.http_cache = http_cache if http_cache is not None else get_cache()
+        self.history = history if history is not None else get_history()
+        self.scan_seconds = scan_seconds
+        self.last_scan: Dict[str, dict] = {}
+        self.index = index if index is not None else YieldIndex()
+        self.top = self.index.view(top_k)
+        self.console = False
         self.opportunities_found = 0
         self.running = True
-        
-    def get_aave_yields(self):
-        """Get Aave lending yields"""
-        try:
-            # Aave API
-            url = "https://aave-api-v2.aave.com/data/liquidity/v2"
-            response = requests.get(url, timeout=10)
-            data = response.json()
-            
-            yields = []
-            for reserve in data.get('reserves', [])[:5]:
-                yields.append({
-                    'protocol': 'Aave',
-                    'asset': reserve.get('symbol', 'Unknown'),
-                    'apy': float(reserve.get('liquidityRate', 0)) * 100,
-                    'type': 'Lending'
-                })
-            
-            return yields
-        except:
-            return []
-    
-    def get_compound_yields(self):
-        """Get Compound yields"""
-        try:
-            url = "https://api.compound.finance/api/v2/ctoken"
-            response = requests.get(url, timeout=10)
-            data = response.json()
-            
-            yields = []
-            for token in data.get('cToken', [])[:5]:
-                yields.append({
-                    'protocol': 'Compound',
-                    'asset': token.get('underlying_symbol', 'Unknown'),
-                    'apy': float(token.get('supply_rate', {}).get('value', 0)) * 100,
-                    'type': 'Lending'
-                })
-            
-            return yields
-        except:
-            return []
-    
-    def find_best_yields(self):
+
+    async def open(self):
+        """Create the pooled HTTP session every adapter shares"""
+        if self.session is None:
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(ttl_dns_cache=300))
+        return self
+
+    async def close(self):
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+        self.history.flush()
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def find_best_yields(self):
         """Find best yields across all protocols"""
-        all_yields = []
-        
-        print(f"🔍 {self.agent_id}: Scanning DeFi protocols...")
-        
-        # Get yields from different protocols
-        all_yields.extend(self.get_aave_yields())
-        all_yields.extend(self.get_compound_yields())
-        
-        # Sort by APY
-        all_yields.sort(key=lambda x: x['apy'], reverse=True)
-        
-        return all_yields[:10]  # Top 10
-    
-    def run(self):
+        if self.console:
+            print(f"🔍 {self.agent_id}: Scanning {len(self.adapters)} DeFi protocols...")
+
+        await self.open()
+        all_yields, self.last_scan = await fetch_all(self.session, self.adapters, self.http_cache)
+        self.history.add_many(all_yields, time.time())
+
+        # A protocol that failed this scan keeps its last known pools
+        listings = {name: [] for name, status in self.last_scan.items() if status['ok']}
+        for y in all_yields:
+            listings[y['protocol']].append(y)
+        for protocol, pools in listings.items():
+            self.index.sync(protocol, pools)
+
+        return self.top.current()
+
+    def report(self, changes: List[Dict]):
+        """Publish changes to the top ranking; returns how many are new records"""
+        now = time.time()
+        new = 0
+        for y in changes:
+            stats = self.history.stats(y['protocol'], y['asset'])
+            if stats is not None:
+                y.update(apy_mean=stats['mean'], apy_ewma=stats['ewma'], apy_volatility=stats['volatility'],
+                         apy_zscore=stats['zscore'])
+            _, is_new = self.buffer.publish(self.agent_id, 'yield', (y['protocol'], y['asset'], y['type']), y['apy'], y, now)
+            new += is_new
+        if self.console:
+            moved = {(y['protocol'], y['asset'], y['type']) for y in changes}
+            print(f"\n💎 TOP DEFI YIELDS ({len(self.index)} pools tracked):")
+            print("-" * 70)
+            for i, y in enumerate(self.top.current(), 1):
+                mark = " *" if (y['protocol'], y['asset'], y['type']) in moved else ""
+                stats = self.history.stats(y['protocol'], y['asset'])
+                trend = f" avg {stats['mean']:.2f}% ±{stats['volatility']:.2f}" if stats and stats['samples'] > 1 else ""
+                print(f"{i}. {y['protocol']} - {y['asset']}: {y['apy']:.2f}% APY ({y['type']}){trend}{mark}")
+            print("-" * 70)
+            failed = {name: s['error'] for name, s in self.last_scan.items() if not s['ok']}
+            if failed:
+                print("Unavailable: " + ", ".join(f"{name} ({error})" for name, error in failed.items()))
+        return new
+
+    def publish(self) -> int:
+        """Report what changed in the top ranking since the last call; returns how many were new"""
+        changes = self.top.changes()
+        if not changes:
+            return 0
+        new = self.report(changes)
+        self.opportunities_found += new
+        return new
+
+    async def run(self):
         """Run agent continuously"""
-        print(f"🚀 {self.agent_id} started - Monitoring DeFi yields...")
-        
+        async with self:
+            await self._run()
+
+    async def _run(self):
+        if self.console:
+            print(f"🚀 {self.agent_id} started - Monitoring DeFi yields...")
+
         while self.running:
             try:
-                yields = self.find_best_yields()
-                
-                if yields:
-                    print(f"\n💎 TOP DEFI YIELDS:")
-                    print("-" * 70)
-                    for i, y in enumerate(yields, 1):
-                        print(f"{i}. {y['protocol']} - {y['asset']}: {y['apy']:.2f}% APY ({y['type']})")
-                    print("-" * 70)
-                    
-                    self.opportunities_found += len(yields)
-                
+                await self.find_best_yields()
+                self.publish()
+
                 # Check every 5 minutes
-                time.sleep(300)
-                
+                await asyncio.sleep(self.scan_seconds)
+
             except KeyboardInterrupt:
                 self.running = False
                 break
             except Exception as e:
-                print(f"Error: {e}")
-                time.sleep(60)
-        
-        print(f"{self.agent_id} stopped. Found {self.opportunities_found} opportunities.")
+                logger.exception("%s scan failed", self.agent_id)
+                if self.console:
+                    print(f"Error: {e}")
+                await asyncio.sleep(60)
+
+        if self.console:
+            print(f"{self.agent_id} stopped. Found {self.opportunities_found} opportunities.")
 
 # Usage
 if __name__ == "__main__":
     agent = DeFiYieldAgent("defi-001")
-    agent.run()
+    agent.console = True
+    asyncio.run(agent.run())
@@ -0,0 +1,126 @@
+"""
+DEFI PROTOCOLS
+Pluggable yield sources for DeFiYieldAgent
+
+Each protocol is a ProtocolAdapter: where to fetch from and how to turn
+the response into yield dicts ({'protocol', 'asset', 'apy', 'type'}).
+Adapters register themselves by name, so adding a protocol is one class:
+
+    @register
+    class Spark(ProtocolAdapter):
+        name = 'Spark'
+        url = 'https://...'
+
+        def parse(self, data):
+            return [self.yield_(r['symbol'], r['apy']) for r in data['rates']]
+
+fetch_all() runs every adapter at once over one shared aiohttp session,
+each under its own timeout, so a scan takes as long as the slowest
+protocol rather than the sum; a protocol that fails or times out costs
+its own results only.
+
+Given an HttpCache, fetches go through it: an unchanged payload is
+revalidated (304) instead of downloaded, and an adapter's `ttl`, if set,
+overrides the protocol's own Cache-Control.
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple, Type
+
+import aiohttp
+
+from backend.http_cache import HttpCache
+
+ADAPTERS: Dict[str, Type['ProtocolAdapter']] = {}
+
+
+def register(cls: Type['ProtocolAdapter']) -> Type['ProtocolAdapter']:
+    """Class decorator: make an adapter available by its `name`"""
+    ADAPTERS[cls.name] = cls
+    return cls
+
+
+class ProtocolAdapter:
+    """One protocol's yield endpoint; subclasses set name / url and parse()"""
+
+    name = ''
+    url = ''
+    kind = 'Lending'
+    timeout = 10.0
+    ttl: Optional[float] = None  # seconds a payload is reused without asking; None follows the server
+
+    def __init__(self, url: Optional[str] = None, timeout: Optional[float] = None):
+        if url is not None:
+            self.url = url
+        if timeout is not None:
+            self.timeout = timeout
+
+    def yield_(self, asset: str, apy: float, kind: Optional[str] = None) -> dict:
+        return {'protocol': self.name, 'asset': asset, 'apy': apy, 'type': kind or self.kind}
+
+    def parse(self, data) -> List[dict]:
+        raise NotImplementedError
+
+    async def fetch(self, session: aiohttp.ClientSession, cache: Optional[HttpCache] = None) -> List[dict]:
+        if cache is not None:
+            response = await cache.get(session, self.url, ttl=self.ttl)
+            response.raise_for_status()
+            return self.parse(response.json())
+        async with session.get(self.url) as response:
+            response.raise_for_status()
+            return self.parse(await response.json(content_type=None))
+
+
+@register
+class Aave(ProtocolAdapter):
+    name = 'Aave'
+    url = 'https://aave-api-v2.aave.com/data/liquidity/v2'
+
+    def parse(self, data):
+        return [self.yield_(r.get('symbol', 'Unknown'), float(r.get('liquidityRate', 0)) * 100)
+                for r in data.get('reserves', [])]
+
+
+@register
+class Compound(ProtocolAdapter):
+    name = 'Compound'
+    url = 'https://api.compound.finance/api/v2/ctoken'
+
+    def parse(self, data):
+        return [self.yield_(t.get('underlying_symbol', 'Unknown'), float(t.get('supply_rate', {}).get('value', 0)) * 100)
+                for t in data.get('cToken', [])]
+
+
+def build_adapters(names: Optional[List[str]] = None, urls: Optional[Dict[str, str]] = None,
+                   timeouts: Optional[Dict[str, float]] = None) -> List[ProtocolAdapter]:
+    """
+    Instances of the registered adapters (all of them by default), with
+    optional per-protocol url and timeout overrides
+    """
+    urls, timeouts = urls or {}, timeouts or {}
+    return [ADAPTERS[name](urls.get(name), timeouts.get(name)) for name in (names or list(ADAPTERS))]
+
+
+async def _run(adapter: ProtocolAdapter, session: aiohttp.ClientSession,
+               cache: Optional[HttpCache]) -> Tuple[List[dict], dict]:
+    start = time.perf_counter()
+    try:
+        yields = await asyncio.wait_for(adapter.fetch(session, cache), adapter.timeout)
+        status = {'ok': True, 'count': len(yields)}
+    except asyncio.TimeoutError:
+        yields, status = [], {'ok': False, 'error': f"timed out after {adapter.timeout:g}s"}
+    except Exception as e:
+        yields, status = [], {'ok': False, 'error': str(e) or type(e).__name__}
+    status['seconds'] = time.perf_counter() - start
+    return yields, status
+
+
+async def fetch_all(session: aiohttp.ClientSession, adapters: List[ProtocolAdapter],
+                    cache: Optional[HttpCache] = None) -> Tuple[List[dict], Dict[str, dict]]:
+    """Every adapter concurrently: (all yields, {protocol: status})"""
+    results = await asyncio.gather(*(_run(adapter, session, cache) for adapter in adapters))
+    yields, statuses = [], {}
+    for adapter, (found, status) in zip(adapters, results):
+        yields.extend(found)
+        statuses[adapter.name] = status
+    return yields, statuses
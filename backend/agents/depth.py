@@ -0,0 +1,89 @@
+"""
+DEPTH
+Executable size and realized profit for a cross-exchange opportunity
+Walks the buy exchange's asks against the sell exchange's bids, level by
+level, until buying one more unit would no longer pay for its fees
+"""
+from typing import Optional
+
+import numpy as np
+
+
+def walk_books(ask_prices, ask_qtys, bid_prices, bid_qtys, buy_fee: float = 0.0, sell_fee: float = 0.0,
+               withdrawal_fee: float = 0.0, max_qty: Optional[float] = None):
+    """
+    Largest profitable quantity for buying into `asks` and selling into `bids`
+
+    Asks are best (lowest) first, bids best (highest) first, as returned by
+    BookSide.levels(). Fees are taker fractions. `withdrawal_fee` is in base
+    units (moving the coins from the buy to the sell exchange) and is charged
+    at the sell VWAP; being fixed, it decides whether the trade is worth
+    doing but not how large it should be. Returns None if nothing fills
+    at a profit before fees and withdrawal (or `max_qty` is 0).
+    """
+    if not len(ask_prices) or not len(bid_prices):
+        return None
+    ask_prices, bid_prices = np.asarray(ask_prices), np.asarray(bid_prices)
+    buy_at = 1.0 + buy_fee
+    sell_at = 1.0 - sell_fee
+    if bid_prices[0] * sell_at <= ask_prices[0] * buy_at:
+        return None
+
+    # Only levels that beat the other side's best price can ever fill at a profit
+    na = int(np.searchsorted(ask_prices, bid_prices[0] * sell_at / buy_at))
+    nb = int(np.searchsorted(-bid_prices, -ask_prices[0] * buy_at / sell_at))
+    ask_prices, bid_prices = ask_prices[:na], bid_prices[:nb]
+    ask_cum = np.cumsum(ask_qtys[:na])
+    bid_cum = np.cumsum(bid_qtys[:nb])
+    limit = min(ask_cum[-1], bid_cum[-1])
+    if max_qty is not None and max_qty < limit:
+        limit = max_qty
+    if limit <= 0:
+        return None
+
+    # Segments between every level boundary on either side; within one
+    # segment both the ask and the bid price are constant
+    edges = np.sort(np.concatenate((ask_cum, bid_cum)))
+    edges = edges[:np.searchsorted(edges, limit)]
+    edges = np.append(edges, limit)
+    starts = np.concatenate(((0.0,), edges[:-1]))
+    asks = ask_prices[np.searchsorted(ask_cum, starts, side='right')]
+    bids = bid_prices[np.searchsorted(bid_cum, starts, side='right')]
+
+    # Asks only rise and bids only fall, so per-unit profit never increases:
+    # the profitable segments are a prefix
+    unit = bids * sell_at - asks * buy_at
+    n = int(np.count_nonzero(unit > 0))
+    if not n:
+        return None
+    sizes = edges[:n] - starts[:n]
+    quantity = float(edges[n - 1])
+    if quantity <= 0:
+        return None
+    cost = float(sizes @ asks[:n])
+    proceeds = float(sizes @ bids[:n])
+    fees = cost * buy_fee + proceeds * sell_fee
+    sell_vwap = proceeds / quantity
+    withdrawal_cost = withdrawal_fee * sell_vwap
+    net_profit = proceeds - cost - fees - withdrawal_cost
+    return {
+        'quantity': quantity,
+        'buy_vwap': cost / quantity,
+        'sell_vwap': sell_vwap,
+        'buy_cost': cost,
+        'sell_proceeds': proceeds,
+        'fees': fees,
+        'withdrawal_cost': withdrawal_cost,
+        'net_profit': net_profit,
+        'net_profit_pct': net_profit / (cost * buy_at) * 100.0,
+        'buy_levels': int(np.searchsorted(ask_cum, quantity)) + 1,
+        'sell_levels': int(np.searchsorted(bid_cum, quantity)) + 1,
+    }
+
+
+def size_opportunity(buy_book, sell_book, buy_fee: float = 0.0, sell_fee: float = 0.0,
+                     withdrawal_fee: float = 0.0, depth: Optional[int] = None, max_qty: Optional[float] = None):
+    """walk_books() over two OrderBooks: buy_book's asks, sell_book's bids"""
+    ask_prices, ask_qtys = buy_book.asks.levels(depth)
+    bid_prices, bid_qtys = sell_book.bids.levels(depth)
+    return walk_books(ask_prices, ask_qtys, bid_prices, bid_qtys, buy_fee, sell_fee, withdrawal_fee, max_qty)
@@ -0,0 +1,184 @@
+"""
+MARKET CACHE
+On-disk cache of exchange market metadata, and lazily built clients
+
+load_markets() is a multi-megabyte download and parse per exchange, and
+most of it is each exchange's raw `info` payload that we never read. The
+cache keeps the markets and currencies exactly as ccxt parsed them
+(ids, symbols, precision, limits, fees, withdrawal fees) minus `info`, as
+one gzipped JSON file per exchange. Because they are already parsed, a
+hit restores them directly instead of re-running set_markets(), whose
+per-market deep merge costs more than reading the file.
+
+LazyExchange defers building a client (and importing ccxt, which alone
+takes about a second) until something actually uses it. Its load_markets()
+reads the cache first, so a warm start never touches the network and
+works offline; a stale entry is still used if the download fails.
+"""
+import gzip
+import json
+import os
+import time
+from typing import Callable, Dict, Optional
+
+CACHE_DIR = os.environ.get('APEX_MARKET_CACHE_DIR', '.market_cache')
+CACHE_TTL = float(os.environ.get('APEX_MARKET_CACHE_TTL', str(24 * 3600)))
+
+FORMAT = 1
+
+
+def _strip_info(value):
+    """Drop every raw exchange `info` payload, at any depth"""
+    if isinstance(value, dict):
+        return {k: _strip_info(v) for k, v in value.items() if k != 'info'}
+    if isinstance(value, list):
+        return [_strip_info(v) for v in value]
+    return value
+
+
+class MarketCache:
+    """Market metadata per exchange id, valid for `ttl` seconds"""
+
+    def __init__(self, directory: str = CACHE_DIR, ttl: float = CACHE_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    def _path(self, exchange_id: str) -> str:
+        return os.path.join(self.directory, f"{exchange_id}.json.gz")
+
+    def load(self, exchange_id: str, allow_stale: bool = False) -> Optional[dict]:
+        """{'saved_at', 'markets', 'currencies'} or None if missing (or expired)"""
+        try:
+            with gzip.open(self._path(exchange_id), 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('format') != FORMAT:
+            return None
+        if time.time() - entry['saved_at'] > self.ttl and not allow_stale:
+            return None
+        return entry
+
+    def save(self, exchange_id: str, markets: Dict[str, dict], currencies: Optional[Dict[str, dict]] = None) -> int:
+        """
+        Write an entry atomically; returns its size in bytes
+        `markets` / `currencies` are a client's after load_markets() or
+        set_markets(), i.e. already merged with the exchange defaults.
+        """
+        entry = {
+            'format': FORMAT,
+            'saved_at': time.time(),
+            'markets': [_strip_info(m) for m in markets.values()],
+            'currencies': {code: _strip_info(c) for code, c in (currencies or {}).items()},
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(exchange_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=6) as f:
+            json.dump(entry, f, separators=(',', ':'))
+        os.replace(tmp, path)
+        return os.path.getsize(path)
+
+    def apply(self, client, entry: dict):
+        """
+        Install an entry on a client: the bookkeeping set_markets() does,
+        without re-merging every market with the exchange defaults
+        """
+        markets = entry['markets']
+        by_id = {}
+        # Spot first, as set_markets() does, so an id shared with a derivative resolves to spot
+        for market in sorted(markets, key=lambda m: not m.get('spot')):
+            by_id.setdefault(market['id'], []).append(market)
+        client.markets = {m['symbol']: m for m in markets}
+        client.markets_by_id = by_id
+        client.symbols = sorted(client.markets)
+        client.ids = sorted(by_id)
+        currencies = entry['currencies']
+        if currencies:
+            client.currencies = currencies
+            client.currencies_by_id = client.index_by_safe(currencies, 'id')
+            client.codes = sorted(currencies)
+
+    async def load_markets(self, client, original: Callable, reload: bool = False, params: Optional[dict] = None):
+        """
+        Stand-in for client.load_markets(): fresh cache, else network (saving
+        the result), else a stale entry if the network is unavailable
+        """
+        if client.markets and not reload:
+            return client.markets
+        exchange_id = client.id
+        entry = None if reload else self.load(exchange_id)
+        if entry is not None:
+            self.hits += 1
+            self.apply(client, entry)
+            return client.markets
+        self.misses += 1
+        try:
+            markets = await original(reload, params or {})
+        except Exception:
+            entry = self.load(exchange_id, allow_stale=True)
+            if entry is None:
+                raise
+            self.stale_hits += 1
+            self.apply(client, entry)
+            return client.markets
+        self.save(exchange_id, markets, client.currencies)
+        return markets
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'stale_hits': self.stale_hits}
+
+
+class LazyExchange:
+    """
+    A ccxt client that is only built on first attribute access
+    Once built, its load_markets() goes through `cache`, so every fetch_*
+    call (which loads markets implicitly) is served from disk when warm.
+    """
+
+    def __init__(self, name: str, factory: Callable, cache: Optional[MarketCache] = None):
+        self._name = name
+        self._factory = factory
+        self._cache = cache
+        self._client = None
+
+    @property
+    def built(self) -> bool:
+        return self._client is not None
+
+    def build(self):
+        """The client, built now if it isn't yet; blocking (the first one imports ccxt)"""
+        return self._client if self._client is not None else self._build()
+
+    def _build(self):
+        client = self._factory()
+        if self._cache is not None:
+            original = client.load_markets
+            cache = self._cache
+
+            async def load_markets(reload=False, params={}):
+                return await cache.load_markets(client, original, reload, params)
+
+            client.load_markets = load_markets
+        self._client = client
+        return client
+
+    def __getattr__(self, attr):
+        client = self._client if self._client is not None else self._build()
+        return getattr(client, attr)
+
+    def __setattr__(self, attr, value):
+        if attr.startswith('_'):
+            object.__setattr__(self, attr, value)
+        else:
+            setattr(self._client if self._client is not None else self._build(), attr, value)
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+
+    def __repr__(self):
+        return f"LazyExchange({self._name!r}, built={self.built})"
@@ -0,0 +1,235 @@
+"""
+MARKET HUB
+One process-wide ticker feed shared by every arbitrage agent
+
+Agents subscribe to the symbols they watch; the hub polls the union of
+those symbols once per cycle through a single ScanScheduler (so one set of
+token buckets per exchange) and fans each snapshot out to subscribers.
+Exchange load depends on the number of distinct symbols, not agents.
+
+    hub = get_hub()
+    agent = ArbitrageAgent("arb-1", hub=hub)
+
+Symbols are reference counted: the first subscriber adds a symbol to the
+scan and the last one to leave removes it. Each subscriber has a bounded
+queue; a slow agent loses its oldest snapshot, never blocks the others.
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from backend.agents.market_cache import LazyExchange
+from backend.agents.scan_scheduler import ScanScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class HubSubscription:
+    """An agent's view of the hub: snapshots for its symbols, newest last"""
+
+    def __init__(self, symbols: List[str], maxsize: int):
+        self.symbols = list(dict.fromkeys(symbols))
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.delivered = 0
+        self.dropped = 0
+        self.error: Optional[BaseException] = None
+
+    def offer(self, snapshot: dict):
+        if self.queue.full():
+            # Snapshots supersede each other; lose the oldest, not the newest
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(snapshot)
+        self.delivered += 1
+
+    def fail(self, error: BaseException):
+        """The hub stopped polling: get() raises `error` once the queue is drained"""
+        self.error = error
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        # Wakes a get() already waiting on the queue
+        self.queue.put_nowait(None)
+
+    async def get(self) -> Dict[str, Dict[str, dict]]:
+        """Next {symbol: {exchange: quote}} snapshot; treat it as read-only"""
+        if self.error is not None and self.queue.empty():
+            raise self.error
+        snapshot = await self.queue.get()
+        if snapshot is None:
+            raise self.error
+        return snapshot
+
+
+class MarketDataHub:
+    """
+    Shared poller for a set of exchanges
+    Pass `exchanges` to supply clients (e.g. stub clients); otherwise the
+    hub builds the same ccxt clients as ArbitrageAgent on one session.
+    """
+
+    def __init__(self, exchanges: Optional[Dict] = None, cycle_seconds: float = 30.0,
+                 rate_limits: Optional[Dict[str, float]] = None, queue_size: int = 4, market_cache=None):
+        self.market_cache = market_cache
+        self.exchanges = exchanges if exchanges is not None else {}
+        self._owns_exchanges = exchanges is None
+        self.cycle_seconds = cycle_seconds
+        self.rate_limits = rate_limits
+        self.queue_size = queue_size
+        self.session = None
+        self.scheduler = None
+        self.refcounts: Dict[str, int] = {}
+        self.subscriptions: List[HubSubscription] = []
+        self.cycles = 0
+        self.poll_errors = 0
+        self._task = None
+        self._opened = False
+        self._new_symbols = []
+
+    async def open(self):
+        """Build the clients and scheduler once; later calls are no-ops"""
+        if self._opened:
+            return self
+        if self._owns_exchanges:
+            from backend.agents.arbitrage_agent import build_exchanges
+            self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit_per_host=10, ttl_dns_cache=300))
+            # Filled in place: agents hold a reference to this dict
+            self.exchanges.update(build_exchanges(self.session, self.market_cache))
+        self.scheduler = ScanScheduler(self.exchanges, [], self.cycle_seconds, self.rate_limits)
+        self.scheduler.symbols = [s for s, n in self.refcounts.items() if n]
+        self._opened = True
+        return self
+
+    def build_clients(self):
+        """
+        Build lazily built clients now instead of on their first request
+        Blocking (importing ccxt takes about a second), so call it through
+        run_in_executor once open() has created them.
+        """
+        for exchange in self.exchanges.values():
+            if isinstance(exchange, LazyExchange):
+                exchange.build()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._owns_exchanges:
+            await asyncio.gather(*(ex.close() for ex in self.exchanges.values()), return_exceptions=True)
+            self.exchanges.clear()
+            if self.session is not None:
+                await self.session.close()
+                self.session = None
+        self._opened = False
+
+    def subscribe(self, symbols: List[str], maxsize: Optional[int] = None) -> HubSubscription:
+        """Start receiving snapshots for `symbols`; polling starts with the first subscriber"""
+        subscription = HubSubscription(symbols, maxsize or self.queue_size)
+        added = []
+        for symbol in subscription.symbols:
+            self.refcounts[symbol] = self.refcounts.get(symbol, 0) + 1
+            if self.refcounts[symbol] == 1:
+                added.append(symbol)
+        self.subscriptions.append(subscription)
+        if self.scheduler is not None and added:
+            self.scheduler.symbols.extend(added)
+            if self._task is not None:
+                # Don't make a new symbol wait for the next cycle; symbols
+                # added by agents starting together share one refresh
+                if not self._new_symbols:
+                    asyncio.ensure_future(self._refresh_new())
+                self._new_symbols.extend(added)
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._poll())
+        return subscription
+
+    def unsubscribe(self, subscription: HubSubscription):
+        """Stop a subscription; symbols nobody watches any more leave the scan"""
+        if subscription not in self.subscriptions:
+            return
+        self.subscriptions.remove(subscription)
+        for symbol in subscription.symbols:
+            self.refcounts[symbol] -= 1
+            if not self.refcounts[symbol]:
+                del self.refcounts[symbol]
+                if self.scheduler is not None:
+                    self.scheduler.symbols.remove(symbol)
+                    for name in self.exchanges:
+                        self.scheduler.quotes.pop((symbol, name), None)
+        if not self.subscriptions and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _publish(self, snapshot: Dict[str, Dict[str, dict]]):
+        for subscription in self.subscriptions:
+            mine = {s: snapshot[s] for s in subscription.symbols if s in snapshot}
+            if mine:
+                subscription.offer(mine)
+
+    async def _refresh(self, symbols: List[str]):
+        self._publish(await self.scheduler.refresh(symbols))
+
+    async def _refresh_new(self):
+        await asyncio.sleep(0)
+        symbols = [s for s in self._new_symbols if s in self.refcounts]
+        self._new_symbols = []
+        if not symbols:
+            return
+        try:
+            await self._refresh(symbols)
+        except Exception:
+            # Nobody awaits this task; the next cycle picks the symbols up
+            logger.exception("Market hub refresh of new symbols failed")
+
+    async def _poll(self):
+        try:
+            await self.open()
+        except Exception as e:
+            # Can't poll without clients: fail subscribers rather than leave them waiting
+            logger.exception("Market hub failed to open")
+            self._task = None
+            for subscription in self.subscriptions:
+                subscription.fail(e)
+            return
+        # First snapshot straight away, then evenly paced cycles
+        first = True
+        while self.subscriptions:
+            try:
+                if first:
+                    first = False
+                    await self._refresh(list(self.scheduler.symbols))
+                    continue
+                snapshot = await self.scheduler.run_cycle()
+                self.cycles += 1
+                self._publish(snapshot)
+                await self.scheduler.wait_next_cycle()
+            except Exception:
+                logger.exception("Market hub poll failed, retrying next cycle")
+                self.poll_errors += 1
+                await asyncio.sleep(self.cycle_seconds)
+
+    def stats(self):
+        return {
+            'subscribers': len(self.subscriptions),
+            'symbols': dict(self.refcounts),
+            'cycles': self.cycles,
+            'poll_errors': self.poll_errors,
+            'requests_made': dict(self.scheduler.requests_made) if self.scheduler else {},
+            'errors': dict(self.scheduler.errors) if self.scheduler else {},
+            'delivered': sum(s.delivered for s in self.subscriptions),
+            'dropped': sum(s.dropped for s in self.subscriptions),
+        }
+
+
+_hub: Optional[MarketDataHub] = None
+
+
+def get_hub(**kwargs) -> MarketDataHub:
+    """The process-wide hub, created on first use (kwargs apply only then)"""
+    global _hub
+    if _hub is None:
+        _hub = MarketDataHub(**kwargs)
+    return _hub
@@ -0,0 +1,273 @@
+"""
+MARKET STREAM
+WebSocket order-book feeds for the arbitrage agent's streaming mode
+
+Feed messages are JSON, one per frame:
+
+    {"type": "snapshot" | "update", "exchange": "binance", "symbol": "BTC/USDT",
+     "bids": [[price, qty], ...], "asks": [[price, qty], ...], "ts": 1712345678901}
+
+An update with qty 0 removes that level; `ts` is the event time in ms.
+ReplayServer speaks the same protocol from a list of messages, standing
+in for the exchanges in tests and benchmarks. ccxt_pro_messages() turns
+a ccxt.pro client into the same message stream for live use; hand it
+(one per exchange) to ArbitrageAgent.run_streaming().
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+from backend.agents.order_book import OrderBook
+
+
+class LatencyStats:
+    """Rolling window of latency samples in seconds"""
+
+    def __init__(self, window: int = 10000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        if not self.samples:
+            return {'count': self.count}
+        values = np.fromiter(self.samples, dtype=float)
+        p50, p99 = np.percentile(values, [50, 99])
+        return {
+            'count': self.count,
+            'mean_ms': float(values.mean() * 1e3),
+            'p50_ms': float(p50 * 1e3),
+            'p99_ms': float(p99 * 1e3),
+            'max_ms': float(values.max() * 1e3),
+        }
+
+
+class BookFeed:
+    """
+    Maintains local books from a feed and reports top-of-book changes
+    on_change(book, received) is called with the perf_counter() time the
+    message arrived, so callers can measure tick-to-signal latency.
+    Messages are also appended to `recorder` (a TickRecorder) if given.
+    """
+
+    def __init__(self, on_change: Callable, symbols: Optional[List[str]] = None, recorder=None):
+        self.on_change = on_change
+        self.symbols = set(symbols) if symbols else None
+        self.recorder = recorder
+        self.books: Dict[tuple, OrderBook] = {}
+        self.messages = 0
+        self.top_changes = 0
+        self.running = True
+
+    def handle(self, message: dict, received: float):
+        symbol = message['symbol']
+        if self.symbols is not None and symbol not in self.symbols:
+            return
+        key = (message['exchange'], symbol)
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = OrderBook(*key)
+        self.messages += 1
+        if self.recorder is not None:
+            self.recorder.record_book(message)
+        apply = book.apply_snapshot if message.get('type') == 'snapshot' else book.apply_delta
+        if apply(message.get('bids', ()), message.get('asks', ()), message.get('ts')):
+            self.top_changes += 1
+            self.on_change(book, received)
+
+    async def consume(self, source):
+        """Feed messages from any async iterable of dicts"""
+        async for message in source:
+            if not self.running:
+                break
+            self.handle(message, time.perf_counter())
+
+    async def connect(self, url: str):
+        """Feed messages from a WebSocket speaking the protocol above"""
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(url) as ws:
+                await ws.send_json({'op': 'subscribe', 'symbols': sorted(self.symbols) if self.symbols else None})
+                async for frame in ws:
+                    if not self.running:
+                        break
+                    if frame.type == aiohttp.WSMsgType.TEXT:
+                        self.handle(json.loads(frame.data), time.perf_counter())
+                    elif frame.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+
+    def stop(self):
+        self.running = False
+
+
+class ReplayServer:
+    """
+    WebSocket server that replays a list of feed messages to each client
+    Messages are paced by their original `ts` gaps divided by `speed`
+    (speed=None sends as fast as possible) and re-stamped with the send
+    time, so latency measured downstream excludes the recording's age.
+    """
+
+    def __init__(self, messages: List[dict], speed: Optional[float] = 1.0,
+                 host: str = '127.0.0.1', port: int = 0):
+        self.messages = messages
+        self.speed = speed
+        self.host = host
+        self.port = port
+        self.sent = 0
+        self._runner = None
+
+    async def _handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        symbols = None
+        first = await ws.receive()
+        if first.type == aiohttp.WSMsgType.TEXT:
+            symbols = json.loads(first.data).get('symbols')
+        wanted = set(symbols) if symbols else None
+
+        start = time.monotonic()
+        origin = self.messages[0].get('ts', 0) if self.messages else 0
+        for message in self.messages:
+            if wanted is not None and message['symbol'] not in wanted:
+                continue
+            if self.speed:
+                delay = start + (message.get('ts', origin) - origin) / 1000.0 / self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await ws.send_str(json.dumps(dict(message, ts=time.time() * 1000)))
+            self.sent += 1
+        await ws.close()
+        return ws
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get('/', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}/"
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+
+def synthetic_messages(exchanges: List[str], symbols: List[str], updates: int = 10000,
+                       levels: int = 20, interval_ms: float = 1.0, seed: int = 0) -> List[dict]:
+    """Snapshots for every book, then random level updates around the mid"""
+    rng = np.random.default_rng(seed)
+    mids = {s: 100.0 * (i + 1) for i, s in enumerate(symbols)}
+    ts = 0.0
+    messages = []
+    for exchange in exchanges:
+        for symbol in symbols:
+            mid, tick = mids[symbol], mids[symbol] * 1e-4
+            messages.append({
+                'type': 'snapshot', 'exchange': exchange, 'symbol': symbol, 'ts': ts,
+                'bids': [[mid - tick * (n + 1), 1.0] for n in range(levels)],
+                'asks': [[mid + tick * (n + 1), 1.0] for n in range(levels)],
+            })
+    for _ in range(updates):
+        ts += interval_ms
+        exchange = exchanges[rng.integers(len(exchanges))]
+        symbol = symbols[rng.integers(len(symbols))]
+        mid, tick = mids[symbol], mids[symbol] * 1e-4
+        offset = int(rng.integers(0, levels)) + 1
+        qty = float(rng.choice([0.0, rng.uniform(0.1, 5.0)], p=[0.2, 0.8]))
+        # Occasionally lean one book far enough to open a spread
+        lean = mid * 0.008 if rng.random() < 0.01 else 0.0
+        side = 'bids' if rng.random() < 0.5 else 'asks'
+        price = mid - tick * offset + lean if side == 'bids' else mid + tick * offset - lean
+        messages.append({'type': 'update', 'exchange': exchange, 'symbol': symbol, 'ts': ts,
+                         'bids': [[price, qty]] if side == 'bids' else [],
+                         'asks': [[price, qty]] if side == 'asks' else []})
+    return messages
+
+
+def _levels(side) -> Dict[float, float]:
+    return {float(level[0]): float(level[1]) for level in side}
+
+
+def _diff(before: Dict[float, float], after: Dict[float, float]) -> List[list]:
+    """Levels that changed between two sides, removed ones with qty 0"""
+    changed = [[price, qty] for price, qty in after.items() if before.get(price) != qty]
+    changed.extend([price, 0.0] for price in before if price not in after)
+    return changed
+
+
+async def ccxt_pro_messages(client, exchange: str, symbols: List[str], limit: int = 100,
+                            retries: int = 5, backoff: float = 1.0, max_backoff: float = 30.0):
+    """
+    Yield feed messages from a ccxt.pro client's watch_order_book: a
+    snapshot per symbol, then updates carrying only the levels that
+    changed since the previous book, so BookFeed applies them in place.
+
+    A failing watch (disconnect, unknown symbol) is retried with
+    exponential backoff and restarts with a fresh snapshot; after
+    `retries` consecutive failures the error is raised to the consumer.
+    """
+    queue = asyncio.Queue(maxsize=1000)
+
+    async def watch(symbol):
+        last = None
+        failures = 0
+        while True:
+            try:
+                book = await client.watch_order_book(symbol, limit)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                if failures > retries:
+                    await queue.put(e)
+                    return
+                last = None
+                await asyncio.sleep(min(backoff * 2 ** (failures - 1), max_backoff))
+                continue
+            failures = 0
+            bids, asks = _levels(book['bids']), _levels(book['asks'])
+            message = {'exchange': exchange, 'symbol': symbol, 'ts': book.get('timestamp')}
+            if last is None:
+                message.update(type='snapshot', bids=[[p, q] for p, q in bids.items()],
+                               asks=[[p, q] for p, q in asks.items()])
+            else:
+                message.update(type='update', bids=_diff(last[0], bids), asks=_diff(last[1], asks))
+                if not message['bids'] and not message['asks']:
+                    continue
+            last = bids, asks
+            await queue.put(message)
+
+    watchers = [asyncio.ensure_future(watch(s)) for s in symbols]
+    try:
+        while True:
+            item = await queue.get()
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        for w in watchers:
+            w.cancel()
+        await asyncio.gather(*watchers, return_exceptions=True)
@@ -0,0 +1,189 @@
+"""
+OPPORTUNITY BUFFER
+Bounded in-memory stream of the opportunities agents find
+
+Agents publish() each opportunity instead of printing it; the buffer keeps
+the last `capacity` of them in a preallocated ring of __slots__ records,
+numbered by a sequence id, so readers page with since(seq) and streaming
+clients resume from their Last-Event-ID. Nothing is written to the
+database per tick.
+
+An opportunity seen again with the same identity (agent, kind, key) and
+the same rounded value within `dedup_seconds` of its last sighting is not
+a new record: the existing one gets `repeats += 1` and a new `last_seen`.
+A persistent spread re-detected on every book update is one entry, not
+thousands.
+
+Safe to publish from any thread; waiting readers are woken on their own
+event loop, as with events.TaskEventBus.
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class OpportunityRecord:
+    __slots__ = ('seq', 'ts', 'last_seen', 'repeats', 'agent_id', 'kind', 'key', 'value', 'data', '_json')
+
+    def __init__(self, seq: int, ts: float, agent_id: str, kind: str, key: tuple, value: float, data: dict):
+        self.seq = seq
+        self.ts = ts
+        self.last_seen = ts
+        self.repeats = 0
+        self.agent_id = agent_id
+        self.kind = kind
+        self.key = key
+        self.value = value
+        self.data = data
+        self._json = None
+
+    def to_dict(self) -> dict:
+        return {
+            'seq': self.seq, 'ts': self.ts, 'last_seen': self.last_seen, 'repeats': self.repeats,
+            'agent_id': self.agent_id, 'kind': self.kind, 'data': self.data,
+        }
+
+    def json(self) -> str:
+        # Encoded once however many clients read it; repeats and last_seen
+        # move on, so only the first encoding is cached (the stream sends it once)
+        if self._json is None:
+            self._json = json.dumps(self.to_dict(), separators=(',', ':'))
+        return self._json
+
+    def encode(self) -> str:
+        """The record as a server-sent event"""
+        return f"id: {self.seq}\nevent: {self.kind}\ndata: {self.json()}\n\n"
+
+
+class OpportunityBuffer:
+    """The last `capacity` opportunities, oldest overwritten first"""
+
+    def __init__(self, capacity: int = 4096, dedup_seconds: float = 600.0, precision: int = 2):
+        self.capacity = capacity
+        self.dedup_seconds = dedup_seconds
+        self.precision = precision
+        self._ring: List[Optional[OpportunityRecord]] = [None] * capacity
+        self._by_identity: Dict[tuple, OpportunityRecord] = {}
+        self._lock = threading.Lock()
+        self._waiters = set()
+        # Clock-seeded like TaskEventBus ids, so a cursor from a previous
+        # process never silently matches a record of this one
+        self._next_seq = int(time.time() * 1000)
+        self._first_seq = self._next_seq
+        self.published = 0
+        self.deduplicated = 0
+
+    def publish(self, agent_id: str, kind: str, key: tuple, value: float, data: dict,
+                ts: Optional[float] = None) -> Tuple[OpportunityRecord, bool]:
+        """
+        Record one opportunity; returns (record, is_new)
+        `key` identifies it within the agent and kind (e.g. symbol and
+        exchanges); `value` is its headline number (profit %, APY), compared
+        after rounding to `precision` decimals.
+        """
+        now = time.time() if ts is None else ts
+        identity = (agent_id, kind, key, round(value, self.precision))
+        with self._lock:
+            self.published += 1
+            record = self._by_identity.get(identity)
+            if record is not None and now - record.last_seen <= self.dedup_seconds:
+                record.repeats += 1
+                record.last_seen = now
+                record.data = data
+                self.deduplicated += 1
+                return record, False
+            record = OpportunityRecord(self._next_seq, now, agent_id, kind, key, value, data)
+            slot = record.seq % self.capacity
+            evicted = self._ring[slot]
+            if evicted is not None:
+                evicted_identity = (evicted.agent_id, evicted.kind, evicted.key, round(evicted.value, self.precision))
+                if self._by_identity.get(evicted_identity) is evicted:
+                    del self._by_identity[evicted_identity]
+            self._ring[slot] = record
+            self._by_identity[identity] = record
+            self._next_seq += 1
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Loop already closed; the reader is being torn down
+                pass
+        return record, True
+
+    def _oldest_seq(self) -> int:
+        return max(self._first_seq, self._next_seq - self.capacity)
+
+    def since(self, seq: int, limit: Optional[int] = None, kind: Optional[str] = None):
+        """
+        Records after `seq`, oldest first, and whether that is complete
+        Incomplete means the ring has already overwritten some of them.
+        """
+        with self._lock:
+            oldest = self._oldest_seq()
+            complete = self._first_seq - 1 <= seq < self._next_seq and seq >= oldest - 1
+            records = []
+            for s in range(max(seq + 1, oldest), self._next_seq):
+                record = self._ring[s % self.capacity]
+                if kind is None or record.kind == kind:
+                    records.append(record)
+                    if limit and len(records) >= limit:
+                        break
+        return records, complete
+
+    def latest(self, n: int = 50, kind: Optional[str] = None) -> List[OpportunityRecord]:
+        """The newest `n` records, newest first"""
+        with self._lock:
+            records = []
+            for s in range(self._next_seq - 1, self._oldest_seq() - 1, -1):
+                record = self._ring[s % self.capacity]
+                if kind is None or record.kind == kind:
+                    records.append(record)
+                    if len(records) >= n:
+                        break
+        return records
+
+    @property
+    def last_seq(self) -> int:
+        return self._next_seq - 1
+
+    async def wait(self, after: int, timeout: Optional[float] = None) -> bool:
+        """Wait until a record newer than `after` exists; False on timeout"""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._lock:
+            if self._next_seq - 1 > after:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'published': self.published,
+                'deduplicated': self.deduplicated,
+                'records': min(self._next_seq - self._first_seq, self.capacity),
+                'capacity': self.capacity,
+                'last_seq': self._next_seq - 1,
+                'waiting': len(self._waiters),
+            }
+
+
+_buffer: Optional[OpportunityBuffer] = None
+
+
+def get_buffer(**kwargs) -> OpportunityBuffer:
+    """The process-wide buffer, created on first use (kwargs apply only then)"""
+    global _buffer
+    if _buffer is None:
+        _buffer = OpportunityBuffer(**kwargs)
+    return _buffer
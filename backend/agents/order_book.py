@@ -0,0 +1,104 @@
+"""
+ORDER BOOK
+Incrementally updated local L2 order books
+Each side keeps its price levels in sorted parallel arrays, best first
+"""
+from bisect import bisect_left
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+
+
+class BookSide:
+    """
+    Price levels of one side, best level at index 0
+    Bids are stored under key -price so both sides sort ascending. The
+    NumPy view used for depth walks is built on demand and cached until
+    the side next changes.
+    """
+
+    __slots__ = ('is_bid', 'keys', 'qtys', '_arrays')
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.keys = []
+        self.qtys = []
+        self._arrays = None
+
+    def clear(self):
+        self.keys.clear()
+        self.qtys.clear()
+        self._arrays = None
+
+    def set(self, price: float, qty: float):
+        """Set the quantity at a price level; qty 0 removes the level"""
+        key = -price if self.is_bid else price
+        self._arrays = None
+        i = bisect_left(self.keys, key)
+        if i < len(self.keys) and self.keys[i] == key:
+            if qty:
+                self.qtys[i] = qty
+            else:
+                del self.keys[i]
+                del self.qtys[i]
+        elif qty:
+            self.keys.insert(i, key)
+            self.qtys.insert(i, qty)
+
+    def best(self) -> Optional[Tuple[float, float]]:
+        if not self.keys:
+            return None
+        return (-self.keys[0] if self.is_bid else self.keys[0]), self.qtys[0]
+
+    def levels(self, depth: Optional[int] = None):
+        """(prices, qtys) as float arrays, best level first"""
+        if self._arrays is None:
+            prices = np.array(self.keys, dtype=float)
+            if self.is_bid:
+                prices = -prices
+            self._arrays = prices, np.array(self.qtys, dtype=float)
+        prices, qtys = self._arrays
+        return (prices[:depth], qtys[:depth]) if depth else (prices, qtys)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class OrderBook:
+    """L2 book for one (exchange, symbol), fed snapshots and deltas"""
+
+    __slots__ = ('exchange', 'symbol', 'bids', 'asks', 'timestamp', 'updates')
+
+    def __init__(self, exchange: str, symbol: str):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.bids = BookSide(True)
+        self.asks = BookSide(False)
+        self.timestamp = None
+        self.updates = 0
+
+    def apply_snapshot(self, bids: Iterable, asks: Iterable, timestamp=None) -> bool:
+        """Replace the book; returns True if the top of book changed"""
+        before = self.top()
+        self.bids.clear()
+        self.asks.clear()
+        self.apply_delta(bids, asks, timestamp)
+        return self.top() != before
+
+    def apply_delta(self, bids: Iterable, asks: Iterable, timestamp=None) -> bool:
+        """Apply level changes; returns True if the top of book changed"""
+        before = self.top()
+        # Levels are [price, qty, ...]; some ccxt exchanges append an order count
+        for level in bids:
+            self.bids.set(float(level[0]), float(level[1]))
+        for level in asks:
+            self.asks.set(float(level[0]), float(level[1]))
+        self.timestamp = timestamp
+        self.updates += 1
+        return self.top() != before
+
+    def top(self):
+        """(best bid, best ask) prices; None for an empty side"""
+        bid = self.bids.keys[0] if self.bids.keys else None
+        ask = self.asks.keys[0] if self.asks.keys else None
+        return (-bid if bid is not None else None), ask
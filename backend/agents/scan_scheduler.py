@@ -0,0 +1,214 @@
+"""
+SCAN SCHEDULER
+Rate-limit-aware ticker fetching for the arbitrage agent
+
+Uses bulk fetch_tickers() where an exchange supports it, so a scan costs
+a handful of requests per exchange instead of one per symbol. A token
+bucket per exchange keeps us inside its rate limit, and a paced cycle
+spreads those requests evenly over the scan interval instead of bursting
+them at the start. Every quote carries the time it was fetched so
+callers can see how fresh it is.
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from backend.agents.order_book import OrderBook
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens/second, bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, n: float = 1.0) -> float:
+        """Take n tokens if available; otherwise return seconds until they are"""
+        self._refill()
+        if self.tokens >= n:
+            self.tokens -= n
+            return 0.0
+        return (n - self.tokens) / self.rate
+
+    async def acquire(self, n: float = 1.0):
+        while True:
+            wait = self.try_acquire(n)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+class ScanScheduler:
+    """
+    Plans and runs ticker requests for a set of exchanges and symbols
+
+    `rate_limits` is requests/second per exchange; by default it comes from
+    the ccxt client's `rateLimit` (milliseconds between requests).
+    """
+
+    def __init__(self, exchanges: Dict, symbols: List[str], cycle_seconds: float = 30.0,
+                 rate_limits: Optional[Dict[str, float]] = None, bulk_chunk: int = 200,
+                 default_rate: float = 5.0):
+        self.exchanges = exchanges
+        self.symbols = list(symbols)
+        self.cycle_seconds = cycle_seconds
+        self.bulk_chunk = bulk_chunk
+        self.rate_limits = rate_limits or {}
+        self.default_rate = default_rate
+        # Filled by _bucket() on first use, so a lazily built client isn't
+        # constructed just to read its rateLimit
+        self.buckets = {}
+        self.quotes = {}
+        self.requests_made = {name: 0 for name in exchanges}
+        self.errors = {name: 0 for name in exchanges}
+        self._cycle_end = 0.0
+
+    def _bucket(self, name: str) -> TokenBucket:
+        bucket = self.buckets.get(name)
+        if bucket is None:
+            rate = self.rate_limits.get(name)
+            if rate is None:
+                interval_ms = getattr(self.exchanges[name], 'rateLimit', None)
+                rate = 1000.0 / interval_ms if interval_ms else self.default_rate
+            bucket = self.buckets[name] = TokenBucket(rate)
+        return bucket
+
+    def plan(self, symbols: Optional[List[str]] = None):
+        """{exchange: [symbol batches]} - one batch per request"""
+        symbols = self.symbols if symbols is None else symbols
+        plan = {}
+        for name, exchange in self.exchanges.items():
+            if not symbols:
+                plan[name] = []
+            elif (getattr(exchange, 'has', None) or {}).get('fetchTickers'):
+                plan[name] = [symbols[i:i + self.bulk_chunk] for i in range(0, len(symbols), self.bulk_chunk)]
+            else:
+                plan[name] = [[s] for s in symbols]
+        return plan
+
+    def budget(self):
+        """Requests needed per cycle vs. what each exchange's limit allows"""
+        return {
+            name: {
+                'requests_per_cycle': len(batches),
+                'allowed_per_cycle': self._bucket(name).rate * self.cycle_seconds,
+            }
+            for name, batches in self.plan().items()
+        }
+
+    async def _fetch(self, name: str, batch: List[str]):
+        exchange = self.exchanges[name]
+        await self._bucket(name).acquire()
+        self.requests_made[name] += 1
+        try:
+            if len(batch) == 1 and not (getattr(exchange, 'has', None) or {}).get('fetchTickers'):
+                tickers = {batch[0]: await exchange.fetch_ticker(batch[0])}
+            else:
+                tickers = await exchange.fetch_tickers(batch)
+        except Exception:
+            self.errors[name] += 1
+            return
+        fetched_at = time.time()
+        for symbol in batch:
+            ticker = tickers.get(symbol)
+            if ticker:
+                self.quotes[(symbol, name)] = {
+                    'exchange': name,
+                    'symbol': symbol,
+                    'bid': ticker.get('bid'),
+                    'ask': ticker.get('ask'),
+                    'last': ticker.get('last'),
+                    'fetched_at': fetched_at,
+                }
+
+    async def fetch_all_tickers(self, name: str) -> Dict[str, dict]:
+        """Every ticker the exchange lists, in one request; {} on error or if unsupported"""
+        exchange = self.exchanges[name]
+        if not (getattr(exchange, 'has', None) or {}).get('fetchTickers'):
+            return {}
+        await self._bucket(name).acquire()
+        self.requests_made[name] += 1
+        try:
+            return await exchange.fetch_tickers()
+        except Exception:
+            self.errors[name] += 1
+            return {}
+
+    async def fetch_order_book(self, name: str, symbol: str, limit: int = 100) -> Optional[OrderBook]:
+        """One L2 book, inside the exchange's rate limit; None on error"""
+        await self._bucket(name).acquire()
+        self.requests_made[name] += 1
+        try:
+            raw = await self.exchanges[name].fetch_order_book(symbol, limit)
+        except Exception:
+            self.errors[name] += 1
+            return None
+        book = OrderBook(name, symbol)
+        book.apply_snapshot(raw.get('bids') or (), raw.get('asks') or (), raw.get('timestamp'))
+        return book
+
+    async def refresh(self, symbols: Optional[List[str]] = None):
+        """Fetch everything once, as fast as the rate limits allow"""
+        plan = self.plan(symbols)
+        await asyncio.gather(*(self._fetch(name, batch) for name, batches in plan.items() for batch in batches))
+        return self.snapshot(symbols)
+
+    async def run_cycle(self):
+        """
+        Fetch everything once, pacing each exchange's requests evenly
+        across `cycle_seconds`; returns the snapshot as soon as the last
+        request is done, so it can be acted on while fresh. Call
+        wait_next_cycle() before starting the next one.
+        """
+        start = time.monotonic()
+        self._cycle_end = start + self.cycle_seconds
+
+        async def paced(name, batches):
+            interval = self.cycle_seconds / len(batches)
+            for n, batch in enumerate(batches):
+                delay = start + n * interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                await self._fetch(name, batch)
+
+        await asyncio.gather(*(paced(name, batches) for name, batches in self.plan().items() if batches))
+        return self.snapshot()
+
+    async def wait_next_cycle(self):
+        """Sleep out whatever is left of the cycle the last run_cycle() started"""
+        remaining = self._cycle_end - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    def snapshot(self, symbols: Optional[List[str]] = None, max_age: Optional[float] = None):
+        """{symbol: {exchange: quote}} with each quote's current 'age' in seconds"""
+        now = time.time()
+        wanted = set(self.symbols if symbols is None else symbols)
+        prices = {s: {} for s in wanted}
+        for (symbol, name), quote in self.quotes.items():
+            if symbol not in wanted:
+                continue
+            age = now - quote['fetched_at']
+            if max_age is None or age <= max_age:
+                prices[symbol][name] = dict(quote, age=age)
+        return prices
+
+    def freshness(self):
+        """Per exchange: number of quotes and their oldest / newest age"""
+        now = time.time()
+        report = {}
+        for (symbol, name), quote in self.quotes.items():
+            age = now - quote['fetched_at']
+            r = report.setdefault(name, {'quotes': 0, 'oldest_age': 0.0, 'newest_age': float('inf')})
+            r['quotes'] += 1
+            r['oldest_age'] = max(r['oldest_age'], age)
+            r['newest_age'] = min(r['newest_age'], age)
+        return report
@@ -0,0 +1,251 @@
+"""
+TICK STORE
+Compact columnar recordings of market data, memory-mapped on disk
+
+A recording is a directory holding one raw file per column plus a small
+meta.json. Every row is one price level:
+
+    msg  uint32   message number; the rows of one message are contiguous
+    ts   float64  event time, ms since the epoch
+    kind uint8    SCAN (a ticker snapshot), SNAPSHOT or UPDATE (book feed)
+    exchange, symbol  uint16 codes into the lists in meta.json
+    side int8     0 bid, 1 ask, -1 marker row for a message with no levels
+    price, qty    float64; for tickers `qty` holds the quote's fetch time (ms)
+
+About 34 bytes a level, appended through np.memmap files that grow in
+chunks, and read back without parsing anything. TickStore turns rows
+back into the agent's own inputs: scan snapshots for evaluate() and
+feed messages for the streaming path.
+"""
+import json
+import os
+import time
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+
+SCAN, SNAPSHOT, UPDATE = 0, 1, 2
+KINDS = {'snapshot': SNAPSHOT, 'update': UPDATE}
+
+COLUMNS = {
+    'msg': np.uint32,
+    'ts': np.float64,
+    'kind': np.uint8,
+    'exchange': np.uint16,
+    'symbol': np.uint16,
+    'side': np.int8,
+    'price': np.float64,
+    'qty': np.float64,
+}
+
+
+class TickRecorder:
+    """
+    Appends scans and book messages to a recording
+    Rows are buffered and written on flush() (every `flush_rows` rows and
+    on close); meta.json is replaced atomically, so a reader never sees
+    a row count beyond what is on disk.
+    """
+
+    def __init__(self, path: str, chunk_rows: int = 1 << 16, flush_rows: int = 8192):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.flush_rows = flush_rows
+        os.makedirs(path, exist_ok=True)
+        meta = _read_meta(path)
+        self.rows = meta['rows'] if meta else 0
+        self.exchanges = meta['exchanges'] if meta else []
+        self.symbols = meta['symbols'] if meta else []
+        self._codes = {'exchange': {e: i for i, e in enumerate(self.exchanges)},
+                       'symbol': {s: i for i, s in enumerate(self.symbols)}}
+        self.messages = meta['messages'] if meta else 0
+        self._buffer = {name: [] for name in COLUMNS}
+        self._maps = {}
+        self._capacity = 0
+
+    def _code(self, column: str, value: str) -> int:
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+            (self.exchanges if column == 'exchange' else self.symbols).append(value)
+        return code
+
+    def _append(self, ts, kind, exchange, symbol, side, price, qty):
+        b = self._buffer
+        b['msg'].append(self.messages)
+        b['ts'].append(ts)
+        b['kind'].append(kind)
+        b['exchange'].append(exchange)
+        b['symbol'].append(symbol)
+        b['side'].append(side)
+        b['price'].append(price)
+        b['qty'].append(qty)
+
+    def record_scan(self, prices: Dict[str, Dict[str, dict]], ts: Optional[float] = None):
+        """One ScanScheduler snapshot, {symbol: {exchange: quote}}, as one message"""
+        ts = time.time() * 1000 if ts is None else ts
+        nan = float('nan')
+        for symbol, quotes in prices.items():
+            s = self._code('symbol', symbol)
+            for exchange, quote in quotes.items():
+                e = self._code('exchange', exchange)
+                fetched = quote.get('fetched_at')
+                fetched = fetched * 1000 if fetched else nan
+                self._append(ts, SCAN, e, s, 0, quote.get('bid') or nan, fetched)
+                self._append(ts, SCAN, e, s, 1, quote.get('ask') or nan, fetched)
+        self._end_message()
+
+    def record_book(self, message: dict):
+        """One feed message in the market_stream protocol"""
+        ts = message.get('ts')
+        ts = time.time() * 1000 if ts is None else ts
+        kind = KINDS[message.get('type', 'update')]
+        e, s = self._code('exchange', message['exchange']), self._code('symbol', message['symbol'])
+        start = len(self._buffer['msg'])
+        for side, levels in ((0, message.get('bids') or ()), (1, message.get('asks') or ())):
+            for level in levels:
+                self._append(ts, kind, e, s, side, float(level[0]), float(level[1]))
+        if len(self._buffer['msg']) == start:
+            self._append(ts, kind, e, s, -1, float('nan'), float('nan'))
+        self._end_message()
+
+    def _end_message(self):
+        self.messages += 1
+        if len(self._buffer['msg']) >= self.flush_rows:
+            self.flush()
+
+    def _ensure_capacity(self, rows: int):
+        if rows <= self._capacity:
+            return
+        capacity = max(rows, self._capacity + self.chunk_rows)
+        capacity = -(-capacity // self.chunk_rows) * self.chunk_rows
+        for name, dtype in COLUMNS.items():
+            self._maps.pop(name, None)
+            file = os.path.join(self.path, f"{name}.col")
+            with open(file, 'ab') as f:
+                f.truncate(capacity * np.dtype(dtype).itemsize)
+            self._maps[name] = np.memmap(file, dtype=dtype, mode='r+', shape=(capacity,))
+        self._capacity = capacity
+
+    def flush(self):
+        n = len(self._buffer['msg'])
+        if n:
+            self._ensure_capacity(self.rows + n)
+            for name, values in self._buffer.items():
+                self._maps[name][self.rows:self.rows + n] = values
+                self._maps[name].flush()
+                values.clear()
+            self.rows += n
+        meta = {
+            'version': 1,
+            'rows': self.rows,
+            'messages': self.messages,
+            'columns': {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+            'exchanges': self.exchanges,
+            'symbols': self.symbols,
+        }
+        tmp = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, 'meta.json'))
+
+    def close(self):
+        self.flush()
+        self._maps.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_meta(path: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(path, 'meta.json')) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+class TickStore:
+    """Read-only view of a recording; columns are memory-mapped arrays"""
+
+    def __init__(self, path: str):
+        meta = _read_meta(path)
+        if meta is None:
+            raise FileNotFoundError(f"no recording at {path}")
+        self.path = path
+        self.rows = meta['rows']
+        self.exchanges: List[str] = meta['exchanges']
+        self.symbols: List[str] = meta['symbols']
+        self.columns = {}
+        for name, dtype in meta['columns'].items():
+            if self.rows:
+                self.columns[name] = np.memmap(os.path.join(path, f"{name}.col"), dtype=np.dtype(dtype),
+                                               mode='r', shape=(self.rows,))
+            else:
+                self.columns[name] = np.empty(0, dtype=np.dtype(dtype))
+
+    def __len__(self):
+        return self.rows
+
+    def time_range(self):
+        """(first, last) event time in ms, or None if empty"""
+        if not self.rows:
+            return None
+        ts = self.columns['ts']
+        return float(ts[0]), float(ts[-1])
+
+    def messages(self, chunk_rows: int = 1 << 18) -> Iterator[dict]:
+        """
+        Messages in recorded order: scans as {'type': 'scan', 'ts', 'prices'}
+        and book messages in the market_stream protocol
+        """
+        c = self.columns
+        start = 0
+        while start < self.rows:
+            end = min(start + chunk_rows, self.rows)
+            msg = c['msg'][start:end]
+            if end < self.rows:
+                # Never split a message across chunks
+                end = start + int(np.searchsorted(msg, msg[-1]))
+                if end == start:
+                    chunk_rows *= 2
+                    continue
+                msg = msg[:end - start]
+            bounds = np.flatnonzero(np.diff(msg)) + 1
+            cols = {name: c[name][start:end].tolist() for name in ('ts', 'kind', 'exchange', 'symbol', 'side', 'price', 'qty')}
+            lo = 0
+            for hi in bounds.tolist() + [end - start]:
+                yield self._message(cols, lo, hi)
+                lo = hi
+            start = end
+
+    def _message(self, cols, lo, hi):
+        kind, exchanges, symbols = cols['kind'][lo], self.exchanges, self.symbols
+        if kind == SCAN:
+            ts = cols['ts'][lo]
+            prices = {}
+            for i in range(lo, hi, 2):
+                symbol = symbols[cols['symbol'][i]]
+                exchange = exchanges[cols['exchange'][i]]
+                bid, ask, fetched = cols['price'][i], cols['price'][i + 1], cols['qty'][i]
+                fetched = fetched if fetched == fetched else ts
+                prices.setdefault(symbol, {})[exchange] = {
+                    'exchange': exchange, 'symbol': symbol,
+                    'bid': bid if bid == bid else None, 'ask': ask if ask == ask else None,
+                    'fetched_at': fetched / 1000.0, 'age': (ts - fetched) / 1000.0,
+                }
+            return {'type': 'scan', 'ts': ts, 'prices': prices}
+        bids, asks = [], []
+        side, price, qty = cols['side'], cols['price'], cols['qty']
+        for i in range(lo, hi):
+            if side[i] == 0:
+                bids.append((price[i], qty[i]))
+            elif side[i] == 1:
+                asks.append((price[i], qty[i]))
+        return {'type': 'snapshot' if kind == SNAPSHOT else 'update',
+                'exchange': exchanges[cols['exchange'][lo]], 'symbol': symbols[cols['symbol'][lo]],
+                'bids': bids, 'asks': asks, 'ts': cols['ts'][lo]}
@@ -0,0 +1,210 @@
+"""
+TRIANGULAR ARBITRAGE
+Cyclic arbitrage across the markets of each exchange
+
+Every currency on every exchange is a node. A market BASE/QUOTE gives two
+edges: QUOTE -> BASE (buy at the ask) and BASE -> QUOTE (sell at the bid),
+weighted -log(rate after taker fee). A cycle whose weights sum below zero
+ends with more of the starting currency than it began with.
+
+Triangles are enumerated once per set of markets and scored as one array
+sum; a ticker update rewrites its two edge weights and re-scores only the
+triangles through them. Longer cycles are found with a vectorized
+Bellman-Ford pass that can be bounded by time.
+"""
+import math
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class CurrencyGraph:
+    """
+    Directed currency graph for one or more exchanges
+    Markets can be added at any time; the triangle index is rebuilt
+    lazily on the next scan after the set of markets changes.
+    """
+
+    def __init__(self, taker_fees: Optional[Dict[str, float]] = None):
+        self.taker_fees = dict(taker_fees or {})
+        self.nodes: Dict[Tuple[str, str], int] = {}
+        self.node_names: List[Tuple[str, str]] = []
+        self.markets: Dict[Tuple[str, str], Tuple[int, int]] = {}  # (exchange, symbol) -> (buy edge, sell edge)
+        self._src = []
+        self._dst = []
+        self._edge_market = []
+        self._weight_buffer = np.full(64, np.inf)
+        self.weights = self._weight_buffer[:0]
+        self._triangles = None
+        self._dirty = set()
+        self.updates = 0
+
+    def _node(self, exchange: str, currency: str) -> int:
+        key = (exchange, currency)
+        node = self.nodes.get(key)
+        if node is None:
+            node = self.nodes[key] = len(self.node_names)
+            self.node_names.append(key)
+        return node
+
+    def add_market(self, exchange: str, symbol: str) -> bool:
+        """Add a spot market 'BASE/QUOTE'; derivatives ('...:SETTLE') are skipped"""
+        if (exchange, symbol) in self.markets or ':' in symbol or '/' not in symbol:
+            return False
+        base, quote = symbol.split('/', 1)
+        b, q = self._node(exchange, base), self._node(exchange, quote)
+        first = len(self._src)
+        self._src += [q, b]
+        self._dst += [b, q]
+        self._edge_market += [(exchange, symbol)] * 2
+        self.markets[(exchange, symbol)] = (first, first + 1)
+        if first + 2 > len(self._weight_buffer):
+            # Grow geometrically; `weights` stays a view of the buffer
+            grown = np.full(2 * len(self._weight_buffer), np.inf)
+            grown[:first] = self._weight_buffer[:first]
+            self._weight_buffer = grown
+        self.weights = self._weight_buffer[:first + 2]
+        self._triangles = None
+        return True
+
+    def update(self, exchange: str, symbol: str, bid, ask):
+        """New quote for one market: rewrite its two edges"""
+        edges = self.markets.get((exchange, symbol))
+        if edges is None:
+            if not self.add_market(exchange, symbol):
+                return
+            edges = self.markets[(exchange, symbol)]
+        keep = 1.0 - self.taker_fees.get(exchange, 0.0)
+        buy, sell = edges
+        buy_weight = math.log(ask / keep) if ask and ask > 0 else math.inf
+        sell_weight = -math.log(bid * keep) if bid and bid > 0 else math.inf
+        # Unchanged quotes (most of a full ticker refresh) leave nothing to re-score
+        if buy_weight != self.weights[buy] or sell_weight != self.weights[sell]:
+            self.weights[buy] = buy_weight
+            self.weights[sell] = sell_weight
+            self._dirty.update(edges)
+            self.updates += 1
+
+    def load_tickers(self, exchange: str, tickers: Dict[str, dict]):
+        """update() for every ticker from a ccxt fetch_tickers() response"""
+        for symbol, ticker in tickers.items():
+            self.update(exchange, symbol, ticker.get('bid'), ticker.get('ask'))
+
+    def _build_triangles(self):
+        """All directed 3-cycles, once each, plus an edge -> triangles index"""
+        out = defaultdict(dict)
+        for e, (s, d) in enumerate(zip(self._src, self._dst)):
+            out[s][d] = e
+        triangles = []
+        for a, a_out in out.items():
+            for b, ab in a_out.items():
+                if b <= a:
+                    continue
+                for c, bc in out.get(b, {}).items():
+                    # a is the smallest node, so each cycle is listed once
+                    if c <= a:
+                        continue
+                    ca = out.get(c, {}).get(a)
+                    if ca is not None:
+                        triangles.append((ab, bc, ca))
+        edges = np.array(triangles, dtype=np.intp).reshape(-1, 3)
+        # CSR index from edge id to the triangles that use it
+        flat = edges.ravel()
+        order = np.argsort(flat, kind='stable')
+        self._by_edge = order // 3
+        self._by_edge_start = np.searchsorted(flat[order], np.arange(len(self._src) + 1))
+        self._triangles = edges
+        self._triangle_sums = self.weights[edges].sum(axis=1)
+        self._dirty.clear()
+
+    def _rescore(self):
+        if self._triangles is None:
+            self._build_triangles()
+        elif self._dirty:
+            dirty = np.fromiter(self._dirty, dtype=np.intp)
+            self._dirty.clear()
+            starts, ends = self._by_edge_start[dirty], self._by_edge_start[dirty + 1]
+            if (ends - starts).sum():
+                touched = np.unique(np.concatenate([self._by_edge[s:e] for s, e in zip(starts, ends)]))
+                self._triangle_sums[touched] = self.weights[self._triangles[touched]].sum(axis=1)
+
+    @property
+    def triangle_count(self) -> int:
+        if self._triangles is None:
+            self._build_triangles()
+        return len(self._triangles)
+
+    def _describe(self, edges, total: float):
+        path = [self.node_names[self._src[e]] for e in edges]
+        return {
+            'exchange': path[0][0],
+            'path': [currency for _, currency in path] + [path[0][1]],
+            'markets': [self._edge_market[e][1] for e in edges],
+            'sides': ['buy' if e % 2 == 0 else 'sell' for e in edges],
+            'profit_pct': float(np.expm1(-total) * 100.0),
+        }
+
+    def triangles(self, min_profit_pct: float = 0.0) -> List[dict]:
+        """Every triangle returning more than min_profit_pct after fees"""
+        self._rescore()
+        threshold = -np.log1p(min_profit_pct / 100.0)
+        hits = np.nonzero(self._triangle_sums < threshold)[0]
+        hits = hits[np.argsort(self._triangle_sums[hits])]
+        return [self._describe(self._triangles[i].tolist(), self._triangle_sums[i]) for i in hits]
+
+    def _pred_cycle(self, pred, starts):
+        """A negative cycle in the predecessor graph reachable from `starts`"""
+        for node in starts[:16].tolist():
+            order = {}
+            while node not in order and pred[node] >= 0:
+                order[node] = len(order)
+                node = self._src[pred[node]]
+            if node not in order:
+                continue
+            # Walked back round a loop: collect its edges in forward order
+            cycle, cur = [], node
+            while True:
+                cycle.append(int(pred[cur]))
+                cur = self._src[pred[cur]]
+                if cur == node:
+                    break
+            cycle.reverse()
+            total = float(self.weights[cycle].sum())
+            if total < 0:
+                return self._describe(cycle, total)
+        return None
+
+    def negative_cycle(self, max_passes: Optional[int] = None, budget: Optional[float] = None,
+                       check_every: int = 8):
+        """
+        One negative cycle of any length via Bellman-Ford from a virtual
+        source, or None. The predecessor graph is checked for a cycle every
+        `check_every` passes, so a cycle is usually found long before the
+        worst-case |V| passes; `max_passes` / `budget` (seconds) bound it.
+        """
+        deadline = time.perf_counter() + budget if budget else None
+        finite = np.isfinite(self.weights)
+        ids = np.nonzero(finite)[0]
+        src = np.asarray(self._src, dtype=np.intp)[ids]
+        dst = np.asarray(self._dst, dtype=np.intp)[ids]
+        weights = self.weights[ids]
+        dist = np.zeros(len(self.node_names))
+        pred = np.full(len(self.node_names), -1, dtype=np.intp)
+        passes = max_passes or len(self.node_names)
+        for n in range(passes):
+            candidate = dist[src] + weights
+            best = dist.copy()
+            np.minimum.at(best, dst, candidate)
+            changed = (candidate <= best[dst]) & (candidate < dist[dst] - 1e-12)
+            if not changed.any():
+                return None
+            pred[dst[changed]] = ids[changed]
+            dist = best
+            out_of_time = deadline is not None and time.perf_counter() > deadline
+            if (n + 1) % check_every == 0 or out_of_time or n == passes - 1:
+                cycle = self._pred_cycle(pred, dst[changed])
+                if cycle or out_of_time:
+                    return cycle
+        return None
@@ -0,0 +1,303 @@
+"""
+YIELD INDEX
+Persistent APY ranking of every pool the DeFi agent has seen
+
+Pools are keyed by (protocol, asset, type) and kept in sorted lists
+ordered by APY, highest first: one over all pools, plus one per
+protocol, asset or type once something has filtered on that facet. An
+APY change moves one entry in each list (a few bisects, in place if its
+rank holds), so a scan costs the pools that changed, not a re-sort of
+everything, and top(k, ...) is a slice of the right list.
+
+A TopView follows one top-k ranking and reports only what changed in
+it since it last looked: pools that entered, left or moved, or whose
+APY changed in place.
+
+    index = YieldIndex()
+    view = index.view(10, type='Lending')
+    index.sync('Aave', aave_yields)
+    for change in view.changes():
+        ...
+"""
+import math
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+FACETS = ('protocol', 'asset', 'type')
+
+PoolKey = Tuple[str, str, str]
+
+
+class SortedBlocks:
+    """
+    Values sorted by a float score, in blocks of at most 2 * `load`, so an
+    insert or delete shifts one block rather than the whole list. Scores
+    live in their own lists, so bisecting compares floats, not tuples.
+    """
+    __slots__ = ('load', 'scores', 'values', 'maxes', 'size')
+
+    def __init__(self, load: int = 256):
+        self.load = load
+        self.scores: List[List[float]] = []
+        self.values: List[list] = []
+        self.maxes: List[float] = []
+        self.size = 0
+
+    def add(self, score: float, value):
+        scores, maxes = self.scores, self.maxes
+        self.size += 1
+        if not scores:
+            scores.append([score])
+            self.values.append([value])
+            maxes.append(score)
+            return
+        i = bisect_right(maxes, score)
+        if i == len(maxes):
+            i -= 1
+            scores[i].append(score)
+            self.values[i].append(value)
+            maxes[i] = score
+        else:
+            j = bisect_right(scores[i], score)
+            scores[i].insert(j, score)
+            self.values[i].insert(j, value)
+        if len(scores[i]) > 2 * self.load:
+            load, block, values = self.load, scores[i], self.values[i]
+            scores[i:i + 1] = [block[:load], block[load:]]
+            self.values[i:i + 1] = [values[:load], values[load:]]
+            maxes[i:i + 1] = [block[load - 1], block[-1]]
+
+    @classmethod
+    def from_sorted(cls, scores: List[float], values: list, load: int = 256) -> 'SortedBlocks':
+        """Build from entries already in score order, without bisecting"""
+        blocks = cls(load)
+        if len(scores) <= load:
+            blocks.scores, blocks.values, blocks.maxes = [scores], [values], [scores[-1]]
+        else:
+            blocks.scores = [scores[i:i + load] for i in range(0, len(scores), load)]
+            blocks.values = [values[i:i + load] for i in range(0, len(values), load)]
+            blocks.maxes = [block[-1] for block in blocks.scores]
+        blocks.size = len(scores)
+        return blocks
+
+    def _find(self, score: float, value):
+        """(block, position) of an entry; equal scores are told apart by value"""
+        i = bisect_left(self.maxes, score)
+        j = bisect_left(self.scores[i], score)
+        values = self.values[i]
+        while values[j] != value:
+            j += 1
+            if j == len(values):
+                i, j = i + 1, 0
+                values = self.values[i]
+        return i, j
+
+    def remove(self, score: float, value):
+        i, j = self._find(score, value)
+        block = self.scores[i]
+        del block[j], self.values[i][j]
+        self.size -= 1
+        if block:
+            self.maxes[i] = block[-1]
+        else:
+            del self.scores[i], self.values[i], self.maxes[i]
+
+    def replace(self, old: float, new: float, value):
+        """remove() + add(), in place when the new score keeps the entry's position"""
+        i, j = self._find(old, value)
+        scores, block = self.scores, self.scores[i]
+        lower = block[j - 1] if j else (self.maxes[i - 1] if i else new)
+        upper = block[j + 1] if j + 1 < len(block) else (scores[i + 1][0] if i + 1 < len(scores) else new)
+        if lower <= new <= upper:
+            block[j] = new
+            if j + 1 == len(block):
+                self.maxes[i] = new
+        else:
+            self.remove(old, value)
+            self.add(new, value)
+
+    def index(self, score: float, value) -> int:
+        i, j = self._find(score, value)
+        return sum(len(b) for b in self.scores[:i]) + j
+
+    def __iter__(self):
+        for block in self.values:
+            yield from block
+
+    def head(self, k: int) -> list:
+        found = []
+        for block in self.values:
+            found.extend(block[:k - len(found)])
+            if len(found) >= k:
+                break
+        return found
+
+    def __len__(self):
+        return self.size
+
+
+class YieldIndex:
+    """Pools ranked by APY, overall and within each protocol, asset and type"""
+
+    def __init__(self):
+        self.pools: Dict[PoolKey, dict] = {}
+        self._ranked = SortedBlocks()
+        # Facet rankings are built the first time a query filters on that
+        # facet, and only then maintained, so unused facets cost nothing
+        self._facets: Dict[int, Dict[str, SortedBlocks]] = {}
+        self._by_protocol: Dict[str, set] = {}
+        self.updates = 0
+
+    @staticmethod
+    def key(pool: dict) -> PoolKey:
+        return pool['protocol'], pool['asset'], pool['type']
+
+    def _facet(self, i: int) -> Dict[str, SortedBlocks]:
+        lists = self._facets.get(i)
+        if lists is None:
+            # The overall ranking, split by facet value, is already in order
+            groups = {}
+            for scores, keys in zip(self._ranked.scores, self._ranked.values):
+                for score, key in zip(scores, keys):
+                    group = groups.get(key[i])
+                    if group is None:
+                        group = groups[key[i]] = ([], [])
+                    group[0].append(score)
+                    group[1].append(key)
+            lists = self._facets[i] = {value: SortedBlocks.from_sorted(*group) for value, group in groups.items()}
+        return lists
+
+    def update(self, pool: dict) -> bool:
+        """Insert or re-rank one pool; False if nothing changed"""
+        apy = pool['apy']
+        if not math.isfinite(apy):
+            return False
+        key = pool['protocol'], pool['asset'], pool['type']
+        old = self.pools.get(key)
+        self.pools[key] = pool
+        if old is None:
+            self._ranked.add(-apy, key)
+            for i, lists in self._facets.items():
+                entries = lists.get(key[i])
+                if entries is None:
+                    entries = lists[key[i]] = SortedBlocks()
+                entries.add(-apy, key)
+            protocol = self._by_protocol.get(key[0])
+            if protocol is None:
+                protocol = self._by_protocol[key[0]] = set()
+            protocol.add(key)
+        elif old['apy'] == apy:
+            return False
+        else:
+            previous = -old['apy']
+            self._ranked.replace(previous, -apy, key)
+            for i, lists in self._facets.items():
+                lists[key[i]].replace(previous, -apy, key)
+        self.updates += 1
+        return True
+
+    def remove(self, key: PoolKey) -> bool:
+        old = self.pools.pop(key, None)
+        if old is None:
+            return False
+        score = -old['apy']
+        self._ranked.remove(score, key)
+        for i, lists in self._facets.items():
+            entries = lists[key[i]]
+            entries.remove(score, key)
+            if not entries:
+                del lists[key[i]]
+        self._by_protocol[key[0]].discard(key)
+        self.updates += 1
+        return True
+
+    def apply(self, pools: Iterable[dict]) -> int:
+        """Per-pool deltas; returns how many pools moved"""
+        update = self.update
+        return sum(update(pool) for pool in pools)
+
+    def sync(self, protocol: str, pools: List[dict]) -> int:
+        """
+        A protocol's complete current listing: update its pools and drop
+        the ones it no longer lists. Only call it with a successful fetch.
+        """
+        changed = self.apply(pools)
+        gone = self._by_protocol.get(protocol, set()) - {self.key(pool) for pool in pools}
+        for key in gone:
+            changed += self.remove(key)
+        return changed
+
+    def _entries(self, protocol: Optional[str], asset: Optional[str], type: Optional[str]):
+        """The narrowest list covering the filters, and the filters it leaves"""
+        filters = [(i, v) for i, v in enumerate((protocol, asset, type)) if v is not None]
+        if not filters:
+            return self._ranked, []
+        # Scan the smallest facet list; check the remaining filters per entry
+        lists = [(self._facet(i).get(v) or SortedBlocks(), i) for i, v in filters]
+        entries, used = min(lists, key=lambda item: len(item[0]))
+        return entries, [(i, v) for i, v in filters if i != used]
+
+    def top(self, k: int = 10, protocol: Optional[str] = None, asset: Optional[str] = None,
+            type: Optional[str] = None) -> List[dict]:
+        """The k highest-APY pools matching the filters, best first"""
+        entries, rest = self._entries(protocol, asset, type)
+        if not rest:
+            return [self.pools[key] for key in entries.head(k)]
+        found = []
+        for key in entries:
+            if all(key[i] == v for i, v in rest):
+                found.append(self.pools[key])
+                if len(found) >= k:
+                    break
+        return found
+
+    def rank(self, key: PoolKey) -> Optional[int]:
+        """1-based overall rank of a pool, None if unknown"""
+        pool = self.pools.get(key)
+        if pool is None:
+            return None
+        return self._ranked.index(-pool['apy'], key) + 1
+
+    def view(self, k: int = 10, protocol: Optional[str] = None, asset: Optional[str] = None,
+             type: Optional[str] = None) -> 'TopView':
+        return TopView(self, k, protocol, asset, type)
+
+    def __len__(self):
+        return len(self.pools)
+
+
+class TopView:
+    """One top-k ranking, diffed against what it last reported"""
+
+    def __init__(self, index: YieldIndex, k: int, protocol: Optional[str], asset: Optional[str], type: Optional[str]):
+        self.index = index
+        self.k = k
+        self.filters = (protocol, asset, type)
+        self._last: Dict[PoolKey, Tuple[int, float]] = {}
+        self._last_updates = -1
+
+    def current(self) -> List[dict]:
+        return self.index.top(self.k, *self.filters)
+
+    def changes(self) -> List[dict]:
+        """
+        What moved since the last call, best rank first: each is the pool
+        plus `rank` and `previous_rank` (None for entered / left)
+        """
+        if self.index.updates == self._last_updates:
+            return []
+        self._last_updates = self.index.updates
+        now = {}
+        changes = []
+        for rank, pool in enumerate(self.current(), 1):
+            key = YieldIndex.key(pool)
+            now[key] = (rank, pool['apy'])
+            before = self._last.get(key)
+            if before != (rank, pool['apy']):
+                changes.append(dict(pool, rank=rank, previous_rank=before[0] if before else None))
+        for key, (rank, apy) in self._last.items():
+            if key not in now:
+                pool = self.index.pools.get(key) or dict(zip(FACETS, key), apy=apy)
+                changes.append(dict(pool, rank=None, previous_rank=rank))
+        self._last = now
+        return changes
@@ -2,19 +2,31 @@
 GUMROAD INTEGRATION
 Handle payments and license key verification
 """
-import requests
+import json
 import sqlite3
 from datetime import datetime
+from typing import Optional
+
+from backend.http_cache import HttpCache
 
 class GumroadIntegration:
     """
     Integrates with Gumroad for payments
     Verifies license keys and manages subscriptions
+
+    Verification goes through an HttpCache: a successful check without
+    `email` is reused for `verify_ttl` seconds, so repeated checks of the
+    same key don't re-post. Checks that increment the uses count always
+    reach Gumroad. License responses carry the buyer's email and purchase,
+    so the default cache is this instance's own and memory-only, never the
+    shared on-disk one.
     """
     
-    def __init__(self, product_permalink):
+    def __init__(self, product_permalink, http_cache: Optional[HttpCache] = None, verify_ttl: float = 300.0):
         self.product_permalink = product_permalink
         self.verify_url = "https://api.gumroad.com/v2/licenses/verify"
+        self.http_cache = http_cache if http_cache is not None else HttpCache(directory=None)
+        self.verify_ttl = verify_ttl
     
     def verify_license(self, license_key: str, email: str = None):
         """Verify a Gumroad license key"""
@@ -27,8 +39,10 @@ class GumroadIntegration:
             payload['increment_uses_count'] = 'true'
         
         try:
-            response = requests.post(self.verify_url, data=payload)
-            data = response.json()
+            # Counting a use is a side effect, so those posts are never served from cache
+            response = self.http_cache.request_sync('POST', self.verify_url, data=payload,
+                                                    ttl=None if email else self.verify_ttl)
+            data = json.loads(response.body)
             
             if data.get('success'):
                 purchase = data.get('purchase', {})
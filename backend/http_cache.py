@@ -0,0 +1,389 @@
+"""
+HTTP CACHE
+Shared conditional-request cache for the agents' and integrations' HTTP calls
+
+Responses are kept in memory (LRU, `max_entries`) and, when `directory`
+is set, on disk so they survive restarts. Freshness follows the server's
+Cache-Control (max-age, no-cache, no-store) or Expires; a per-endpoint TTL
+(`ttl_overrides` by URL prefix, or `ttl=` per call) replaces it. A stale
+entry is revalidated with If-None-Match / If-Modified-Since, and a 304
+reuses the stored body instead of downloading it again.
+
+Concurrent identical requests share one fetch. On the async path disk
+reads and writes run in the loop's executor, never on the loop itself. Only 2xx responses are
+stored, and non-GET requests only when a TTL is given for them, since
+their results can't be assumed repeatable.
+
+    cache = get_cache()
+    response = await cache.get(session, url)           # aiohttp
+    response = cache.request_sync('POST', url, data=payload, ttl=300)  # blocking callers
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+CACHE_DIR = os.environ.get('APEX_HTTP_CACHE_DIR', '.http_cache')
+
+# Headers worth keeping with a stored response
+KEPT_HEADERS = ('content-type', 'etag', 'last-modified', 'cache-control', 'expires', 'date', 'age')
+
+# What _write() leaves in `directory` (sha1 key, suffix, maybe a temp suffix); clear() removes only these
+CACHE_FILE = re.compile(r'[0-9a-f]{40}\.(json|body)(\.\d+\.\d+\.tmp)?')
+
+
+class HTTPStatusError(Exception):
+    def __init__(self, status: int, url: str):
+        super().__init__(f"{status} for {url}")
+        self.status = status
+        self.url = url
+
+
+class CachedResponse:
+    """A response body plus what's needed to judge and revalidate it"""
+    __slots__ = ('url', 'status', 'headers', 'body', 'stored_at', 'max_age', 'cache_status')
+
+    def __init__(self, url: str, status: int, headers: Dict[str, str], body: bytes,
+                 stored_at: float = 0.0, max_age: float = 0.0, cache_status: str = 'miss'):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stored_at = stored_at
+        self.max_age = max_age
+        self.cache_status = cache_status  # 'hit', 'revalidated' or 'miss'
+
+    @property
+    def from_cache(self) -> bool:
+        return self.cache_status != 'miss'
+
+    def fresh(self, now: float) -> bool:
+        return now < self.stored_at + self.max_age
+
+    def json(self):
+        return json.loads(self.body)
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise HTTPStatusError(self.status, self.url)
+
+    def served(self, cache_status: str) -> 'CachedResponse':
+        return CachedResponse(self.url, self.status, self.headers, self.body, self.stored_at, self.max_age, cache_status)
+
+
+def _cache_control(headers: Dict[str, str]) -> Dict[str, Optional[str]]:
+    directives = {}
+    for part in headers.get('cache-control', '').split(','):
+        name, _, value = part.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
+
+
+class HttpCache:
+    """In-memory LRU over an optional on-disk store, with request coalescing"""
+
+    def __init__(self, directory: Optional[str] = CACHE_DIR, max_entries: int = 256,
+                 ttl_overrides: Optional[Dict[str, float]] = None, timeout: float = 10.0):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl_overrides = dict(ttl_overrides or {})
+        self.timeout = timeout
+        self._memory: 'OrderedDict[str, CachedResponse]' = OrderedDict()
+        self._inflight = {}
+        self._inflight_sync = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bytes_downloaded = 0
+        self.bytes_saved = 0
+
+    # Keys and storage
+
+    @staticmethod
+    def _key(method: str, url: str, params: Optional[dict], data: Optional[dict]) -> str:
+        parts = [method.upper(), url]
+        if params:
+            parts.append(urllib.parse.urlencode(sorted(params.items())))
+        if data:
+            parts.append(urllib.parse.urlencode(sorted(data.items())) if isinstance(data, dict) else str(data))
+        return hashlib.sha1('\n'.join(parts).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _recall(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+            return entry
+
+    def _load(self, key: str) -> Optional[CachedResponse]:
+        """Memory, then disk; blocking"""
+        entry = self._recall(key)
+        if entry is not None or not self.directory:
+            return entry
+        try:
+            with open(self._path(key) + '.json', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(self._path(key) + '.body', 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        if len(body) != meta['size']:
+            return None
+        entry = CachedResponse(meta['url'], meta['status'], meta['headers'], body, meta['stored_at'], meta['max_age'])
+        self._remember(key, entry)
+        return entry
+
+    def _remember(self, key: str, entry: CachedResponse):
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _write(self, key: str, entry: CachedResponse, body_changed: bool = True):
+        """Persist an entry to disk; blocking"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        if body_changed:
+            with open(path + '.body' + tmp, 'wb') as f:
+                f.write(entry.body)
+            os.replace(path + '.body' + tmp, path + '.body')
+        meta = {'url': entry.url, 'status': entry.status, 'headers': entry.headers, 'size': len(entry.body),
+                'stored_at': entry.stored_at, 'max_age': entry.max_age}
+        with open(path + '.json' + tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(path + '.json' + tmp, path + '.json')
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.directory and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if CACHE_FILE.fullmatch(name):
+                    os.remove(os.path.join(self.directory, name))
+
+    # Freshness
+
+    def _lifetime(self, url: str, headers: Dict[str, str], ttl: Optional[float]) -> Optional[float]:
+        """Seconds the response stays fresh; None if it must not be stored"""
+        if ttl is not None:
+            return ttl
+        for prefix, seconds in self.ttl_overrides.items():
+            if url.startswith(prefix):
+                return seconds
+        directives = _cache_control(headers)
+        if 'no-store' in directives:
+            return None
+        if 'no-cache' in directives:
+            return 0.0
+        age = float(headers.get('age') or 0)
+        if (directives.get('max-age') or '').isdigit():
+            return max(0.0, int(directives['max-age']) - age)
+        if 'expires' in headers:
+            try:
+                expires = parsedate_to_datetime(headers['expires']).timestamp()
+                date = parsedate_to_datetime(headers['date']).timestamp() if 'date' in headers else time.time()
+            except (TypeError, ValueError):
+                return 0.0
+            return max(0.0, expires - date)
+        return 0.0
+
+    def _explicit_ttl(self, url: str, ttl: Optional[float]) -> bool:
+        return ttl is not None or any(url.startswith(prefix) for prefix in self.ttl_overrides)
+
+    # The protocol, shared by both transports
+
+    def _cacheable(self, method: str, url: str, ttl: Optional[float]) -> bool:
+        return method.upper() == 'GET' or self._explicit_ttl(url, ttl)
+
+    def _begin(self, entry: Optional[CachedResponse]):
+        """
+        (fresh response to return, or None; stale entry; conditional headers)
+        `entry` is what's stored for the request, loaded by the transport
+        """
+        self.requests += 1
+        if entry is None:
+            return None, None, {}
+        if entry.fresh(time.time()):
+            self.hits += 1
+            self.bytes_saved += len(entry.body)
+            return entry.served('hit'), entry, {}
+        conditional = {}
+        if entry.headers.get('etag'):
+            conditional['If-None-Match'] = entry.headers['etag']
+        if entry.headers.get('last-modified'):
+            conditional['If-Modified-Since'] = entry.headers['last-modified']
+        return None, entry, conditional
+
+    def _finish(self, key: str, method: str, url: str, ttl: Optional[float], entry: Optional[CachedResponse],
+                status: int, headers: Dict[str, str], body: bytes):
+        """
+        (response, disk write or None): the write is _write()'s arguments,
+        left to the transport so the async one can run it off the loop
+        """
+        headers = {k: v for k, v in ((k.lower(), v) for k, v in headers.items()) if k in KEPT_HEADERS}
+        now = time.time()
+        if status == 304 and entry is not None:
+            self.revalidated += 1
+            self.bytes_saved += len(entry.body)
+            merged = dict(entry.headers, **headers)
+            lifetime = self._lifetime(url, merged, ttl)
+            refreshed = CachedResponse(entry.url, entry.status, merged, entry.body, now, lifetime or 0.0)
+            self._remember(key, refreshed)
+            return refreshed.served('revalidated'), self._disk_write(key, refreshed, False)
+        self.misses += 1
+        self.bytes_downloaded += len(body)
+        response = CachedResponse(url, status, headers, body, now)
+        if 200 <= status < 300 and (method.upper() == 'GET' or self._explicit_ttl(url, ttl)):
+            lifetime = self._lifetime(url, headers, ttl)
+            # Worth storing if it stays fresh for a while or can be revalidated
+            if lifetime is not None and (lifetime > 0 or 'etag' in headers or 'last-modified' in headers):
+                response.max_age = lifetime
+                self._remember(key, response)
+                return response, self._disk_write(key, response, True)
+        return response, None
+
+    def _disk_write(self, key: str, entry: CachedResponse, body_changed: bool):
+        return (key, entry, body_changed) if self.directory else None
+
+    # Async transport (aiohttp)
+
+    async def get(self, session, url: str, params: Optional[dict] = None, ttl: Optional[float] = None) -> CachedResponse:
+        return await self.request(session, 'GET', url, params=params, ttl=ttl)
+
+    async def request(self, session, method: str, url: str, params: Optional[dict] = None,
+                      data: Optional[dict] = None, ttl: Optional[float] = None) -> CachedResponse:
+        """
+        `session` is an aiohttp.ClientSession; identical requests already
+        in flight are joined rather than repeated
+        """
+        key = self._key(method, url, params, data)
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            self.requests += 1
+            response = await asyncio.shield(task)
+            self.bytes_saved += len(response.body)
+            return response.served('hit')
+        task = asyncio.ensure_future(self._fetch(session, key, method, url, params, data, ttl))
+        self._inflight[key] = task
+
+        def done(task):
+            self._inflight.pop(key, None)
+            if not task.cancelled():
+                # Every caller may have timed out already; don't leave the error unretrieved
+                task.exception()
+
+        task.add_done_callback(done)
+        # Shielded: one caller giving up doesn't cancel the fetch for the others
+        return await asyncio.shield(task)
+
+    async def _fetch(self, session, key, method, url, params, data, ttl) -> CachedResponse:
+        loop = asyncio.get_running_loop()
+        entry = None
+        if self._cacheable(method, url, ttl):
+            entry = self._recall(key)
+            if entry is None and self.directory:
+                entry = await loop.run_in_executor(None, self._load, key)
+        fresh, entry, conditional = self._begin(entry)
+        if fresh is not None:
+            return fresh
+        async with session.request(method, url, params=params, data=data, headers=conditional) as response:
+            body = await response.read()
+            status, headers = response.status, dict(response.headers)
+        result, write = self._finish(key, method, url, ttl, entry, status, headers, body)
+        if write is not None:
+            await loop.run_in_executor(None, self._write, *write)
+        return result
+
+    # Blocking transport (urllib), for synchronous callers
+
+    def request_sync(self, method: str, url: str, params: Optional[dict] = None,
+                     data: Optional[dict] = None, ttl: Optional[float] = None) -> CachedResponse:
+        """As request(), for blocking code; concurrent threads share one fetch"""
+        key = self._key(method, url, params, data)
+        with self._lock:
+            waiting = self._inflight_sync.get(key)
+            if waiting is None:
+                waiting = self._inflight_sync[key] = [threading.Event(), None, None]
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            waiting[0].wait()
+            self.coalesced += 1
+            self.requests += 1
+            if waiting[2] is not None:
+                raise waiting[2]
+            self.bytes_saved += len(waiting[1].body)
+            return waiting[1].served('hit')
+        try:
+            waiting[1] = self._fetch_sync(key, method, url, params, data, ttl)
+            return waiting[1]
+        except Exception as e:
+            waiting[2] = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight_sync[key]
+            waiting[0].set()
+
+    def _fetch_sync(self, key, method, url, params, data, ttl) -> CachedResponse:
+        fresh, entry, conditional = self._begin(self._load(key) if self._cacheable(method, url, ttl) else None)
+        if fresh is not None:
+            return fresh
+        full_url = f"{url}?{urllib.parse.urlencode(params)}" if params else url
+        encoded = urllib.parse.urlencode(data).encode() if data else None
+        request = urllib.request.Request(full_url, data=encoded, headers=conditional, method=method.upper())
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, headers, body = response.status, dict(response.headers), response.read()
+        except urllib.error.HTTPError as e:
+            # 304 and error statuses still carry headers (and a body)
+            status, headers, body = e.code, dict(e.headers or {}), e.read()
+        result, write = self._finish(key, method, url, ttl, entry, status, headers, body)
+        if write is not None:
+            self._write(*write)
+        return result
+
+    def stats(self):
+        served = self.hits + self.revalidated + self.coalesced
+        return {
+            'requests': self.requests,
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'coalesced': self.coalesced,
+            'misses': self.misses,
+            'hit_ratio': served / self.requests if self.requests else 0.0,
+            'bytes_downloaded': self.bytes_downloaded,
+            'bytes_saved': self.bytes_saved,
+            'entries': len(self._memory),
+        }
+
+
+_cache: Optional[HttpCache] = None
+
+
+def get_cache(**kwargs) -> HttpCache:
+    """The process-wide cache, created on first use (kwargs apply only then)"""
+    global _cache
+    if _cache is None:
+        _cache = HttpCache(**kwargs)
+    return _cache
@@ -0,0 +1,132 @@
+"""
+AGENT RUNTIME BENCHMARK
+--agents DeFi agents, each watching --watch of --protocols protocols
+served by a local StubProtocolServer, run for --rounds scan intervals of
+--interval seconds on one AgentRuntime, with and without jitter
+
+Reported for each run: how many agents fired in the busiest tick (the
+thundering herd jitter is there to flatten), the worst firing lateness,
+and upstream requests against what the same agents would make fetching
+for themselves. Also measured: memory per idle agent in the runtime vs.
+a thread per agent blocked in sleep (resident memory, Linux only).
+
+    python benchmarks/bench_agent_runtime.py --agents 10000 --interval 10
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agents.agent_runtime import AgentRuntime
+from backend.agents.apy_history import ApyHistory
+from backend.agents.defi_protocols import Aave
+from backend.agents.opportunity_buffer import OpportunityBuffer
+from backend.http_cache import HttpCache
+from benchmarks.stub_defi import StubProtocolServer, aave_payload
+
+
+def runtime(args, adapters, jitter):
+    return AgentRuntime(adapters=adapters, buffer=OpportunityBuffer(), http_cache=HttpCache(directory=None),
+                        history=ApyHistory(), tick=args.interval / 100, jitter=jitter, max_age=args.interval / 4, seed=0)
+
+
+def spawn(rt, args, names):
+    rng = random.Random(0)
+    for i in range(args.agents):
+        rt.spawn(f"defi-{i}", protocols=rng.sample(names, args.watch), interval=args.interval)
+
+
+def idle_agent_bytes(args, adapters, names):
+    rt = runtime(args, adapters, 0.1)
+    gc.collect()
+    tracemalloc.start()
+    spawn(rt, args, names)
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used / args.agents
+
+
+def thread_bytes(count=200):
+    """Resident memory per thread blocked the way the old agent loop was"""
+    if not os.path.exists('/proc/self/statm'):
+        return None
+
+    def rss():
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+    stop = threading.Event()
+    before = rss()
+    threads = [threading.Thread(target=stop.wait) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    used = rss() - before
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return used / count
+
+
+async def run(args, server, payloads, names, jitter):
+    urls = server.urls()
+    adapters = [type(name, (Aave,), {'name': name})(urls[name]) for name in names]
+    requests = sum(server.requests.values())
+    rt = runtime(args, adapters, jitter)
+    # Spawned before the loop runs them, so the first firings keep their jitter
+    spawn(rt, args, names)
+    async with rt:
+        rng = random.Random(1)
+        for _ in range(args.rounds):
+            await asyncio.sleep(args.interval)
+            for name in rng.sample(names, max(1, len(names) // 4)):
+                payloads[name] = aave_payload({f"TOKEN{j}": rng.uniform(0, 0.2) for j in range(args.assets)})
+    stats = rt.stats()
+    return stats, sum(server.requests.values()) - requests
+
+
+async def bench(args):
+    rng = random.Random(0)
+    names = [f"protocol{i}" for i in range(args.protocols)]
+    payloads = {name: aave_payload({f"TOKEN{j}": rng.uniform(0, 0.2) for j in range(args.assets)}) for name in names}
+    async with StubProtocolServer(payloads, latency=0.02) as server:
+        print(f"{args.agents} agents watching {args.watch} of {args.protocols} protocols, "
+              f"every {args.interval:g}s for {args.rounds} rounds")
+        for label, jitter in (('no jitter', 0.0), (f"jitter {args.jitter:.0%}", args.jitter)):
+            start = time.perf_counter()
+            stats, requests = await run(args, server, payloads, names, jitter)
+            elapsed = time.perf_counter() - start
+            alone = stats['fired'] * args.watch
+            print(f"  {label:11s} {stats['fired']:6d} firings, busiest tick {stats['busiest_tick']:5d} agents, "
+                  f"max lateness {stats['max_lateness'] * 1e3:6.1f} ms, {requests} upstream requests "
+                  f"(vs {alone} fetching alone), {elapsed:.1f} s")
+        adapters = [type(name, (Aave,), {'name': name})(server.urls()[name]) for name in names]
+    per_agent = idle_agent_bytes(args, adapters, names)
+    per_thread = thread_bytes()
+    line = f"  idle agent: {per_agent / 1e3:.2f} kB in the runtime"
+    if per_thread is not None:
+        line += f" vs. {per_thread / 1e3:.1f} kB resident per sleeping thread (plus its reserved stack)"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--agents', type=int, default=10000)
+    parser.add_argument('--protocols', type=int, default=10)
+    parser.add_argument('--watch', type=int, default=2)
+    parser.add_argument('--assets', type=int, default=20)
+    parser.add_argument('--interval', type=float, default=10.0)
+    parser.add_argument('--rounds', type=int, default=2)
+    parser.add_argument('--jitter', type=float, default=0.2)
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
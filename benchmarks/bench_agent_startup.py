@@ -0,0 +1,151 @@
+"""
+AGENT STARTUP BENCHMARK
+Market-metadata cost of starting an arbitrage agent, with and without a
+warm MarketCache
+
+Runs offline against synthetic binance-style metadata (--markets markets,
+each with a raw `info` payload like the real exchangeInfo entries):
+
+  - parse: what load_markets() does after its download, raw JSON to set_markets()
+  - cache: MarketCache entry back onto a client, and the entry's size on disk
+  - cold start: a fresh interpreter constructing and opening an agent,
+    then the first load_markets() on a client, with the network disabled
+
+    python benchmarks/bench_agent_startup.py --markets 2500
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.agents.market_cache import MarketCache
+
+COLD_START = """
+import asyncio, os, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from backend.agents.arbitrage_agent import ArbitrageAgent
+imported = time.perf_counter() - start
+
+async def main():
+    t = time.perf_counter()
+    agent = ArbitrageAgent("startup")
+    await agent.open()
+    ready = time.perf_counter() - t
+    client = agent.exchanges['binance']
+    t = time.perf_counter()
+    client.id  # builds the client, importing ccxt
+    built = time.perf_counter() - t
+
+    async def offline(*args, **kwargs):
+        raise ConnectionError("network disabled")
+
+    client.fetch_markets = offline
+    client.fetch_currencies = offline
+    t = time.perf_counter()
+    await client.load_markets()
+    loaded = time.perf_counter() - t
+    print(imported, ready, built, loaded, len(client.markets))
+    await agent.close()
+
+asyncio.run(main())
+"""
+
+
+def synthetic_markets(n):
+    markets = {}
+    for i in range(n):
+        base, quote = f"C{i}", ['USDT', 'BTC', 'ETH', 'BNB'][i % 4]
+        info = {
+            'symbol': f"{base}{quote}", 'status': 'TRADING', 'baseAsset': base, 'baseAssetPrecision': 8,
+            'quoteAsset': quote, 'quotePrecision': 8, 'quoteAssetPrecision': 8, 'baseCommissionPrecision': 8,
+            'quoteCommissionPrecision': 8, 'orderTypes': ['LIMIT', 'LIMIT_MAKER', 'MARKET', 'STOP_LOSS_LIMIT', 'TAKE_PROFIT_LIMIT'],
+            'icebergAllowed': True, 'ocoAllowed': True, 'otoAllowed': True, 'quoteOrderQtyMarketAllowed': True,
+            'allowTrailingStop': True, 'cancelReplaceAllowed': True, 'isSpotTradingAllowed': True,
+            'isMarginTradingAllowed': False,
+            'filters': [
+                {'filterType': 'PRICE_FILTER', 'minPrice': '0.00000100', 'maxPrice': '1000000.00000000', 'tickSize': '0.00000100'},
+                {'filterType': 'LOT_SIZE', 'minQty': '0.00100000', 'maxQty': '9000000.00000000', 'stepSize': '0.00100000'},
+                {'filterType': 'ICEBERG_PARTS', 'limit': 10},
+                {'filterType': 'MARKET_LOT_SIZE', 'minQty': '0.00000000', 'maxQty': '92141578.00000000', 'stepSize': '0.00000000'},
+                {'filterType': 'TRAILING_DELTA', 'minTrailingAboveDelta': 10, 'maxTrailingAboveDelta': 2000,
+                 'minTrailingBelowDelta': 10, 'maxTrailingBelowDelta': 2000},
+                {'filterType': 'PERCENT_PRICE_BY_SIDE', 'bidMultiplierUp': '5', 'bidMultiplierDown': '0.2',
+                 'askMultiplierUp': '5', 'askMultiplierDown': '0.2', 'avgPriceMins': 5},
+                {'filterType': 'NOTIONAL', 'minNotional': '5.00000000', 'applyMinToMarket': True,
+                 'maxNotional': '9000000.00000000', 'applyMaxToMarket': False, 'avgPriceMins': 5},
+                {'filterType': 'MAX_NUM_ORDERS', 'maxNumOrders': 200},
+                {'filterType': 'MAX_NUM_ALGO_ORDERS', 'maxNumAlgoOrders': 5},
+            ],
+            'permissions': [], 'permissionSets': [['SPOT', 'MARGIN', 'TRD_GRP_004', 'TRD_GRP_005', 'TRD_GRP_006']],
+            'defaultSelfTradePreventionMode': 'EXPIRE_MAKER',
+            'allowedSelfTradePreventionModes': ['EXPIRE_TAKER', 'EXPIRE_MAKER', 'EXPIRE_BOTH'],
+        }
+        markets[f"{base}/{quote}"] = {
+            'id': f"{base}{quote}", 'symbol': f"{base}/{quote}", 'base': base, 'quote': quote,
+            'baseId': base, 'quoteId': quote, 'type': 'spot', 'spot': True, 'margin': False, 'swap': False,
+            'future': False, 'option': False, 'contract': False, 'active': True, 'taker': 0.001, 'maker': 0.001,
+            'precision': {'amount': 0.001, 'price': 1e-06},
+            'limits': {'amount': {'min': 0.001, 'max': 9000000.0}, 'price': {'min': 1e-06, 'max': 1000000.0},
+                       'cost': {'min': 5.0, 'max': 9000000.0}},
+            'info': info,
+        }
+    currencies = {f"C{i}": {'id': f"C{i}", 'code': f"C{i}", 'active': True, 'fee': 0.01, 'precision': 1e-08,
+                            'info': {'coin': f"C{i}", 'networkList': [{'network': 'ETH', 'withdrawFee': '0.01'}]}}
+                  for i in range(n)}
+    return markets, currencies
+
+
+def bench(args):
+    import ccxt.async_support as ccxt
+
+    markets, currencies = synthetic_markets(args.markets)
+    raw = json.dumps({'symbols': [m['info'] for m in markets.values()]})
+    client = ccxt.binance()
+
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        json.loads(raw)
+        client.set_markets(markets, currencies)
+    parse = (time.perf_counter() - start) / args.rounds
+
+    directory = tempfile.mkdtemp(prefix='markets-')
+    cache = MarketCache(directory)
+    size = cache.save('binance', client.markets, client.currencies)
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        cache.apply(client, cache.load('binance'))
+    cached = (time.perf_counter() - start) / args.rounds
+    asyncio.run(client.close())
+
+    env = dict(os.environ, APEX_MARKET_CACHE_DIR=directory)
+    out = subprocess.run([sys.executable, '-c', COLD_START.format(root=ROOT)], env=env,
+                         capture_output=True, text=True, check=True).stdout.split()
+    imported, ready, built, loaded, count = map(float, out)
+
+    print(f"{args.markets} markets")
+    print(f"  raw exchangeInfo payload:        {len(raw) / 1e6:6.1f} MB, parse + set_markets {parse * 1e3:7.1f} ms (plus the download)")
+    print(f"  market cache entry:              {size / 1e6:6.2f} MB gzipped, load + apply       {cached * 1e3:7.1f} ms")
+    print(f"  cold start, fresh interpreter, network disabled:")
+    print(f"    import arbitrage_agent:          {imported * 1e3:7.1f} ms (numpy, aiohttp; ccxt is deferred)")
+    print(f"    construct + open agent:          {ready * 1e3:7.1f} ms (no clients built yet)")
+    print(f"    first use of a client:           {built * 1e3:7.1f} ms (ccxt import + construct)")
+    print(f"    load_markets() from cache:       {loaded * 1e3:7.1f} ms ({count:.0f} markets)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--markets', type=int, default=2500)
+    parser.add_argument('--rounds', type=int, default=3)
+    bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
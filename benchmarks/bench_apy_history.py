@@ -0,0 +1,110 @@
+"""
+APY HISTORY BENCHMARK
+Recording --scans scans of --series (protocol, asset) APYs: the
+memory-mapped ApyHistory vs. the obvious alternative, a Python list of
+samples per series with statistics computed when asked and the whole
+thing saved as JSON
+
+Measured per scan: recording every series, then reading the rolling
+mean and volatility of all of them; and after the last scan, the memory
+held and how long a restart takes to get the history back.
+
+    python benchmarks/bench_apy_history.py --series 2000 --scans 100
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agents.apy_history import ApyHistory
+
+
+def scans(args):
+    rng = random.Random(0)
+    apys = [rng.lognormvariate(1.0, 1.0) for _ in range(args.series)]
+    ts = 1_700_000_000.0
+    for _ in range(args.scans):
+        ts += args.interval
+        apys = [apy * rng.uniform(0.98, 1.02) for apy in apys]
+        yield ts, [{'protocol': f"protocol{i % 50}", 'asset': f"TOKEN{i}", 'apy': apy} for i, apy in enumerate(apys)]
+
+
+def bench_lists(args, directory):
+    history = {}
+    start = time.perf_counter()
+    for ts, yields in scans(args):
+        for y in yields:
+            history.setdefault((y['protocol'], y['asset']), []).append((ts, y['apy']))
+        for samples in history.values():
+            window = [apy for _, apy in samples[-args.window:]]
+            statistics.fmean(window), statistics.pstdev(window)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    copy = {key: list(samples) for key, samples in history.items()}
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del copy
+    file = os.path.join(directory, 'history.json')
+    with open(file, 'w') as f:
+        json.dump([[list(key), samples] for key, samples in history.items()], f)
+    start = time.perf_counter()
+    with open(file) as f:
+        history = {tuple(key): samples for key, samples in json.load(f)}
+    reload = time.perf_counter() - start
+    return elapsed, memory, reload
+
+
+def bench_history(args, directory):
+    path = os.path.join(directory, 'apy_history')
+    history = ApyHistory(path, capacity=args.series, raw_len=args.raw_len, window=args.window)
+    keys = None
+    start = time.perf_counter()
+    for ts, yields in scans(args):
+        history.add_many(yields, ts)
+        keys = keys or [(y['protocol'], y['asset']) for y in yields]
+        for key in keys:
+            history.stats(*key)
+    elapsed = time.perf_counter() - start
+    history.close()
+    start = time.perf_counter()
+    reopened = ApyHistory(path)
+    reopen = time.perf_counter() - start
+    check = reopened.stats(*keys[0])
+    return elapsed, reopened.nbytes(), reopen, check
+
+
+def bench(args):
+    directory = tempfile.mkdtemp()
+    try:
+        lists, list_memory, reload = bench_lists(args, directory)
+        indexed, nbytes, reopen, check = bench_history(args, directory)
+    finally:
+        shutil.rmtree(directory)
+    assert check['samples'] == args.scans
+    print(f"{args.series} series, {args.scans} scans {args.interval:g}s apart, window {args.window}")
+    print(f"  lists + statistics: {lists / args.scans * 1e3:8.2f} ms/scan, {list_memory / args.series / 1e3:6.1f} kB/series "
+          f"({args.scans} samples each, grows every scan), JSON reload {reload * 1e3:7.1f} ms")
+    print(f"  ApyHistory:         {indexed / args.scans * 1e3:8.2f} ms/scan, {nbytes / args.series / 1e3:6.1f} kB/series "
+          f"(fixed: {args.raw_len} raw, 30 d hourly, 1 y daily), reopen {reopen * 1e3:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--series', type=int, default=2000)
+    parser.add_argument('--scans', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=300.0)
+    parser.add_argument('--window', type=int, default=288)
+    parser.add_argument('--raw-len', type=int, default=576)
+    bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+ARBITRAGE SCAN BENCHMARK
+Wall time of one find_arbitrage() scan against a local stub exchange
+
+Every stub request takes --latency seconds. A scan that overlaps all
+(exchange, symbol) fetches should take about one latency; the old
+symbol-by-symbol loop took one latency per symbol.
+
+    python benchmarks/bench_arbitrage_scan.py --exchanges 3 --symbols 10 --latency 0.1
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agents.arbitrage_agent import ArbitrageAgent
+from backend.agents.scan_scheduler import ScanScheduler
+from benchmarks.stub_exchange import StubExchangeServer, stub_clients
+
+
+def make_prices(exchanges, symbols):
+    prices = {}
+    for e, name in enumerate(exchanges):
+        prices[name] = {}
+        for s, symbol in enumerate(symbols):
+            mid = 100.0 * (s + 1) * (1 + 0.004 * e)
+            prices[name][symbol] = {'bid': mid * 0.9995, 'ask': mid * 1.0005, 'last': mid}
+    return prices
+
+
+async def bench(args):
+    exchanges = [f"ex{i}" for i in range(args.exchanges)]
+    symbols = [f"SYM{i}/USDT" for i in range(args.symbols)]
+    async with StubExchangeServer(make_prices(exchanges, symbols), latency=args.latency) as server:
+        async with aiohttp.ClientSession() as session:
+            clients = stub_clients(server.url, exchanges, session)
+            if args.per_symbol_api:
+                for client in clients.values():
+                    client.has = {'fetchTicker': True}
+            agent = ArbitrageAgent("bench", exchanges=clients, rate_limits={name: 1000.0 for name in exchanges})
+            await agent.find_arbitrage(symbols)  # warm the connection pool
+
+            before = sum(server.requests.values())
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                found = await agent.find_arbitrage(symbols)
+            concurrent = (time.perf_counter() - start) / args.rounds
+            requests = (sum(server.requests.values()) - before) / args.rounds
+
+            start = time.perf_counter()
+            for _ in range(args.rounds):
+                for symbol in symbols:
+                    await agent.find_arbitrage([symbol])
+            per_symbol = (time.perf_counter() - start) / args.rounds
+
+    print(f"{args.exchanges} exchanges x {args.symbols} symbols, {args.latency * 1e3:.0f} ms stub latency")
+    print(f"  all fetches overlapped: {concurrent * 1e3:8.1f} ms/scan   ({len(found)} opportunities, {requests:.0f} requests)")
+    print(f"  symbol by symbol:       {per_symbol * 1e3:8.1f} ms/scan")
+    print("  budget per 30s cycle at 5 req/s per exchange:")
+    scheduler = ScanScheduler(clients, symbols, cycle_seconds=30.0)
+    for name, b in scheduler.budget().items():
+        print(f"    {name}: {b['requests_per_cycle']} requests needed, {b['allowed_per_cycle']:.0f} allowed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exchanges', type=int, default=3)
+    parser.add_argument('--symbols', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.1)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--per-symbol-api', action='store_true', help="hide fetch_tickers, forcing one request per symbol")
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+ASYNC HANDLER BENCHMARK
+Threadpool `def` handlers vs `async def` handlers on the DB executor thread
+
+Both apps run the same queries as main.py's tasks polling and deploy
+paths, driven in-process over ASGI at the given concurrency. Reports
+throughput, p50/p99 latency and peak thread count for each model.
+
+    python benchmarks/bench_async_handlers.py --concurrency 200 --requests 5000
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LIST_SQL = "SELECT id, created_at, status, agent_id, task_description FROM tasks WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT 50"
+INSERT_SQL = "INSERT INTO tasks (agent_id, user_id, task_description, status) VALUES (?, ?, ?, 'queued')"
+
+
+def build_apps():
+    import db
+    from fastapi import FastAPI
+
+    sync_app = FastAPI()
+
+    @sync_app.get("/tasks/{user_id}")
+    def sync_tasks(user_id: int):
+        return {"tasks": len(db.fetch_all(LIST_SQL, (user_id,)))}
+
+    @sync_app.post("/deploy/{user_id}")
+    def sync_deploy(user_id: int):
+        return {"id": db.execute(INSERT_SQL, ("bench", user_id, "bench"))}
+
+    async_app = FastAPI()
+
+    @async_app.get("/tasks/{user_id}")
+    async def async_tasks(user_id: int):
+        return {"tasks": len(await db.executor.fetch_all(LIST_SQL, (user_id,)))}
+
+    @async_app.post("/deploy/{user_id}")
+    async def async_deploy(user_id: int):
+        return {"id": await db.executor.execute(INSERT_SQL, ("bench", user_id, "bench"))}
+
+    return sync_app, async_app
+
+
+async def drive(app, total, concurrency, users, deploy_ratio):
+    import httpx
+
+    latencies = []
+    peak_threads = threading.active_count()
+    remaining = iter(range(total))
+    rng = random.Random(0)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker():
+            nonlocal peak_threads
+            for _ in remaining:
+                user_id = rng.randrange(users) + 1
+                start = time.perf_counter()
+                if rng.random() < deploy_ratio:
+                    r = await client.post(f"/deploy/{user_id}")
+                else:
+                    r = await client.get(f"/tasks/{user_id}")
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+                peak_threads = max(peak_threads, threading.active_count())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'rps': total / elapsed,
+        'p50_ms': statistics.median(latencies) * 1e3,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1e3,
+        'peak_threads': peak_threads,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--tasks-per-user', type=int, default=200)
+    parser.add_argument('--deploy-ratio', type=float, default=0.1)
+    args = parser.parse_args()
+
+    os.environ['APEX_DB_PATH'] = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    import db
+
+    with db.pool.transaction() as conn:
+        conn.execute('CREATE TABLE tasks (id INTEGER PRIMARY KEY, agent_id TEXT, user_id INTEGER, task_description TEXT, status TEXT DEFAULT "running", result_data TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+        conn.execute('CREATE INDEX idx_tasks_user_created ON tasks (user_id, created_at)')
+        conn.executemany(INSERT_SQL, [("seed", u + 1, "seed") for u in range(args.users) for _ in range(args.tasks_per_user)])
+
+    sync_app, async_app = build_apps()
+    print(f"{args.requests} requests, {args.concurrency} concurrent, {args.deploy_ratio:.0%} deploys")
+    for name, app in (("sync def + threadpool", sync_app), ("async def + db executor", async_app)):
+        r = asyncio.run(drive(app, args.requests, args.concurrency, args.users, args.deploy_ratio))
+        print(f"  {name:<24} {r['rps']:>8.0f} req/s   p50 {r['p50_ms']:>7.1f} ms   p99 {r['p99_ms']:>7.1f} ms   peak threads {r['peak_threads']}")
+    db.executor.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+BACKTEST BENCHMARK
+Record a synthetic session to a TickStore, then replay it through the
+arbitrage agent as fast as possible and report the speed-up over the
+recording's own clock
+
+The session is --updates book messages --interval-ms apart plus one
+ticker scan every --scan-seconds, for --exchanges x --symbols books.
+Profile the replay with:
+
+    python -m cProfile -s cumtime benchmarks/bench_backtest.py --updates 50000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agents.backtest import Backtester, threshold_sweep
+from backend.agents.market_stream import synthetic_messages
+from backend.agents.order_book import OrderBook
+from backend.agents.tick_store import TickRecorder, TickStore
+
+
+def record(path, args):
+    exchanges = [f"ex{i}" for i in range(args.exchanges)]
+    symbols = [f"SYM{i}/USDT" for i in range(args.symbols)]
+    messages = synthetic_messages(exchanges, symbols, args.updates, interval_ms=args.interval_ms)
+    books = {}
+    origin = 1.7e12
+    next_scan = 0.0
+    start = time.perf_counter()
+    with TickRecorder(path) as recorder:
+        for message in messages:
+            message = dict(message, ts=origin + message['ts'])
+            recorder.record_book(message)
+            key = (message['exchange'], message['symbol'])
+            book = books.get(key) or books.setdefault(key, OrderBook(*key))
+            if message['type'] == 'snapshot':
+                book.apply_snapshot(message['bids'], message['asks'])
+            else:
+                book.apply_delta(message['bids'], message['asks'])
+            if message['ts'] >= next_scan:
+                # What the REST scanner would have seen at this moment
+                prices = {}
+                for (exchange, symbol), b in books.items():
+                    bid, ask = b.top()
+                    prices.setdefault(symbol, {})[exchange] = {'bid': bid, 'ask': ask, 'fetched_at': message['ts'] / 1000.0}
+                recorder.record_scan(prices, ts=message['ts'])
+                next_scan = message['ts'] + args.scan_seconds * 1000
+    elapsed = time.perf_counter() - start
+    return recorder, elapsed
+
+
+def bench(args):
+    path = tempfile.mkdtemp(prefix='ticks-')
+    try:
+        recorder, elapsed = record(path, args)
+        size = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+        print(f"recorded {recorder.messages} messages / {recorder.rows} rows in {elapsed:.2f}s "
+              f"({recorder.rows / elapsed:,.0f} rows/s), {size / 1e6:.1f} MB on disk "
+              f"({size / recorder.rows:.0f} bytes/row incl. preallocation)")
+
+        store = TickStore(path)
+        fees = {name: args.fee for name in store.exchanges}
+        result = Backtester(store, taker_fees=fees).run()
+        print(f"replayed {result['messages']} messages ({result['scans']} scans) in {result['wall_seconds']:.2f}s: "
+              f"{result['messages_per_second']:,.0f} msg/s, "
+              f"{result['speedup']:,.0f}x the recorded {result['recorded_seconds']:.0f}s")
+        print(f"  {result['opportunities']} opportunities at min_profit_pct 0.5, ${result['net_profit']:.2f} net summed over sized signals")
+
+        print("threshold sweep:")
+        for threshold, r in threshold_sweep(store, args.thresholds, fees).items():
+            print(f"  {threshold:5.2f}%: {r['opportunities']:6d} opportunities, ${r['net_profit']:10.2f} net, "
+                  f"{r['speedup']:,.0f}x real time")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--exchanges', type=int, default=5)
+    parser.add_argument('--symbols', type=int, default=50)
+    parser.add_argument('--updates', type=int, default=20000)
+    parser.add_argument('--interval-ms', type=float, default=10.0)
+    parser.add_argument('--scan-seconds', type=float, default=30.0)
+    parser.add_argument('--fee', type=float, default=0.001)
+    parser.add_argument('--thresholds', type=float, nargs='+', default=[0.2, 0.5, 1.0])
+    bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
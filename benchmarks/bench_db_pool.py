@@ -0,0 +1,160 @@
+"""
+DB POOL BENCHMARK
+Requests/sec of main.py's database work, connect-per-request vs pooled WAL
+
+Each simulated request does what a handler does: authenticate the API key,
+then either list the user's tasks (polling) or insert an agent + task
+(deploy). A background writer completes tasks the way the executor does.
+
+    python benchmarks/bench_db_pool.py --clients 64 --seconds 10
+"""
+import argparse
+import os
+import random
+import secrets
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, email TEXT UNIQUE, license_key TEXT, api_key TEXT UNIQUE)',
+    'CREATE TABLE IF NOT EXISTS agents (id INTEGER PRIMARY KEY, user_id INTEGER, agent_id TEXT, agent_type TEXT)',
+    'CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY, agent_id TEXT, user_id INTEGER, task_description TEXT, status TEXT DEFAULT "running", result_data TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)',
+)
+
+
+def seed(path, users, tasks_per_user):
+    conn = sqlite3.connect(path)
+    for sql in SCHEMA:
+        conn.execute(sql)
+    keys = []
+    for i in range(users):
+        key = f"apex_{secrets.token_urlsafe(32)}"
+        keys.append(key)
+        user_id = conn.execute("INSERT INTO users (email, license_key, api_key) VALUES (?, ?, ?)", (f"user{i}@example.com", "BENCH", key)).lastrowid
+        conn.executemany(
+            "INSERT INTO tasks (agent_id, user_id, task_description, status, result_data) VALUES (?, ?, ?, 'completed', ?)",
+            [(f"bench-{i}-{n}", user_id, "seed task", '{"status": "completed"}') for n in range(tasks_per_user)],
+        )
+    conn.commit()
+    conn.close()
+    return keys
+
+
+class DirectBackend:
+    """The baseline: sqlite3.connect() + close() around every query"""
+
+    name = 'connect-per-request'
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch_one(self, sql, params=()):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    def fetch_all(self, sql, params=()):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def execute(self, sql, params=()):
+        conn = sqlite3.connect(self.path)
+        try:
+            rowid = conn.execute(sql, params).lastrowid
+            conn.commit()
+            return rowid
+        finally:
+            conn.close()
+
+
+class PooledBackend:
+    name = 'pooled-wal'
+
+    def __init__(self, path, size):
+        import db
+        self.pool = db.ConnectionPool(path, size=size)
+
+    def fetch_one(self, sql, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def fetch_all(self, sql, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def execute(self, sql, params=()):
+        with self.pool.transaction() as conn:
+            return conn.execute(sql, params).lastrowid
+
+
+def run(backend, keys, clients, seconds, deploy_ratio):
+    stop = threading.Event()
+    counts = [0] * clients
+    errors = [0] * clients
+
+    def client(n):
+        rng = random.Random(n)
+        while not stop.is_set():
+            try:
+                user = backend.fetch_one("SELECT id, email FROM users WHERE api_key = ?", (rng.choice(keys),))
+                if rng.random() < deploy_ratio:
+                    backend.execute("INSERT INTO tasks (agent_id, user_id, task_description) VALUES (?, ?, ?)", (f"bench-{secrets.token_hex(4)}", user[0], "bench"))
+                else:
+                    backend.fetch_all("SELECT id, agent_id, task_description, status, result_data FROM tasks WHERE user_id = ? ORDER BY created_at DESC", (user[0],))
+                counts[n] += 1
+            except sqlite3.OperationalError:
+                errors[n] += 1
+
+    def completer():
+        while not stop.is_set():
+            try:
+                backend.execute("UPDATE tasks SET status='completed', result_data=? WHERE id = (SELECT MAX(id) FROM tasks)", ('{"status": "completed"}',))
+            except sqlite3.OperationalError:
+                pass
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    threads.append(threading.Thread(target=completer))
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return sum(counts) / elapsed, sum(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=64)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--tasks-per-user', type=int, default=50)
+    parser.add_argument('--deploy-ratio', type=float, default=0.1)
+    parser.add_argument('--pool-size', type=int, default=16)
+    args = parser.parse_args()
+
+    print(f"{args.clients} clients, {args.seconds:.0f}s each, {args.deploy_ratio:.0%} deploys")
+    for make in (lambda p: DirectBackend(p), lambda p: PooledBackend(p, args.pool_size)):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'bench.db')
+            keys = seed(path, args.users, args.tasks_per_user)
+            backend = make(path)
+            rps, errors = run(backend, keys, args.clients, args.seconds, args.deploy_ratio)
+            print(f"  {backend.name:<22} {rps:>10.0f} req/s   {errors} lock errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+DEFI SCAN BENCHMARK
+Time for one DeFiYieldAgent scan of --protocols protocols served by a
+local StubProtocolServer: one after the other on a fresh connection each
+(how the agent used to fetch) vs. the concurrent adapter registry
+
+Each protocol answers after a random --min-latency..--max-latency; one
+of them hangs for --hang seconds, past its --timeout.
+
+    python benchmarks/bench_defi_scan.py --protocols 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agents.apy_history import ApyHistory
+from backend.agents.defi_agent import DeFiYieldAgent
+from backend.agents.defi_protocols import Aave
+from backend.agents.opportunity_buffer import OpportunityBuffer
+from backend.http_cache import HttpCache
+from benchmarks.stub_defi import StubProtocolServer, aave_payload
+
+
+def protocol_adapters(names, urls, timeout):
+    # Aave-shaped protocols under other names
+    return [type(name, (Aave,), {'name': name})(urls[name], timeout) for name in names]
+
+
+async def sequential(adapters):
+    yields = []
+    for adapter in adapters:
+        # A new session per protocol: new TCP connection every time
+        async with aiohttp.ClientSession() as session:
+            try:
+                yields.extend(await asyncio.wait_for(adapter.fetch(session), adapter.timeout))
+            except Exception:
+                pass
+    return yields
+
+
+async def bench(args):
+    rng = random.Random(0)
+    names = [f"protocol{i}" for i in range(args.protocols)]
+    payloads = {name: aave_payload({f"TOKEN{j}": rng.uniform(0.0, 0.2) for j in range(5)}) for name in names}
+    latency = {name: rng.uniform(args.min_latency, args.max_latency) for name in names}
+    latency[names[-1]] = args.hang
+
+    async with StubProtocolServer(payloads, latency=latency) as server:
+        adapters = protocol_adapters(names, server.urls(), args.timeout)
+
+        start = time.perf_counter()
+        found = await sequential(adapters)
+        serial = time.perf_counter() - start
+
+        agent = DeFiYieldAgent("bench", buffer=OpportunityBuffer(), adapters=adapters, http_cache=HttpCache(directory=None),
+                               history=ApyHistory())
+        async with agent:
+            start = time.perf_counter()
+            top = await agent.find_best_yields()
+            concurrent = time.perf_counter() - start
+        failed = [name for name, status in agent.last_scan.items() if not status['ok']]
+
+    slowest = max(v for n, v in latency.items() if n != names[-1])
+    print(f"{args.protocols} protocols, latency {args.min_latency * 1e3:.0f}-{args.max_latency * 1e3:.0f} ms, "
+          f"one hanging {args.hang:g}s (timeout {args.timeout:g}s)")
+    print(f"  sequential, new connection each: {serial:6.2f} s ({len(found)} yields)")
+    print(f"  concurrent adapter registry:     {concurrent:6.2f} s (top {len(top)} kept, "
+          f"slowest healthy protocol {slowest:.2f} s, unavailable: {', '.join(failed) or 'none'})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--protocols', type=int, default=50)
+    parser.add_argument('--min-latency', type=float, default=0.05)
+    parser.add_argument('--max-latency', type=float, default=0.3)
+    parser.add_argument('--hang', type=float, default=5.0)
+    parser.add_argument('--timeout', type=float, default=1.0)
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
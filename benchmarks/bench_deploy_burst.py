@@ -0,0 +1,80 @@
+"""
+DEPLOY BURST BENCHMARK
+Pushes a burst of deploys through the TaskQueue and watches thread count
+
+    python benchmarks/bench_deploy_burst.py --deploys 10000 --users 200
+    python benchmarks/bench_deploy_burst.py --deploys 10000 --users 200 --write-behind
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--deploys', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--per-user-limit', type=int, default=2)
+    parser.add_argument('--task-seconds', type=float, default=0.0, help="simulated work per task")
+    parser.add_argument('--write-behind', action='store_true', help="batch completion updates")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['APEX_DB_PATH'] = os.path.join(tmp, 'burst.db')
+    import db
+    from task_queue import FINISH_SQL, TaskQueue, migrate
+    from write_behind import WriteBehindCommitter
+
+    with db.pool.transaction() as conn:
+        conn.execute('CREATE TABLE tasks (id INTEGER PRIMARY KEY, agent_id TEXT, user_id INTEGER, task_description TEXT, status TEXT DEFAULT "running", result_data TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+        migrate(conn)
+
+    def handler(task):
+        if args.task_seconds:
+            time.sleep(args.task_seconds)
+        return {"status": "completed"}
+
+    committer = WriteBehindCommitter(FINISH_SQL) if args.write_behind else None
+    queue = TaskQueue(handler, workers=args.workers, per_user_limit=args.per_user_limit, poll_interval=0.1, committer=committer)
+    baseline_threads = threading.active_count()
+    if committer:
+        committer.start()
+    queue.start()
+
+    start = time.perf_counter()
+    for n in range(args.deploys):
+        db.execute(
+            "INSERT INTO tasks (agent_id, user_id, task_description, status, enqueued_at) VALUES (?, ?, ?, 'queued', ?)",
+            (f"bench-{n}", n % args.users, "burst", time.time()),
+        )
+        queue.notify()
+    enqueued = time.perf_counter() - start
+
+    peak_threads = threading.active_count()
+    while queue.stats()['queue_depth'] or queue.stats()['running']:
+        peak_threads = max(peak_threads, threading.active_count())
+        time.sleep(0.05)
+    drained = time.perf_counter() - start
+    stats = queue.stats()
+    queue.stop()
+    if committer:
+        committer.close()
+
+    print(f"{args.deploys} deploys from {args.users} users, {args.workers} workers")
+    print(f"  enqueue:      {args.deploys / enqueued:,.0f} deploys/s")
+    print(f"  drain:        {stats['completed'] / drained:,.0f} tasks/s ({drained:.1f}s total)")
+    print(f"  threads:      {baseline_threads} before, {peak_threads} peak")
+    print(f"  queue wait:   avg {stats['wait_avg_seconds']:.2f}s, max {stats['wait_max_seconds']:.2f}s")
+    if committer:
+        print(f"  write-behind: {committer.batches} commits, avg batch {committer.stats()['avg_batch_size']:.1f} rows")
+
+
+if __name__ == "__main__":
+    main()
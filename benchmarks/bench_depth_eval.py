@@ -0,0 +1,100 @@
+"""
+DEPTH WALK BENCHMARK
+Time to size one opportunity by walking both order books, at several
+book depths, against a plain level-by-level Python loop
+
+Each vectorized measurement touches the book first, so the cached NumPy
+view is rebuilt every time, as it would be after a live update.
+
+    python benchmarks/bench_depth_eval.py --depths 10 100 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agents.depth import size_opportunity
+from backend.agents.order_book import OrderBook
+
+BUY_FEE, SELL_FEE, WITHDRAWAL = 0.001, 0.001, 0.0005
+
+
+def make_books(levels, rng):
+    buy, sell = OrderBook('buy', 'BTC/USDT'), OrderBook('sell', 'BTC/USDT')
+    # Sell venue's bids start 1% above the buy venue's asks and the two
+    # books cross about half way down
+    asks = 100.0 + np.cumsum(rng.uniform(0.5, 1.5, levels)) * (2.0 / levels)
+    bids = 101.0 - np.cumsum(rng.uniform(0.5, 1.5, levels)) * (2.0 / levels)
+    buy.apply_snapshot([], [[p, q] for p, q in zip(asks, rng.uniform(0.1, 2.0, levels))])
+    sell.apply_snapshot([[p, q] for p, q in zip(bids, rng.uniform(0.1, 2.0, levels))], [])
+    return buy, sell
+
+
+def python_walk(buy, sell):
+    """Reference: consume levels one at a time while the next unit pays"""
+    asks = list(zip(buy.asks.keys, buy.asks.qtys))
+    bids = [(-k, q) for k, q in zip(sell.bids.keys, sell.bids.qtys)]
+    i = j = 0
+    ask_left, bid_left = asks[0][1], bids[0][1]
+    qty = cost = proceeds = 0.0
+    while i < len(asks) and j < len(bids):
+        if bids[j][0] * (1 - SELL_FEE) - asks[i][0] * (1 + BUY_FEE) <= 0:
+            break
+        take = min(ask_left, bid_left)
+        qty += take
+        cost += take * asks[i][0]
+        proceeds += take * bids[j][0]
+        ask_left -= take
+        bid_left -= take
+        if ask_left <= 0:
+            i += 1
+            ask_left = asks[i][1] if i < len(asks) else 0
+        if bid_left <= 0:
+            j += 1
+            bid_left = bids[j][1] if j < len(bids) else 0
+    if not qty:
+        return None
+    net = proceeds * (1 - SELL_FEE) - cost * (1 + BUY_FEE) - WITHDRAWAL * proceeds / qty
+    return qty, net
+
+
+def bench(levels, rounds, rng):
+    buy, sell = make_books(levels, rng)
+    expected = python_walk(buy, sell)
+    result = size_opportunity(buy, sell, BUY_FEE, SELL_FEE, WITHDRAWAL)
+    assert np.allclose((result['quantity'], result['net_profit']), expected), (result, expected)
+
+    top = buy.asks.best()[0]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        buy.asks.set(top, 1.0)  # invalidate the cached arrays
+        size_opportunity(buy, sell, BUY_FEE, SELL_FEE, WITHDRAWAL)
+    vectorized = (time.perf_counter() - start) / rounds
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        python_walk(buy, sell)
+    loop = (time.perf_counter() - start) / rounds
+
+    print(f"  {levels:5d} levels: {vectorized * 1e6:8.1f} us vectorized   {loop * 1e6:8.1f} us python loop   "
+          f"(fills {result['quantity']:.2f} over {result['buy_levels']}/{result['sell_levels']} levels, "
+          f"net ${result['net_profit']:.2f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--depths', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--rounds', type=int, default=2000)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    print("size_opportunity() per call, both books rebuilt into arrays each time:")
+    for levels in args.depths:
+        bench(levels, args.rounds, rng)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+HTTP CACHE BENCHMARK
+Bytes and requests for repeated DeFi scans with and without the shared
+HttpCache, against a local StubProtocolServer
+
+--scans scans of --protocols protocols whose payloads (--assets assets
+each) change on --changing of them between scans:
+
+  - no cache: every scan downloads every payload
+  - revalidate: the server sends ETags only; unchanged payloads come back 304
+  - max-age: the server also sends Cache-Control max-age, so scans inside
+    it don't ask at all
+
+plus --callers concurrent identical requests, coalesced into one.
+
+    python benchmarks/bench_http_cache.py --protocols 20 --scans 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agents.defi_protocols import Aave, fetch_all
+from backend.http_cache import HttpCache
+from benchmarks.stub_defi import StubProtocolServer, aave_payload
+
+
+async def scans(args, max_age, cache):
+    rng = random.Random(0)
+    names = [f"protocol{i}" for i in range(args.protocols)]
+    payloads = {name: aave_payload({f"TOKEN{j}": rng.uniform(0, 0.2) for j in range(args.assets)}) for name in names}
+    async with StubProtocolServer(payloads, max_age=max_age) as server:
+        urls = server.urls()
+        adapters = [type(name, (Aave,), {'name': name})(urls[name]) for name in names]
+        async with aiohttp.ClientSession() as session:
+            start = time.perf_counter()
+            for _ in range(args.scans):
+                yields, _ = await fetch_all(session, adapters, cache)
+                for name in rng.sample(names, args.changing):
+                    payloads[name] = aave_payload({f"TOKEN{j}": rng.uniform(0, 0.2) for j in range(args.assets)})
+            elapsed = time.perf_counter() - start
+        return sum(server.requests.values()), server.bytes_sent, elapsed
+
+
+async def coalescing(args):
+    async with StubProtocolServer({'p': aave_payload({'USDC': 0.04})}, latency=0.05) as server:
+        cache = HttpCache(directory=None)
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(*(cache.get(session, f"{server.url}/p") for _ in range(args.callers)))
+        return server.requests['p'], cache.stats()
+
+
+async def bench(args):
+    print(f"{args.scans} scans of {args.protocols} protocols ({args.assets} assets each), "
+          f"{args.changing} payloads changing between scans")
+    for label, max_age, cache in (('no cache', None, None),
+                                  ('revalidate', None, HttpCache(directory=None)),
+                                  ('max-age 60', 60, HttpCache(directory=None))):
+        requests, sent, elapsed = await scans(args, max_age, cache)
+        line = f"  {label:11s} {requests:5d} requests, {sent / 1e3:9.1f} kB downloaded, {elapsed * 1e3:7.1f} ms"
+        if cache is not None:
+            stats = cache.stats()
+            line += (f"  (hit ratio {stats['hit_ratio']:.0%}: {stats['hits']} fresh, {stats['revalidated']} 304; "
+                     f"{stats['bytes_saved'] / 1e3:.1f} kB saved)")
+        print(line)
+    requests, stats = await coalescing(args)
+    print(f"  {args.callers} concurrent identical requests -> {requests} upstream request ({stats['coalesced']} coalesced)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--protocols', type=int, default=20)
+    parser.add_argument('--assets', type=int, default=200)
+    parser.add_argument('--scans', type=int, default=10)
+    parser.add_argument('--changing', type=int, default=2)
+    parser.add_argument('--callers', type=int, default=100)
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
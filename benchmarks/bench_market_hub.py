@@ -0,0 +1,86 @@
+"""
+MARKET HUB BENCHMARK
+Exchange requests made by N arbitrage agents polling on their own vs.
+the same agents fed by one MarketDataHub, against a local stub exchange
+
+Each agent watches a random --watch of the --symbols symbols.
+
+    python benchmarks/bench_market_hub.py --agents 100 --symbols 20 --cycles 4
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agents.arbitrage_agent import ArbitrageAgent
+from backend.agents.market_hub import MarketDataHub
+from benchmarks.stub_exchange import StubExchangeServer, stub_clients
+
+
+async def run_agents(agents, seconds):
+    tasks = [asyncio.ensure_future(agent.run()) for agent in agents]
+    await asyncio.sleep(seconds)
+    for agent in agents:
+        agent.running = False
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def bench(args):
+    rng = random.Random(0)
+    exchanges = [f"ex{i}" for i in range(args.exchanges)]
+    symbols = [f"SYM{i}/USDT" for i in range(args.symbols)]
+    prices = {name: {s: {'bid': 100.0, 'ask': 100.1, 'last': 100.05} for s in symbols} for name in exchanges}
+    watch = [rng.sample(symbols, args.watch) for _ in range(args.agents)]
+    seconds = args.cycles * args.cycle_seconds
+    limits = {name: 1000.0 for name in exchanges}
+
+    async with StubExchangeServer(prices, latency=args.latency) as server:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=0)) as session:
+            clients = stub_clients(server.url, exchanges, session)
+            results = {}
+            for mode in ('independent', 'hub'):
+                before = sum(server.requests.values())
+                hub = MarketDataHub(clients, cycle_seconds=args.cycle_seconds, rate_limits=limits) if mode == 'hub' else None
+                agents = [ArbitrageAgent(f"arb-{i}", exchanges=clients, symbols=w, cycle_seconds=args.cycle_seconds,
+                                         rate_limits=limits, hub=hub)
+                          for i, w in enumerate(watch)]
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    await run_agents(agents, seconds)
+                elapsed = time.perf_counter() - start
+                results[mode] = (sum(server.requests.values()) - before, elapsed, hub.stats() if hub else None)
+                if hub:
+                    await hub.close()
+
+    print(f"{args.agents} agents, {args.exchanges} exchanges, each agent watching {args.watch} of {args.symbols} symbols, "
+          f"{args.cycles} cycles of {args.cycle_seconds}s")
+    for mode, (requests, elapsed, stats) in results.items():
+        print(f"  {mode:12s} {requests:6d} requests ({requests / args.cycles:7.1f} per cycle)")
+    stats = results['hub'][2]
+    print(f"  hub after the last agent left: {stats['subscribers']} subscribers, {len(stats['symbols'])} symbols polled")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--agents', type=int, default=100)
+    parser.add_argument('--exchanges', type=int, default=3)
+    parser.add_argument('--symbols', type=int, default=20)
+    parser.add_argument('--watch', type=int, default=5)
+    parser.add_argument('--cycles', type=int, default=4)
+    parser.add_argument('--cycle-seconds', type=float, default=0.5)
+    parser.add_argument('--latency', type=float, default=0.01)
+    asyncio.run(bench(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+OPPORTUNITY BUFFER BENCHMARK
+Cost of reporting opportunities: the old print() report vs. publishing to
+an OpportunityBuffer, and the buffer's memory when full
+
+The workload is --reports arbitrage reports drawn from --distinct
+(symbol, buy, sell) opportunities whose profit moves by --churn of a
+reported step, as a streaming agent sees one persistent spread re-detected
+on every book update.
+
+    python benchmarks/bench_opportunity_buffer.py --reports 200000 --distinct 50
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agents.arbitrage_agent import ArbitrageAgent
+from backend.agents.opportunity_buffer import OpportunityBuffer
+
+
+def workload(args):
+    rng = random.Random(0)
+    pairs = [(f"SYM{i}/USDT", f"ex{i % 3}", f"ex{(i + 1) % 3}") for i in range(args.distinct)]
+    profit = {p: 0.6 + rng.random() for p in pairs}
+    opportunities = []
+    for _ in range(args.reports):
+        pair = rng.choice(pairs)
+        if rng.random() < args.churn:
+            profit[pair] = max(0.51, profit[pair] + rng.choice((-0.01, 0.01)))
+        symbol, buy, sell = pair
+        opportunities.append({'symbol': symbol, 'buy_exchange': buy, 'sell_exchange': sell, 'buy_price': 100.0,
+                              'sell_price': 100.0 * (1 + profit[pair] / 100), 'profit_pct': profit[pair],
+                              'timestamp': time.time()})
+    return opportunities
+
+
+def bench(args):
+    opportunities = workload(args)
+
+    agent = ArbitrageAgent("bench", exchanges={}, buffer=OpportunityBuffer(args.capacity))
+    agent.console = True
+    sink = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sink):
+        for opp in opportunities:
+            agent.report(opp)
+    printed = time.perf_counter() - start
+
+    buffer = OpportunityBuffer(args.capacity)
+    agent = ArbitrageAgent("bench", exchanges={}, buffer=buffer)
+    start = time.perf_counter()
+    for opp in opportunities:
+        agent.report(opp)
+    published = time.perf_counter() - start
+    stats = buffer.stats()
+
+    tracemalloc.start()
+    full = OpportunityBuffer(args.capacity)
+    for i in range(args.capacity * 2):
+        full.publish("bench", "arbitrage", (i,), 1.0, {})
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    n = len(opportunities)
+    print(f"{n} reports of {args.distinct} distinct opportunities")
+    print(f"  print + publish:  {printed / n * 1e6:6.2f} us/report, {len(sink.getvalue()) / 1e6:.1f} MB of console text")
+    print(f"  publish only:     {published / n * 1e6:6.2f} us/report")
+    print(f"  buffer: {stats['published'] - stats['deduplicated']} records kept, {stats['deduplicated']} repeats folded "
+          f"({stats['deduplicated'] / n:.1%})")
+    print(f"  full ring of {args.capacity} records (empty payloads): {memory / 1e6:.2f} MB, "
+          f"{memory / args.capacity:.0f} bytes/record")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reports', type=int, default=200000)
+    parser.add_argument('--distinct', type=int, default=50)
+    parser.add_argument('--churn', type=float, default=0.05)
+    parser.add_argument('--capacity', type=int, default=4096)
+    bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
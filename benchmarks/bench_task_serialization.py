@@ -0,0 +1,80 @@
+"""
+TASK SERIALIZATION BENCHMARK
+Per-row cost of turning tasks rows into a GET /api/v1/tasks response body
+
+Compares the original decode + jsonable_encoder + stdlib JSONResponse path
+with result passthrough and a fields= projection that skips result bodies
+entirely. Uses orjson when installed; run once without it to compare.
+
+    python benchmarks/bench_task_serialization.py --rows 10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import responses
+
+
+def make_rows(n):
+    rows = []
+    for i in range(n):
+        result = {"status": "completed", "query": f"Analyze market trend #{i}", "timestamp": datetime.now().isoformat(),
+                  "data": {"prices": [100.0 + j for j in range(20)], "summary": "x" * 200}}
+        rows.append((i, "2026-01-01 00:00:00", "completed", f"research-{i:08x}", f"Analyze market trend #{i}", json.dumps(result)))
+    return rows
+
+
+def baseline(rows):
+    tasks = [{"id": r[0], "agent_id": r[3], "description": r[4], "status": r[2], "result": json.loads(r[5]) if r[5] else None} for r in rows]
+    return JSONResponse(jsonable_encoder({"tasks": tasks, "next_cursor": None})).body
+
+
+def passthrough(rows):
+    items = [responses.encode_object({"id": r[0], "agent_id": r[3], "description": r[4], "status": r[2]}, {"result": responses.raw(r[5])}) for r in rows]
+    return b'{"tasks":' + responses.encode_array(items) + b',"next_cursor":null}'
+
+
+def projected(rows):
+    items = [responses.dumps({"id": r[0], "status": r[2]}) for r in rows]
+    return b'{"tasks":' + responses.encode_array(items) + b',"next_cursor":null}'
+
+
+def timed(fn, rows, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn(rows)
+        best = min(best, time.perf_counter() - start)
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    encoder = "orjson" if responses.orjson is not None else "stdlib"
+    cases = [
+        ("decode + jsonable_encoder", baseline),
+        (f"passthrough ({encoder})", passthrough),
+        (f"fields=id,status ({encoder})", projected),
+    ]
+
+    print(f"{args.rows} rows, best of {args.repeat}")
+    for name, fn in cases:
+        seconds, size = timed(fn, rows, args.repeat)
+        print(f"  {name:<28} {seconds * 1e6 / args.rows:>7.2f} us/row   {seconds * 1e3:>8.1f} ms   {size / 1e6:>6.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+TRIANGULAR ARBITRAGE BENCHMARK
+Scan cost of CurrencyGraph on a synthetic exchange with thousands of markets
+
+Currencies get a hidden fair value; every market quotes it with a small
+spread, so no cycle pays after fees except the few mispricings injected.
+Each round then moves --changes tickers, as between two live scans.
+
+    python benchmarks/bench_triangular.py --currencies 1500 --markets 4000 --changes 20
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.agents.triangular import CurrencyGraph
+
+QUOTES = ['USDT', 'BTC', 'ETH', 'BNB']
+FEE = 0.001
+
+
+def make_markets(currencies, markets, rng):
+    names = QUOTES + [f"C{i}" for i in range(currencies - len(QUOTES))]
+    values = dict(zip(names, rng.lognormal(0.0, 2.0, len(names))))
+    symbols = {f"{b}/{q}" for i, q in enumerate(QUOTES) for b in QUOTES[i + 1:]}
+    # Like a real exchange: most coins trade against a few big quote currencies
+    while len(symbols) < markets:
+        base = names[rng.integers(len(QUOTES), len(names))]
+        quote = QUOTES[rng.integers(len(QUOTES))] if rng.random() < 0.9 else names[rng.integers(len(names))]
+        if base != quote:
+            symbols.add(f"{base}/{quote}")
+    return values, sorted(symbols)
+
+
+def quote(values, symbol, rng, skew=1.0):
+    base, quote_ccy = symbol.split('/')
+    mid = values[base] / values[quote_ccy] * skew * (1 + rng.normal(0, 1e-4))
+    return {'bid': mid * 0.9997, 'ask': mid * 1.0003}
+
+
+def bench(args):
+    rng = np.random.default_rng(args.seed)
+    values, symbols = make_markets(args.currencies, args.markets, rng)
+    tickers = {s: quote(values, s, rng) for s in symbols}
+
+    graph = CurrencyGraph({'ex': FEE})
+    start = time.perf_counter()
+    graph.load_tickers('ex', tickers)
+    loaded = time.perf_counter() - start
+    start = time.perf_counter()
+    graph.triangles()
+    built = time.perf_counter() - start
+    print(f"{len(graph.node_names)} currencies, {len(graph.markets)} markets, {graph.triangle_count} triangles")
+    print(f"  load tickers:        {loaded * 1e3:8.2f} ms")
+    print(f"  enumerate triangles: {built * 1e3:8.2f} ms (once per set of markets)")
+
+    # Mispricings the scan must find: markets of coins listed against
+    # more than one quote currency, skewed 2%
+    listings = {}
+    for s in symbols:
+        listings.setdefault(s.split('/')[0], []).append(s)
+    skewed = [ms[0] for base, ms in sorted(listings.items()) if len(ms) > 1 and base not in QUOTES][:args.inject]
+    for s in skewed:
+        tickers[s] = quote(values, s, rng, skew=1.02)
+
+    full, incremental, cycles = [], [], []
+    for _ in range(args.rounds):
+        changed = rng.choice(symbols, args.changes, replace=False)
+        for s in changed:
+            tickers[s] = quote(values, s, rng)
+        for s in skewed:
+            tickers[s] = quote(values, s, rng, skew=1.02)
+
+        start = time.perf_counter()
+        for s in list(changed) + skewed:
+            graph.update('ex', s, tickers[s]['bid'], tickers[s]['ask'])
+        found = graph.triangles(0.1)
+        incremental.append(time.perf_counter() - start)
+
+        graph._triangles = None  # force the full path for comparison
+        start = time.perf_counter()
+        full_found = graph.triangles(0.1)
+        full.append(time.perf_counter() - start)
+        assert len(found) == len(full_found)
+
+        start = time.perf_counter()
+        cycle = graph.negative_cycle(budget=args.budget)
+        cycles.append(time.perf_counter() - start)
+
+    hit = {m for opp in found for m in opp['markets']}
+    print(f"  per scan, {args.changes} tickers moved + {len(skewed)} skewed:")
+    print(f"    incremental update + triangles: {np.median(incremental) * 1e3:8.2f} ms")
+    print(f"    full re-enumerate + score:      {np.median(full) * 1e3:8.2f} ms")
+    print(f"    Bellman-Ford negative cycle:    {np.median(cycles) * 1e3:8.2f} ms (budget {args.budget * 1e3:.0f} ms)")
+    print(f"  found {len(found)} triangles above 0.1% covering {len(hit & set(skewed))}/{len(skewed)} skewed markets")
+    if found:
+        best = found[0]
+        print(f"    best: {' -> '.join(best['path'])} via {', '.join(best['markets'])} = {best['profit_pct']:.2f}%")
+    if cycle:
+        print(f"    Bellman-Ford: {' -> '.join(cycle['path'])} = {cycle['profit_pct']:.2f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--currencies', type=int, default=1500)
+    parser.add_argument('--markets', type=int, default=4000)
+    parser.add_argument('--changes', type=int, default=20)
+    parser.add_argument('--inject', type=int, default=3)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    bench(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+API LOAD TEST
+Drives a mix of activate / deploy / tasks polling / health traffic at a
+fixed concurrency and reports throughput and latency per endpoint
+
+Runs fully offline: either in-process over ASGI (lifespan included, fresh
+temp database) or against a local uvicorn. Results are saved as JSON and
+can be compared against an earlier run.
+
+    python benchmarks/loadtest.py --app main:app --concurrency 50 --duration 20 --out run.json
+    python benchmarks/loadtest.py --app main:app --compare run.json
+    python benchmarks/loadtest.py --url http://127.0.0.1:8000 --mix tasks=10,health=1
+    python benchmarks/loadtest.py --app api.production_server:app --mix deploy=1,health=1 --users 0
+
+Requires httpx.
+"""
+import argparse
+import asyncio
+import contextlib
+import importlib
+import json
+import os
+import platform
+import random
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_MIX = "tasks=10,deploy=2,health=2,activate=1"
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in SCENARIOS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name!r} (choose from {', '.join(SCENARIOS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# Scenarios: each builds one request from the shared state
+
+def activate_request(state, rng):
+    email = f"load-{secrets.token_hex(6)}@example.com"
+    return 'POST', '/api/v1/activate', {'json': {'email': email, 'license_key': 'LOADTEST'}}
+
+
+def deploy_request(state, rng):
+    headers = {'x-api-key': rng.choice(state['keys'])} if state['keys'] else {}
+    body = {'agent_type': rng.choice(('arbitrage', 'defi', 'research')), 'task_description': 'load test'}
+    return 'POST', '/api/v1/agents/deploy', {'json': body, 'headers': headers}
+
+
+def tasks_request(state, rng):
+    headers = {'x-api-key': rng.choice(state['keys'])} if state['keys'] else {}
+    return 'GET', '/api/v1/tasks', {'headers': headers, 'params': {'limit': 50}}
+
+
+def health_request(state, rng):
+    return 'GET', '/health', {}
+
+
+SCENARIOS = {
+    'activate': activate_request,
+    'deploy': deploy_request,
+    'tasks': tasks_request,
+    'health': health_request,
+}
+
+
+async def setup_users(client, count):
+    keys = []
+    for _ in range(count):
+        r = await client.post('/api/v1/activate', json={'email': f"load-{secrets.token_hex(6)}@example.com", 'license_key': 'LOADTEST'})
+        data = r.json() if r.status_code == 200 else {}
+        if data.get('api_key'):
+            keys.append(data['api_key'])
+    return keys
+
+
+async def run_load(client, mix, concurrency, duration, total, keys, seed):
+    names = list(mix)
+    weights = [mix[n] for n in names]
+    samples = {n: [] for n in names}
+    errors = {n: 0 for n in names}
+    state = {'keys': keys}
+    deadline = time.perf_counter() + duration if duration else None
+    issued = 0
+
+    async def worker(n):
+        nonlocal issued
+        rng = random.Random(seed + n)
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if total is not None:
+                if issued >= total:
+                    return
+                issued += 1
+            name = rng.choices(names, weights)[0]
+            method, path, kwargs = SCENARIOS[name](state, rng)
+            start = time.perf_counter()
+            try:
+                r = await client.request(method, path, **kwargs)
+                ok = r.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if ok:
+                samples[name].append(elapsed)
+            else:
+                errors[name] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return samples, errors, time.perf_counter() - start
+
+
+def summarize(samples, errors, elapsed):
+    endpoints = {}
+    everything = []
+    for name, values in samples.items():
+        values.sort()
+        everything.extend(values)
+        endpoints[name] = {
+            'requests': len(values),
+            'errors': errors[name],
+            'rps': len(values) / elapsed,
+            'mean_ms': sum(values) / len(values) * 1e3 if values else 0.0,
+            'p50_ms': percentile(values, 50) * 1e3,
+            'p95_ms': percentile(values, 95) * 1e3,
+            'p99_ms': percentile(values, 99) * 1e3,
+        }
+    everything.sort()
+    total = {
+        'requests': len(everything),
+        'errors': sum(errors.values()),
+        'rps': len(everything) / elapsed,
+        'p50_ms': percentile(everything, 50) * 1e3,
+        'p95_ms': percentile(everything, 95) * 1e3,
+        'p99_ms': percentile(everything, 99) * 1e3,
+    }
+    return endpoints, total
+
+
+def print_report(result, baseline=None):
+    print(f"{result['target']}  concurrency={result['concurrency']}  {result['elapsed_s']:.1f}s")
+    print(f"  {'endpoint':<10} {'reqs':>7} {'err':>5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    rows = list(result['endpoints'].items()) + [('TOTAL', result['total'])]
+    for name, r in rows:
+        line = f"  {name:<10} {r['requests']:>7} {r['errors']:>5} {r['rps']:>9.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f}"
+        before = baseline and (baseline['total'] if name == 'TOTAL' else baseline['endpoints'].get(name))
+        if before and before['rps']:
+            line += f"   rps {(r['rps'] / before['rps'] - 1) * 100:+.0f}%  p99 {r['p99_ms'] - before['p99_ms']:+.2f} ms"
+        print(line)
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+@contextlib.asynccontextmanager
+async def open_client(args):
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+            yield client
+        return
+
+    # In-process: isolate the app's SQLite file unless the caller chose one
+    os.environ.setdefault('APEX_DB_PATH', os.path.join(tempfile.mkdtemp(), 'loadtest.db'))
+    # Stay offline: no in-process agents polling exchanges or writing APY history
+    os.environ['APEX_AGENTS'] = ''
+    module_name, _, attr = args.app.partition(':')
+    app = getattr(importlib.import_module(module_name), attr or 'app')
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=args.timeout) as client:
+            yield client
+
+
+async def main_async(args):
+    mix = parse_mix(args.mix)
+    async with open_client(args) as client:
+        keys = await setup_users(client, args.users)
+        if args.users and not keys and ({'deploy', 'tasks'} & set(mix)):
+            print("warning: no API keys could be created; authenticated endpoints will fail")
+        samples, errors, elapsed = await run_load(
+            client, mix, args.concurrency, args.duration if args.requests is None else None, args.requests, keys, args.seed)
+
+    endpoints, total = summarize(samples, errors, elapsed)
+    return {
+        'target': args.url or args.app,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'git_revision': git_revision(),
+        'python': platform.python_version(),
+        'concurrency': args.concurrency,
+        'mix': mix,
+        'users': len(keys),
+        'elapsed_s': elapsed,
+        'endpoints': endpoints,
+        'total': total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument('--app', default='main:app', help="module:attr of an ASGI app to run in-process")
+    target.add_argument('--url', help="base URL of a running server, e.g. a local uvicorn")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"endpoint=weight list (default {DEFAULT_MIX})")
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    parser.add_argument('--requests', type=int, help="stop after this many requests instead of --duration")
+    parser.add_argument('--users', type=int, default=20, help="API keys to activate before the run")
+    parser.add_argument('--timeout', type=float, default=30.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help="write results JSON here")
+    parser.add_argument('--compare', help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    result = asyncio.run(main_async(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
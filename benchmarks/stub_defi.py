@@ -0,0 +1,99 @@
+"""
+STUB DEFI
+Local stand-in for DeFi protocol yield APIs
+Lets tests and benchmarks run DeFiYieldAgent without network access
+"""
+import asyncio
+import hashlib
+import json
+from typing import Dict, List, Optional, Union
+
+from aiohttp import web
+
+
+class StubProtocolServer:
+    """
+    Serves a canned JSON payload per protocol from one local port
+
+        GET /{protocol}
+
+    `latency` (seconds, or {protocol: seconds}) is added to every response,
+    so one slow protocol can be simulated; `fail` lists protocols that
+    answer 503.
+
+    Responses carry an ETag of the payload (and `Cache-Control: max-age`
+    if `max_age` is set); a matching If-None-Match gets a bodyless 304.
+    `bytes_sent` counts response bodies.
+    """
+
+    def __init__(self, payloads: Dict[str, object], latency: Union[float, Dict[str, float]] = 0.0,
+                 fail: Optional[List[str]] = None, host: str = '127.0.0.1', port: int = 0,
+                 max_age: Optional[int] = None):
+        self.payloads = payloads
+        self.latency = latency
+        self.fail = set(fail or ())
+        self.max_age = max_age
+        self.bytes_sent = 0
+        self.host = host
+        self.port = port
+        self.requests = {name: 0 for name in payloads}
+        self._runner = None
+
+    async def _handle(self, request):
+        protocol = request.match_info['protocol']
+        self.requests[protocol] = self.requests.get(protocol, 0) + 1
+        latency = self.latency.get(protocol, 0.0) if isinstance(self.latency, dict) else self.latency
+        if latency:
+            await asyncio.sleep(latency)
+        if protocol in self.fail:
+            return web.json_response({'error': 'unavailable'}, status=503)
+        if protocol not in self.payloads:
+            return web.json_response({'error': 'unknown protocol'}, status=404)
+        body = json.dumps(self.payloads[protocol]).encode()
+        headers = {'ETag': f'"{hashlib.sha1(body).hexdigest()}"'}
+        if self.max_age is not None:
+            headers['Cache-Control'] = f"max-age={self.max_age}"
+        if request.headers.get('If-None-Match') == headers['ETag']:
+            return web.Response(status=304, headers=headers)
+        self.bytes_sent += len(body)
+        return web.Response(body=body, content_type='application/json', headers=headers)
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get('/{protocol}', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def urls(self) -> Dict[str, str]:
+        """{protocol: url} for build_adapters(urls=...)"""
+        return {name: f"{self.url}/{name}" for name in self.payloads}
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+
+def aave_payload(rates: Dict[str, float]) -> dict:
+    """An Aave-shaped response: {asset: APY as a fraction}"""
+    return {'reserves': [{'symbol': asset, 'liquidityRate': str(rate)} for asset, rate in rates.items()]}
+
+
+def compound_payload(rates: Dict[str, float]) -> dict:
+    """A Compound-shaped response: {asset: APY as a fraction}"""
+    return {'cToken': [{'underlying_symbol': asset, 'supply_rate': {'value': str(rate)}} for asset, rate in rates.items()]}
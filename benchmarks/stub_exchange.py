@@ -0,0 +1,157 @@
+"""
+STUB EXCHANGE
+Local stand-in for exchange ticker APIs
+Lets tests and benchmarks run the arbitrage agent without network access
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+
+class StubExchangeServer:
+    """
+    Serves tickers for any number of fake exchanges from one local port
+
+        GET /{exchange}/ticker?symbol=BTC/USDT
+        GET /{exchange}/tickers?symbols=BTC/USDT,ETH/USDT
+        GET /{exchange}/orderbook?symbol=BTC/USDT&limit=100
+
+    `latency` (seconds) is added to every response to mimic a real RTT.
+    Order books are synthesized from the ticker: `book_levels` levels of
+    `level_qty` each side, one basis point apart, starting at bid / ask.
+    """
+
+    def __init__(self, prices: Dict[str, Dict[str, dict]], latency: float = 0.0,
+                 host: str = '127.0.0.1', port: int = 0, book_levels: int = 20, level_qty: float = 1.0):
+        self.prices = prices
+        self.latency = latency
+        self.book_levels = book_levels
+        self.level_qty = level_qty
+        self.host = host
+        self.port = port
+        self.requests = {name: 0 for name in prices}
+        self._runner = None
+
+    def set_price(self, exchange: str, symbol: str, bid: float, ask: float):
+        self.prices.setdefault(exchange, {})[symbol] = {'bid': bid, 'ask': ask, 'last': (bid + ask) / 2}
+
+    def _ticker(self, exchange: str, symbol: str):
+        quote = self.prices.get(exchange, {}).get(symbol)
+        if quote is None:
+            return None
+        return {'symbol': symbol, 'timestamp': int(time.time() * 1000), **quote}
+
+    async def _handle_ticker(self, request):
+        exchange = request.match_info['exchange']
+        self.requests[exchange] = self.requests.get(exchange, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        ticker = self._ticker(exchange, request.query.get('symbol', ''))
+        if ticker is None:
+            return web.json_response({'error': 'unknown symbol'}, status=404)
+        return web.json_response(ticker)
+
+    async def _handle_tickers(self, request):
+        exchange = request.match_info['exchange']
+        self.requests[exchange] = self.requests.get(exchange, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        wanted = request.query.get('symbols')
+        symbols = wanted.split(',') if wanted else list(self.prices.get(exchange, {}))
+        tickers = {s: t for s, t in ((s, self._ticker(exchange, s)) for s in symbols) if t}
+        return web.json_response(tickers)
+
+    async def _handle_order_book(self, request):
+        exchange = request.match_info['exchange']
+        self.requests[exchange] = self.requests.get(exchange, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        symbol = request.query.get('symbol', '')
+        ticker = self._ticker(exchange, symbol)
+        if ticker is None:
+            return web.json_response({'error': 'unknown symbol'}, status=404)
+        levels = min(int(request.query.get('limit', self.book_levels)), self.book_levels)
+        bid, ask = ticker['bid'], ticker['ask']
+        return web.json_response({
+            'symbol': symbol,
+            'timestamp': ticker['timestamp'],
+            'bids': [[bid * (1 - 1e-4 * n), self.level_qty] for n in range(levels)],
+            'asks': [[ask * (1 + 1e-4 * n), self.level_qty] for n in range(levels)],
+        })
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_get('/{exchange}/ticker', self._handle_ticker)
+        app.router.add_get('/{exchange}/tickers', self._handle_tickers)
+        app.router.add_get('/{exchange}/orderbook', self._handle_order_book)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+
+class StubExchangeClient:
+    """
+    Minimal async client with the ccxt methods the agents use
+    Several clients can share one aiohttp session (and so one pool).
+    """
+
+    def __init__(self, base_url: str, exchange: str, session: Optional[aiohttp.ClientSession] = None):
+        self.id = exchange
+        self.base_url = f"{base_url.rstrip('/')}/{exchange}"
+        self.session = session
+        self.own_session = session is None
+        self.has = {'fetchTicker': True, 'fetchTickers': True, 'fetchOrderBook': True}
+
+    def _session(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    async def fetch_ticker(self, symbol: str) -> dict:
+        async with self._session().get(f"{self.base_url}/ticker", params={'symbol': symbol}) as r:
+            r.raise_for_status()
+            return await r.json()
+
+    async def fetch_tickers(self, symbols: Optional[List[str]] = None) -> Dict[str, dict]:
+        params = {'symbols': ','.join(symbols)} if symbols else {}
+        async with self._session().get(f"{self.base_url}/tickers", params=params) as r:
+            r.raise_for_status()
+            return await r.json()
+
+    async def fetch_order_book(self, symbol: str, limit: Optional[int] = None) -> dict:
+        params = {'symbol': symbol, **({'limit': limit} if limit else {})}
+        async with self._session().get(f"{self.base_url}/orderbook", params=params) as r:
+            r.raise_for_status()
+            return await r.json()
+
+    async def close(self):
+        if self.own_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+def stub_clients(base_url: str, names: List[str], session: Optional[aiohttp.ClientSession] = None):
+    """{name: StubExchangeClient} for handing to ArbitrageAgent(exchanges=...)"""
+    return {name: StubExchangeClient(base_url, name, session) for name in names}
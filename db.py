@@ -0,0 +1,219 @@
+"""
+DATABASE ACCESS LAYER
+Shared, bounded pool of WAL-mode SQLite connections used by every handler,
+plus a dedicated executor thread that async handlers await on
+"""
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get('APEX_DB_PATH', 'apex.db')
+POOL_SIZE = int(os.environ.get('APEX_DB_POOL_SIZE', '16'))
+POOL_TIMEOUT = 10.0
+STATEMENT_CACHE_SIZE = 256
+
+# Applied to every pooled connection. WAL lets readers run alongside the
+# background writers; NORMAL sync is durable across app crashes in WAL mode.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=134217728",
+)
+
+
+class ConnectionPool:
+    """
+    Fixed-size pool of long-lived SQLite connections
+    Connections are opened lazily, reused LIFO so hot ones keep a warm page
+    and prepared-statement cache, and rolled back before going back in
+    """
+
+    def __init__(self, path: str = DB_PATH, size: int = POOL_SIZE, timeout: float = POOL_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        """Take a connection, opening a new one while under the size limit"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._opened -= 1
+                    raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection free after {self.timeout}s")
+
+    def release(self, conn):
+        """Return a connection, discarding any transaction left open"""
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put_nowait(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Connection whose work is committed on success, rolled back on error"""
+        with self.connection() as conn:
+            yield conn
+            conn.commit()
+
+    def close(self):
+        """Close every idle connection (used on shutdown)"""
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._opened -= 1
+
+    def stats(self):
+        return {'size': self.size, 'opened': self._opened, 'idle': self._idle.qsize()}
+
+
+pool = ConnectionPool()
+
+
+def fetch_one(sql: str, params=()):
+    with pool.connection() as conn:
+        return conn.execute(sql, params).fetchone()
+
+
+def fetch_all(sql: str, params=()):
+    with pool.connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+
+def execute(sql: str, params=()):
+    """Run a single write in its own transaction, returning lastrowid"""
+    with pool.transaction() as conn:
+        return conn.execute(sql, params).lastrowid
+
+
+class DBExecutor:
+    """
+    Dedicated database thread for async handlers
+    Coroutines hand it callables through a queue and await the result, so
+    the event loop never blocks on SQLite and no threadpool slot is held
+    while a query runs. The thread keeps one pooled connection for life.
+    """
+
+    def __init__(self, pool: ConnectionPool):
+        self.pool = pool
+        self._jobs = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.jobs_run = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="db-executor", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread:
+            self._jobs.put(None)
+            thread.join(timeout)
+
+    def _run(self):
+        conn = self.pool.acquire()
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                fn, args, future, loop = job
+                try:
+                    result = fn(conn, *args)
+                    if conn.in_transaction:
+                        conn.commit()
+                except BaseException as e:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    result, error = None, e
+                else:
+                    error = None
+                self.jobs_run += 1
+                try:
+                    loop.call_soon_threadsafe(_resolve, future, result, error)
+                except RuntimeError:
+                    # The awaiting loop has closed; nobody wants the result
+                    pass
+        finally:
+            self.pool.release(conn)
+
+    async def run(self, fn, *args):
+        """Await fn(conn, *args) on the DB thread; writes commit on success"""
+        if self._thread is None:
+            self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._jobs.put((fn, args, future, loop))
+        return await future
+
+    async def fetch_one(self, sql: str, params=()):
+        return await self.run(lambda conn: conn.execute(sql, params).fetchone())
+
+    async def fetch_all(self, sql: str, params=()):
+        return await self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+    async def execute(self, sql: str, params=()):
+        return await self.run(lambda conn: conn.execute(sql, params).lastrowid)
+
+
+def _resolve(future, result, error):
+    if future.cancelled():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+executor = DBExecutor(pool)
@@ -0,0 +1,107 @@
+"""
+TASK EVENTS
+In-process bus that pushes task state transitions to streaming clients
+
+Executor threads publish() transitions; each connected client holds a
+Subscription whose asyncio queue is fed on its own event loop. Recent
+events are kept in a bounded history so a reconnecting client can resume
+from its Last-Event-ID instead of re-downloading the task list.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+
+class TaskEvent:
+    __slots__ = ('id', 'user_id', 'type', 'data')
+
+    def __init__(self, event_id: int, user_id: int, event_type: str, data: str):
+        self.id = event_id
+        self.user_id = user_id
+        self.type = event_type
+        self.data = data
+
+    def encode(self) -> str:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.data}\n\n"
+
+
+class Subscription:
+    """One streaming client; `lagged` is set if its queue overflowed"""
+
+    def __init__(self, user_id: int, loop, max_queue: int):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.lagged = False
+
+    def deliver(self, event: TaskEvent):
+        # Runs on the subscriber's loop
+        if self.queue.full():
+            self.lagged = True
+        else:
+            self.queue.put_nowait(event)
+
+
+class TaskEventBus:
+    def __init__(self, history: int = 10000, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self._history = deque(maxlen=history)
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        # Seed ids from the clock so ids keep increasing across restarts;
+        # a client resuming with an id from a previous process gets a reset.
+        self._next_id = int(time.time() * 1000)
+        self._first_id = self._next_id
+        self.published = 0
+
+    def publish(self, user_id: int, event_type: str, payload: dict):
+        """Record an event and fan it out; safe to call from any thread"""
+        data = json.dumps(payload, separators=(',', ':'))
+        with self._lock:
+            event = TaskEvent(self._next_id, user_id, event_type, data)
+            self._next_id += 1
+            self._history.append(event)
+            subscribers = list(self._subscribers.get(user_id, ()))
+            self.published += 1
+        for sub in subscribers:
+            try:
+                sub.loop.call_soon_threadsafe(sub.deliver, event)
+            except RuntimeError:
+                # Loop already closed; the subscription is being torn down
+                pass
+        return event
+
+    def subscribe(self, user_id: int) -> Subscription:
+        sub = Subscription(user_id, asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def since(self, user_id: int, last_id: int):
+        """
+        Events for user_id after last_id, and whether that replay is complete
+        Incomplete means history no longer reaches back to last_id.
+        """
+        with self._lock:
+            oldest = self._history[0].id if self._history else self._next_id
+            complete = self._first_id - 1 <= last_id < self._next_id and last_id >= oldest - 1
+            events = [e for e in self._history if e.id > last_id and e.user_id == user_id]
+        return events, complete
+
+    def stats(self):
+        with self._lock:
+            return {
+                'published': self.published,
+                'history': len(self._history),
+                'subscribers': sum(len(s) for s in self._subscribers.values()),
+            }
@@ -1,24 +1,64 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
-from pydantic import BaseModel, EmailStr
-import secrets, sqlite3, json, threading, time
+from fastapi.responses import HTMLResponse, StreamingResponse
+from pydantic import BaseModel, EmailStr, Field, ValidationError
+import asyncio, base64, os, secrets, time
 from datetime import datetime
+from typing import Any, List, Optional
+import db
+from auth_cache import ApiKeyCache
+from task_queue import FINISH_SQL, TaskQueue, migrate
+from write_behind import WriteBehindCommitter
+from events import TaskEventBus
+from responses import FastJSONResponse, RawJSONResponse, dumps, encode_array, encode_object, raw
+from backend.agents.agent_runtime import AgentRuntime
+from backend.agents.arbitrage_agent import ArbitrageAgent
+from backend.agents.market_hub import get_hub
+from backend.agents.opportunity_buffer import get_buffer
+from backend.http_cache import get_cache as get_http_cache
 
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
 
 def init_db():
-    conn = sqlite3.connect('apex.db')
-    c = conn.cursor()
-    c.execute('CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, email TEXT UNIQUE, license_key TEXT, api_key TEXT UNIQUE)')
-    c.execute('CREATE TABLE IF NOT EXISTS agents (id INTEGER PRIMARY KEY, user_id INTEGER, agent_id TEXT, agent_type TEXT)')
-    c.execute('CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY, agent_id TEXT, user_id INTEGER, task_description TEXT, status TEXT DEFAULT "running", result_data TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
-    conn.commit()
-    conn.close()
+    with db.pool.transaction() as conn:
+        c = conn.cursor()
+        c.execute('CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, email TEXT UNIQUE, license_key TEXT, api_key TEXT UNIQUE)')
+        c.execute('CREATE TABLE IF NOT EXISTS agents (id INTEGER PRIMARY KEY, user_id INTEGER, agent_id TEXT, agent_type TEXT)')
+        c.execute('CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY, agent_id TEXT, user_id INTEGER, task_description TEXT, status TEXT DEFAULT "running", result_data TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+        migrate(conn)
+        c.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_created ON tasks (user_id, created_at)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_tasks_user_status_created ON tasks (user_id, status, created_at)')
+        c.execute('CREATE INDEX IF NOT EXISTS idx_agents_user ON agents (user_id)')
 
 init_db()
 
+api_key_cache = ApiKeyCache()
+
+def run_task(task):
+    time.sleep(3)
+    return {"status": "completed", "query": task['task_description'], "timestamp": datetime.now().isoformat()}
+
+task_events = TaskEventBus()
+
+def publish_status(task, status, result):
+    task_events.publish(task['user_id'], "task", {"id": task['id'], "agent_id": task['agent_id'], "status": status, "result": result})
+
+completions = WriteBehindCommitter(FINISH_SQL)
+task_queue = TaskQueue(run_task, workers=int(os.environ.get('APEX_TASK_WORKERS', '8')), per_user_limit=int(os.environ.get('APEX_TASK_USER_LIMIT', '2')), committer=completions, on_status=publish_status)
+
+@app.on_event("startup")
+def start_workers():
+    completions.start()
+    task_queue.start()
+
+@app.on_event("shutdown")
+def close_db():
+    task_queue.stop()
+    completions.close()
+    db.executor.stop()
+    db.pool.close()
+
 class ActivateRequest(BaseModel):
     email: EmailStr
     license_key: str
@@ -27,15 +67,27 @@ class DeployRequest(BaseModel):
     agent_type: str
     task_description: str
 
-def verify_api_key(api_key: str):
+class BatchDeployRequest(BaseModel):
+    # Items are validated one by one so a bad item fails alone
+    items: List[Any] = Field(..., min_length=1, max_length=500)
+
+def encode_cursor(created_at, task_id):
+    return base64.urlsafe_b64encode(f"{created_at}|{task_id}".encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, task_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return created_at, int(task_id)
+    except Exception:
+        raise HTTPException(400, detail="Invalid cursor")
+
+async def verify_api_key(api_key: str):
     if not api_key:
         return None
-    conn = sqlite3.connect('apex.db')
-    c = conn.cursor()
-    c.execute("SELECT id, email FROM users WHERE api_key = ?", (api_key,))
-    user = c.fetchone()
-    conn.close()
-    return user
+    return await api_key_cache.lookup_async(api_key, load_user)
+
+async def load_user(api_key: str):
+    return await db.executor.fetch_one("SELECT id, email FROM users WHERE api_key = ?", (api_key,))
 
 @app.get("/")
 def landing():
@@ -50,57 +102,239 @@ def dashboard():
     return HTMLResponse("<html><body>Dashboard works</body></html>")
 
 @app.post("/api/v1/activate")
-def activate(request: ActivateRequest):
-    conn = sqlite3.connect('apex.db')
+async def activate(request: ActivateRequest):
     try:
         api_key = f"apex_{secrets.token_urlsafe(32)}"
-        c = conn.cursor()
-        c.execute("INSERT INTO users (email, license_key, api_key) VALUES (?, ?, ?)", (request.email, request.license_key, api_key))
-        conn.commit()
+        await db.executor.execute("INSERT INTO users (email, license_key, api_key) VALUES (?, ?, ?)", (request.email, request.license_key, api_key))
         return {"success": True, "api_key": api_key}
     except:
         return {"success": False}
-    finally:
-        conn.close()
 
 @app.post("/api/v1/agents/deploy")
-def deploy(request: DeployRequest, req: Request):
+async def deploy(request: DeployRequest, req: Request):
     api_key = req.headers.get('x-api-key')
-    user = verify_api_key(api_key)
+    user = await verify_api_key(api_key)
     if not user:
         raise HTTPException(401)
     agent_id = f"{request.agent_type}-{secrets.token_hex(4)}"
-    conn = sqlite3.connect('apex.db')
-    c = conn.cursor()
-    c.execute("INSERT INTO agents (user_id, agent_id, agent_type) VALUES (?, ?, ?)", (user[0], agent_id, request.agent_type))
-    c.execute("INSERT INTO tasks (agent_id, user_id, task_description) VALUES (?, ?, ?)", (agent_id, user[0], request.task_description))
-    task_id = c.lastrowid
-    conn.commit()
-    conn.close()
-    def execute():
-        time.sleep(3)
-        result = {"status": "completed", "query": request.task_description, "timestamp": datetime.now().isoformat()}
-        conn = sqlite3.connect('apex.db')
+    def insert(conn):
         c = conn.cursor()
-        c.execute("UPDATE tasks SET status='completed', result_data=? WHERE id=?", (json.dumps(result), task_id))
-        conn.commit()
-        conn.close()
-    threading.Thread(target=execute, daemon=True).start()
+        c.execute("INSERT INTO agents (user_id, agent_id, agent_type) VALUES (?, ?, ?)", (user[0], agent_id, request.agent_type))
+        c.execute("INSERT INTO tasks (agent_id, user_id, task_description, status, enqueued_at) VALUES (?, ?, ?, 'queued', ?)", (agent_id, user[0], request.task_description, time.time()))
+        return c.lastrowid
+    task_id = await db.executor.run(insert)
+    # "queued" goes out before a worker can pick the task up and publish "running"
+    publish_status({"id": task_id, "user_id": user[0], "agent_id": agent_id}, "queued", None)
+    task_queue.notify()
     return {"success": True, "agent_id": agent_id}
 
+@app.post("/api/v1/agents/deploy:batch")
+async def deploy_batch(request: BatchDeployRequest, req: Request):
+    user = await verify_api_key(req.headers.get('x-api-key'))
+    if not user:
+        raise HTTPException(401)
+    results = [None] * len(request.items)
+    accepted = []
+    for i, item in enumerate(request.items):
+        try:
+            deploy_request = DeployRequest.model_validate(item)
+        except ValidationError as e:
+            results[i] = {"index": i, "success": False, "error": e.errors(include_url=False, include_context=False)}
+            continue
+        accepted.append((i, f"{deploy_request.agent_type}-{secrets.token_hex(4)}", deploy_request))
+
+    def insert(conn):
+        # One INSERT per task, in order: each lastrowid is that item's id, even when agent ids repeat
+        c = conn.cursor()
+        now = time.time()
+        c.executemany("INSERT INTO agents (user_id, agent_id, agent_type) VALUES (?, ?, ?)", [(user[0], agent_id, r.agent_type) for _, agent_id, r in accepted])
+        task_ids = []
+        for _, agent_id, r in accepted:
+            c.execute("INSERT INTO tasks (agent_id, user_id, task_description, status, enqueued_at) VALUES (?, ?, ?, 'queued', ?)", (agent_id, user[0], r.task_description, now))
+            task_ids.append(c.lastrowid)
+        return task_ids
+
+    task_ids = await db.executor.run(insert) if accepted else []
+    for (i, agent_id, _), task_id in zip(accepted, task_ids):
+        publish_status({"id": task_id, "user_id": user[0], "agent_id": agent_id}, "queued", None)
+        results[i] = {"index": i, "success": True, "agent_id": agent_id, "task_id": task_id}
+    task_queue.notify(len(accepted))
+    return {"success": True, "deployed": len(accepted), "failed": len(results) - len(accepted), "results": results}
+
+# Public field name -> tasks column, in response order
+TASK_FIELDS = {"id": "id", "agent_id": "agent_id", "description": "task_description", "status": "status", "result": "result_data"}
+
 @app.get("/api/v1/tasks")
-def get_tasks(req: Request):
+async def get_tasks(req: Request, limit: int = Query(50, ge=1, le=500), after: Optional[str] = None, status: Optional[str] = None, fields: Optional[str] = None):
     api_key = req.headers.get('x-api-key')
-    user = verify_api_key(api_key)
+    user = await verify_api_key(api_key)
+    if not user:
+        raise HTTPException(401)
+    wanted = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(TASK_FIELDS)
+    if not wanted:
+        raise HTTPException(400, detail="fields= names no fields")
+    unknown = [f for f in wanted if f not in TASK_FIELDS]
+    if unknown:
+        raise HTTPException(400, detail=f"Unknown fields: {', '.join(unknown)}")
+    # id, created_at and status are always read: cursor, overlay and filter need them
+    columns = ["id", "created_at", "status"] + [TASK_FIELDS[f] for f in wanted if f not in ("id", "status")]
+    # Keyset pagination over (created_at, id), newest first; served by the
+    # (user_id[, status], created_at) indexes so cost is independent of history size.
+    sql = f"SELECT {', '.join(columns)} FROM tasks WHERE user_id = ?"
+    params = [user[0]]
+    if status:
+        sql += " AND status = ?"
+        params.append(status)
+    if after:
+        sql += " AND (created_at, id) < (?, ?)"
+        params.extend(decode_cursor(after))
+    sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+    rows = await db.executor.fetch_all(sql, params)
+    next_cursor = encode_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+    rows = rows[:limit]
+
+    # Completions still waiting in the write-behind buffer win over the stored row
+    pending = completions.pending([r[0] for r in rows])
+    position = {c: i for i, c in enumerate(columns)}
+    plain = [(f, position[TASK_FIELDS[f]]) for f in wanted if f != "result"]
+    result_at = position.get("result_data")
+    items = []
+    for r in rows:
+        done = pending.get(r[0])
+        if done:
+            if status and done[0] != status:
+                continue
+            r = r[:2] + (done[0],) + r[3:]
+        obj = {f: r[i] for f, i in plain}
+        if result_at is None:
+            items.append(dumps(obj))
+        else:
+            # result_data is already JSON text; pass it through undecoded
+            items.append(encode_object(obj, {"result": raw(done[1] if done else r[result_at])}))
+    return RawJSONResponse(b'{"tasks":' + encode_array(items) + b',"next_cursor":' + dumps(next_cursor) + b'}')
+
+@app.get("/api/v1/tasks/stream")
+async def stream_tasks(req: Request, api_key: Optional[str] = None, last_event_id: Optional[int] = None):
+    # EventSource cannot set headers, so the key may also come as ?api_key=
+    user = await verify_api_key(req.headers.get('x-api-key') or api_key)
     if not user:
         raise HTTPException(401)
-    conn = sqlite3.connect('apex.db')
-    c = conn.cursor()
-    c.execute("SELECT id, agent_id, task_description, status, result_data FROM tasks WHERE user_id = ? ORDER BY created_at DESC", (user[0],))
-    tasks = [{"id": r[0], "agent_id": r[1], "description": r[2], "status": r[3], "result": json.loads(r[4]) if r[4] else None} for r in c.fetchall()]
-    conn.close()
-    return {"tasks": tasks}
+    header_id = req.headers.get('last-event-id')
+    if header_id and header_id.isdigit():
+        last_event_id = int(header_id)
+
+    async def events():
+        sub = task_events.subscribe(user[0])
+        last = last_event_id
+        replay = last is not None
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                if replay or sub.lagged:
+                    # Resume from history, or catch up after our queue overflowed
+                    replay = sub.lagged = False
+                    missed, complete = task_events.since(user[0], last if last is not None else -1)
+                    if not complete:
+                        yield "event: reset\ndata: {}\n\n"
+                    for event in missed:
+                        yield event.encode()
+                        last = event.id
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    if await req.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                if last is not None and event.id <= last:
+                    continue
+                yield event.encode()
+                last = event.id
+        finally:
+            task_events.unsubscribe(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+opportunity_buffer = get_buffer()
+
+# The buffer is this process's memory, so the agents that fill it run here, on the API's event loop.
+# APEX_AGENTS opts in to them (comma-separated "defi", "arbitrage"); none run by default.
+@app.on_event("startup")
+async def start_agents():
+    agents = {a.strip() for a in os.environ.get('APEX_AGENTS', '').split(',') if a.strip()}
+    app.state.agent_runtime = app.state.arbitrage_task = None
+    if "defi" in agents:
+        runtime = app.state.agent_runtime = AgentRuntime(buffer=opportunity_buffer)
+        await runtime.open()
+        runtime.spawn("defi-api", interval=float(os.environ.get('APEX_DEFI_INTERVAL', '300')))
+    if "arbitrage" in agents:
+        hub = get_hub()
+        await hub.open()
+        # Importing ccxt and building its clients blocks for about a second; keep it off the loop
+        await asyncio.get_running_loop().run_in_executor(None, hub.build_clients)
+        agent = ArbitrageAgent("arbitrage-api", hub=hub, buffer=opportunity_buffer)
+        app.state.arbitrage_task = asyncio.ensure_future(agent.run())
+
+@app.on_event("shutdown")
+async def stop_agents():
+    if app.state.arbitrage_task is not None:
+        app.state.arbitrage_task.cancel()
+        await asyncio.gather(app.state.arbitrage_task, return_exceptions=True)
+        await get_hub().close()
+    if app.state.agent_runtime is not None:
+        await app.state.agent_runtime.close()
+
+@app.get("/api/v1/opportunities")
+async def get_opportunities(req: Request, limit: int = Query(50, ge=1, le=1000), after: Optional[int] = None, kind: Optional[str] = None):
+    user = await verify_api_key(req.headers.get('x-api-key'))
+    if not user:
+        raise HTTPException(401)
+    # Newest first by default; with ?after=<seq>, everything since that cursor, oldest first
+    if after is None:
+        records, complete = opportunity_buffer.latest(limit, kind), True
+    else:
+        records, complete = opportunity_buffer.since(after, limit, kind)
+    last = max((r.seq for r in records), default=after if after is not None else opportunity_buffer.last_seq)
+    return {"opportunities": [r.to_dict() for r in records], "last_seq": last, "complete": complete}
+
+@app.get("/api/v1/opportunities/stream")
+async def stream_opportunities(req: Request, api_key: Optional[str] = None, kind: Optional[str] = None, last_event_id: Optional[int] = None):
+    user = await verify_api_key(req.headers.get('x-api-key') or api_key)
+    if not user:
+        raise HTTPException(401)
+    header_id = req.headers.get('last-event-id')
+    if header_id and header_id.isdigit():
+        last_event_id = int(header_id)
+
+    async def events():
+        # A new client starts from now; a reconnecting one resumes after its last id
+        last = opportunity_buffer.last_seq if last_event_id is None else last_event_id
+        yield "retry: 3000\n\n"
+        while True:
+            records, complete = opportunity_buffer.since(last, 500)
+            if not complete:
+                yield "event: reset\ndata: {}\n\n"
+                if not records:
+                    # Cursor from another process: nothing to replay, carry on from now
+                    last = opportunity_buffer.last_seq
+            for record in records:
+                if kind is None or record.kind == kind:
+                    yield record.encode()
+                last = record.seq
+            if len(records) == 500:
+                continue
+            if not await opportunity_buffer.wait(last, timeout=15):
+                if await req.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+@app.get("/api/v1/metrics")
+def metrics():
+    return {"auth_cache": api_key_cache.stats(), "db_pool": db.pool.stats(), "task_queue": task_queue.stats(), "write_behind": completions.stats(), "task_events": task_events.stats(), "opportunities": opportunity_buffer.stats(), "http_cache": get_http_cache().stats()}
@@ -0,0 +1,61 @@
+"""
+JSON RESPONSES
+Fast JSON encoding, with passthrough for values already stored as JSON text
+
+Task results are stored as JSON strings, so list endpoints splice them
+into the response as-is instead of decoding and re-encoding every row.
+orjson is used when installed; the stdlib encoder is the fallback.
+"""
+import json
+
+from fastapi.responses import JSONResponse, Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+else:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def dumps(obj) -> bytes:
+        return _encoder.encode(obj).encode('utf-8')
+
+
+def raw(text) -> bytes:
+    """Stored JSON text as a response fragment (NULL column -> null)"""
+    if not text:
+        return b'null'
+    return text.encode('utf-8') if isinstance(text, str) else text
+
+
+def encode_object(fields: dict, raw_fields: dict) -> bytes:
+    """
+    JSON object from plain `fields` followed by `raw_fields`, whose values
+    are pre-encoded JSON fragments (bytes) copied through unchanged
+    """
+    body = dumps(fields)
+    if not raw_fields:
+        return body
+    extra = b','.join(dumps(k) + b':' + v for k, v in raw_fields.items())
+    return body[:-1] + (b',' if len(body) > 2 else b'') + extra + b'}'
+
+
+def encode_array(items) -> bytes:
+    """JSON array from already-encoded items"""
+    return b'[' + b','.join(items) + b']'
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class RawJSONResponse(Response):
+    """Body is JSON the handler has already encoded"""
+
+    media_type = "application/json"
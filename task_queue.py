@@ -0,0 +1,250 @@
+"""
+TASK QUEUE
+Durable SQLite-backed task queue drained by a fixed-size worker pool
+
+Tasks live in the `tasks` table. A deploy inserts the row as 'queued';
+a worker claims it (-> 'running') under a lease that a heartbeat thread
+keeps extending, then records the result. Anything left 'running' with an
+expired lease - e.g. after a crash or restart - is re-queued at startup
+and by the heartbeat, which checks for lapsed leases every interval.
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+import db
+
+logger = logging.getLogger(__name__)
+
+TASK_COLUMNS = {
+    'enqueued_at': 'REAL',
+    'started_at': 'REAL',
+    'lease_until': 'REAL',
+    'attempts': 'INTEGER DEFAULT 0',
+}
+
+FINISH_SQL = "UPDATE tasks SET status = ?, result_data = ?, lease_until = NULL WHERE id = ?"
+
+
+def migrate(conn):
+    """Add the queue bookkeeping columns to an existing tasks table"""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+    for name, decl in TASK_COLUMNS.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE tasks ADD COLUMN {name} {decl}")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status)')
+
+
+class TaskQueue:
+    """
+    Fixed pool of worker threads pulling from the tasks table
+    At most `per_user_limit` tasks per user run at once; the rest wait
+    in the queue instead of each deploy getting its own thread. Results
+    go through `committer` (a WriteBehindCommitter on FINISH_SQL) when
+    one is given, otherwise they are written one transaction per task.
+    `on_status(task, status, result)` is called on every transition.
+    """
+
+    def __init__(self, handler, workers: int = 8, per_user_limit: int = 2,
+                 lease_seconds: float = 30.0, heartbeat_interval: float = 10.0,
+                 max_attempts: int = 3, poll_interval: float = 1.0, committer=None, on_status=None):
+        self.handler = handler
+        self.committer = committer
+        self.on_status = on_status
+        self.workers = workers
+        self.per_user_limit = per_user_limit
+        self.lease_seconds = lease_seconds
+        self.heartbeat_interval = heartbeat_interval
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+
+        self._threads = []
+        self._stopping = threading.Event()
+        self._wakeup = threading.Condition()
+        self._claim_lock = threading.Lock()
+        self._running = {}
+        self._running_per_user = defaultdict(int)
+
+        self.completed = 0
+        self.failed = 0
+        self.recovered = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    # Lifecycle
+
+    def start(self):
+        self._stopping.clear()
+        self.recover()
+        for n in range(self.workers):
+            t = threading.Thread(target=self._work, name=f"task-worker-{n}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        t = threading.Thread(target=self._heartbeat, name="task-heartbeat", daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def recover(self, exclude=()):
+        """
+        Re-queue tasks whose lease expired (their worker died), fail ones out
+        of retries. Runs at startup and then from every heartbeat, so a task
+        orphaned by a restart inside its lease is picked up once it lapses.
+        `exclude` are ids this process is still running.
+        """
+        now = time.time()
+        exclude = list(exclude)
+        orphaned = "status = 'running' AND (lease_until IS NULL OR lease_until < ?)"
+        if exclude:
+            orphaned += f" AND id NOT IN ({','.join('?' * len(exclude))})"
+        with db.pool.transaction() as conn:
+            failed = conn.execute(
+                f"UPDATE tasks SET status = 'failed', lease_until = NULL, result_data = ? WHERE {orphaned} AND attempts >= ?",
+                [json.dumps({"error": "Task abandoned after too many attempts"}), now, *exclude, self.max_attempts],
+            ).rowcount
+            requeued = conn.execute(
+                f"UPDATE tasks SET status = 'queued', lease_until = NULL, enqueued_at = COALESCE(enqueued_at, ?) WHERE {orphaned}",
+                [now, now, *exclude],
+            ).rowcount
+        self.recovered += requeued
+        self.failed += failed
+        return requeued
+
+    # Producer side
+
+    def notify(self, count: int = 1):
+        """Wake workers after new rows were committed as 'queued'"""
+        with self._wakeup:
+            self._wakeup.notify(count)
+
+    # Worker side
+
+    def _claim(self):
+        with self._claim_lock:
+            saturated = [u for u, n in self._running_per_user.items() if n >= self.per_user_limit]
+            sql = "SELECT id, user_id, agent_id, task_description, enqueued_at FROM tasks WHERE status = 'queued'"
+            if saturated:
+                sql += f" AND user_id NOT IN ({','.join('?' * len(saturated))})"
+            sql += " ORDER BY id LIMIT 1"
+            now = time.time()
+            with db.pool.transaction() as conn:
+                row = conn.execute(sql, saturated).fetchone()
+                if row is None:
+                    return None
+                claimed = conn.execute(
+                    "UPDATE tasks SET status = 'running', started_at = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ? AND status = 'queued'",
+                    (now, now + self.lease_seconds, row[0]),
+                ).rowcount
+            if not claimed:
+                return None
+            task = {'id': row[0], 'user_id': row[1], 'agent_id': row[2], 'task_description': row[3]}
+            self._running[task['id']] = task
+            self._running_per_user[task['user_id']] += 1
+
+            wait = now - row[4] if row[4] else 0.0
+            self.wait_count += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+        self._emit(task, 'running', None)
+        return task
+
+    def _emit(self, task, status: str, result):
+        if self.on_status:
+            try:
+                self.on_status(task, status, result)
+            except Exception:
+                logger.exception("on_status hook failed for task %s", task['id'])
+
+    def _release(self, task, status: str):
+        with self._claim_lock:
+            if status == 'completed':
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._running.pop(task['id'], None)
+            self._running_per_user[task['user_id']] -= 1
+            if self._running_per_user[task['user_id']] <= 0:
+                del self._running_per_user[task['user_id']]
+        # A per-user slot opened up; let an idle worker look again
+        self.notify()
+
+    def _finish(self, task, status: str, result):
+        params = (status, json.dumps(result), task['id'])
+        if self.committer:
+            self.committer.submit(task['id'], params)
+        else:
+            db.execute(FINISH_SQL, params)
+        self._emit(task, status, result)
+
+    def _work(self):
+        while not self._stopping.is_set():
+            try:
+                self._work_once()
+            except Exception:
+                # e.g. "database is locked": losing the thread would shrink the pool for good
+                logger.exception("Task worker failed, retrying")
+                self._stopping.wait(self.poll_interval)
+
+    def _work_once(self):
+        task = self._claim()
+        if task is None:
+            with self._wakeup:
+                self._wakeup.wait(self.poll_interval)
+            return
+        try:
+            status, result = 'completed', self.handler(task)
+        except Exception as e:
+            status, result = 'failed', {"error": str(e)}
+        try:
+            self._finish(task, status, result)
+        finally:
+            self._release(task, status)
+
+    def _renew_leases(self, ids):
+        lease_until = time.time() + self.lease_seconds
+        with db.pool.transaction() as conn:
+            conn.executemany("UPDATE tasks SET lease_until = ? WHERE id = ?", [(lease_until, i) for i in ids])
+
+    def _heartbeat(self):
+        while not self._stopping.wait(self.heartbeat_interval):
+            with self._claim_lock:
+                ids = list(self._running)
+            try:
+                if ids:
+                    self._renew_leases(ids)
+            except Exception:
+                # Leases outlast a few intervals, so the next beat can still save them
+                logger.exception("Renewing task leases failed, retrying next heartbeat")
+                continue
+            try:
+                requeued = self.recover(exclude=ids)
+            except Exception:
+                logger.exception("Recovering expired task leases failed")
+                continue
+            if requeued:
+                self.notify(requeued)
+
+    # Metrics
+
+    def stats(self):
+        depth = db.fetch_one("SELECT COUNT(*) FROM tasks WHERE status = 'queued'")[0]
+        return {
+            'workers': self.workers,
+            'queue_depth': depth,
+            'running': len(self._running),
+            'completed': self.completed,
+            'failed': self.failed,
+            'recovered': self.recovered,
+            'wait_avg_seconds': self.wait_total / self.wait_count if self.wait_count else 0.0,
+            'wait_max_seconds': self.wait_max,
+        }
@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The shared pool opens its file on import; keep it out of the working tree
+os.environ.setdefault('APEX_DB_PATH', os.path.join(tempfile.mkdtemp(prefix='apex-tests-'), 'apex.db'))
+
+import db
+from task_queue import migrate
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch):
+    """A fresh database for the test, swapped in for the shared pool"""
+    test_pool = db.ConnectionPool(str(tmp_path / 'test.db'), size=4)
+    monkeypatch.setattr(db, 'pool', test_pool)
+    with test_pool.transaction() as conn:
+        conn.execute('CREATE TABLE tasks (id INTEGER PRIMARY KEY, agent_id TEXT, user_id INTEGER, task_description TEXT, '
+                     'status TEXT DEFAULT "running", result_data TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+        migrate(conn)
+    yield test_pool
+    test_pool.close()
+
+
+@pytest.fixture
+def api(pool, monkeypatch):
+    """main's app over the test database, with a user; background workers are not started"""
+    from fastapi.testclient import TestClient
+
+    executor = db.DBExecutor(pool)
+    monkeypatch.setattr(db, 'executor', executor)
+    import main
+    main.init_db()
+    api_key = 'apex_test_key'
+    with pool.transaction() as conn:
+        conn.execute("INSERT INTO users (email, license_key, api_key) VALUES ('test@example.com', 'license', ?)", (api_key,))
+    main.api_key_cache.invalidate(api_key)
+    client = TestClient(main.app)
+    client.headers['x-api-key'] = api_key
+    yield client
+    executor.stop()
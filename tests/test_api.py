@@ -0,0 +1,127 @@
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from fastapi.testclient import TestClient
+
+import main
+from events import TaskEventBus
+from backend import http_cache
+from backend.agents import apy_history
+from backend.agents.apy_history import ApyHistory
+from backend.agents.defi_protocols import ADAPTERS
+from backend.agents.market_cache import LazyExchange
+from backend.agents.market_hub import MarketDataHub
+from backend.http_cache import HttpCache
+from benchmarks.stub_defi import StubProtocolServer, aave_payload, compound_payload
+
+
+def test_batch_deploy_maps_each_item_to_its_own_task(api, pool, monkeypatch):
+    # Every item gets the same agent id, so ids can only come from the inserts themselves
+    monkeypatch.setattr(main.secrets, 'token_hex', lambda n: 'same')
+    items = [{"agent_type": "research", "task_description": f"task {i}"} for i in range(3)]
+    items.insert(1, {"agent_type": "research"})
+    response = api.post("/api/v1/agents/deploy:batch", json={"items": items})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["deployed"], body["failed"]) == (3, 1)
+    results = body["results"]
+    assert not results[1]["success"]
+    deployed = [r for r in results if r["success"]]
+    assert len({r["task_id"] for r in deployed}) == 3
+    with pool.connection() as conn:
+        descriptions = dict(conn.execute("SELECT id, task_description FROM tasks").fetchall())
+    assert [descriptions[r["task_id"]] for r in deployed] == ["task 0", "task 1", "task 2"]
+
+
+@contextmanager
+def serving(server):
+    """Run an aiohttp stub on its own loop thread, for clients on other loops"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+    try:
+        yield server
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+
+
+def test_opportunities_come_from_agents_running_in_the_api_process(api, monkeypatch):
+    payloads = {'Aave': aave_payload({'USDC': 0.04}), 'Compound': compound_payload({'USDC': 0.05})}
+    monkeypatch.setenv('APEX_AGENTS', 'defi')
+    monkeypatch.setenv('APEX_DEFI_INTERVAL', '1')
+    # Keep the runtime's shared cache and history in memory
+    monkeypatch.setattr(http_cache, '_cache', HttpCache(directory=None))
+    monkeypatch.setattr(apy_history, '_history', ApyHistory())
+    with serving(StubProtocolServer(payloads)) as server:
+        for name, url in server.urls().items():
+            monkeypatch.setattr(ADAPTERS[name], 'url', url)
+        with TestClient(main.app) as client:
+            client.headers['x-api-key'] = api.headers['x-api-key']
+            deadline = time.monotonic() + 3.0
+            found = []
+            while not found and time.monotonic() < deadline:
+                found = client.get("/api/v1/opportunities", params={"kind": "yield"}).json()["opportunities"]
+                time.sleep(0.05)
+            runtime = main.app.state.agent_runtime
+            assert runtime.stats()['agents'] == 1
+        assert runtime.session is None
+    assert {(o['data']['protocol'], o['data']['asset']) for o in found} == {('Aave', 'USDC'), ('Compound', 'USDC')}
+
+
+def test_no_agents_run_unless_asked_for(api, monkeypatch):
+    monkeypatch.delenv('APEX_AGENTS', raising=False)
+    with TestClient(main.app):
+        assert main.app.state.agent_runtime is None
+        assert main.app.state.arbitrage_task is None
+
+
+class OfflineExchange:
+    has = {'fetchTickers': True}
+
+    async def fetch_tickers(self, symbols=None):
+        raise ConnectionError("offline")
+
+    async def close(self):
+        pass
+
+
+def test_arbitrage_clients_are_built_off_the_event_loop(api, monkeypatch):
+    built_on_loop = []
+
+    def factory():
+        try:
+            asyncio.get_running_loop()
+            built_on_loop.append(True)
+        except RuntimeError:
+            built_on_loop.append(False)
+        return OfflineExchange()
+
+    clients = {name: LazyExchange(name, factory) for name in ('binance', 'kraken')}
+    hub = MarketDataHub(exchanges=clients, cycle_seconds=0.2, rate_limits={'binance': 50, 'kraken': 50})
+    monkeypatch.setenv('APEX_AGENTS', 'arbitrage')
+    monkeypatch.setattr(main, 'get_hub', lambda: hub)
+    with TestClient(main.app):
+        assert built_on_loop == [False, False]
+        assert not main.app.state.arbitrage_task.done()
+
+
+def test_queued_is_published_before_workers_are_woken(api, pool, monkeypatch):
+    with pool.connection() as conn:
+        user_id = conn.execute("SELECT id FROM users").fetchone()[0]
+    seen_at_notify = []
+
+    def notify(count=1):
+        seen_at_notify.append([json.loads(e.data)["status"] for e in main.task_events.since(user_id, -1)[0]])
+
+    monkeypatch.setattr(main, 'task_events', TaskEventBus())
+    monkeypatch.setattr(main.task_queue, 'notify', notify)
+    api.post("/api/v1/agents/deploy", json={"agent_type": "research", "task_description": "one"})
+    items = [{"agent_type": "research", "task_description": "two"}, {"agent_type": "research", "task_description": "three"}]
+    api.post("/api/v1/agents/deploy:batch", json={"items": items})
+    assert seen_at_notify == [["queued"], ["queued"] * 3]
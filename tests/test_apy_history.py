@@ -0,0 +1,39 @@
+import numpy as np
+
+from backend.agents.apy_history import ApyHistory
+
+
+def test_rolling_stats_match_the_window():
+    history = ApyHistory(window=4)
+    values = [5.0, 5.2, 4.9, 5.1, 8.0, 5.0]
+    for i, apy in enumerate(values):
+        history.add('Aave', 'USDC', apy, ts=1000.0 + i)
+    stats = history.stats('Aave', 'USDC')
+    window = np.array(values[-4:])
+    assert stats['samples'] == 6 and stats['last'] == 5.0
+    assert abs(stats['mean'] - window.mean()) < 1e-6
+    assert abs(stats['volatility'] - window.std()) < 1e-6
+    assert abs(stats['zscore'] - (5.0 - window.mean()) / window.std()) < 1e-6
+    assert history.stats('Aave', 'DAI') is None
+
+
+def test_older_samples_are_ignored_and_one_per_timestamp():
+    history = ApyHistory()
+    history.add('Aave', 'USDC', 5.0, ts=1000.0)
+    assert not history.add('Aave', 'USDC', 9.0, ts=999.0)
+    history.add_many([{'protocol': 'Aave', 'asset': 'USDC', 'apy': 6.0}], ts=1001.0)
+    series = history.series('Aave', 'USDC')
+    assert list(series['ts']) == [1000.0, 1001.0]
+    assert list(series['apy']) == [5.0, 6.0]
+
+
+def test_history_survives_a_reopen(tmp_path):
+    path = str(tmp_path / 'history')
+    with ApyHistory(path) as history:
+        for hour in range(3):
+            history.add('Compound', 'ETH', 2.0 + hour, ts=hour * 3600.0)
+    reopened = ApyHistory(path)
+    assert reopened.stats('Compound', 'ETH')['samples'] == 3
+    hourly = reopened.series('Compound', 'ETH', '1h')
+    # The third hour is still open, so only two buckets are complete
+    assert list(hourly['mean']) == [2.0, 3.0]
@@ -0,0 +1,57 @@
+import asyncio
+
+from backend.agents.arbitrage_agent import ArbitrageAgent
+from backend.agents.opportunity_buffer import OpportunityBuffer
+from benchmarks.stub_exchange import StubExchangeServer, stub_clients
+
+FEES = {'binance': 0.001, 'kraken': 0.001, 'coinbase': 0.001}
+
+
+def prices():
+    # BTC is 2% cheaper on binance than on kraken; ETH is level everywhere
+    return {
+        'binance': {'BTC/USDT': {'bid': 99.9, 'ask': 100.0, 'last': 99.95},
+                    'ETH/USDT': {'bid': 10.0, 'ask': 10.01, 'last': 10.005}},
+        'kraken': {'BTC/USDT': {'bid': 102.0, 'ask': 102.1, 'last': 102.05},
+                   'ETH/USDT': {'bid': 10.0, 'ask': 10.01, 'last': 10.005}},
+        'coinbase': {'BTC/USDT': {'bid': 100.5, 'ask': 100.6, 'last': 100.55},
+                     'ETH/USDT': {'bid': 10.0, 'ask': 10.01, 'last': 10.005}},
+    }
+
+
+async def scan(server_prices, latency=0.0, **agent_options):
+    async with StubExchangeServer(server_prices, latency=latency) as server:
+        clients = stub_clients(server.url, list(server_prices))
+        agent = ArbitrageAgent('scan-test', exchanges=clients, symbols=['BTC/USDT', 'ETH/USDT'],
+                               buffer=OpportunityBuffer(), **agent_options)
+        agent.fee_overrides = dict(FEES)
+        try:
+            return await agent.find_arbitrage(), server.requests
+        finally:
+            await asyncio.gather(*(client.close() for client in clients.values()))
+
+
+def test_scan_finds_the_priced_in_gap_and_nothing_else():
+    found, _ = asyncio.run(scan(prices()))
+    pairs = sorted((o['symbol'], o['buy_exchange'], o['sell_exchange']) for o in found)
+    assert pairs == [('BTC/USDT', 'binance', 'kraken'), ('BTC/USDT', 'coinbase', 'kraken')]
+    best = next(o for o in found if o['buy_exchange'] == 'binance')
+    assert best['buy_price'] == 100.0 and best['sell_price'] == 102.0
+    # Sized against the stub books: 20 levels of 1 each, one basis point apart
+    assert 0 < best['quantity'] <= 20
+    assert best['net_profit'] > 0 and best['fees'] > 0
+
+
+def test_gap_that_fees_eat_is_not_reported():
+    flat = prices()
+    flat['kraken']['BTC/USDT'] = {'bid': 100.1, 'ask': 100.2, 'last': 100.15}
+    flat['coinbase']['BTC/USDT'] = {'bid': 100.1, 'ask': 100.2, 'last': 100.15}
+    found, _ = asyncio.run(scan(flat))
+    assert found == []
+
+
+def test_scan_is_one_bulk_request_per_exchange_plus_the_books():
+    found, requests = asyncio.run(scan(prices()))
+    # One /tickers per exchange, then one /orderbook per leg of the candidates
+    assert requests == {'binance': 2, 'kraken': 2, 'coinbase': 2}
+    assert len(found) == 2
@@ -0,0 +1,93 @@
+import asyncio
+
+import auth_cache
+from auth_cache import ApiKeyCache
+
+
+class Clock:
+    """Stands in for the time module inside auth_cache"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class Loader:
+    def __init__(self, users):
+        self.users = users
+        self.calls = []
+
+    def __call__(self, api_key):
+        self.calls.append(api_key)
+        return self.users.get(api_key)
+
+
+def cache_with_clock(monkeypatch, **options):
+    clock = Clock()
+    monkeypatch.setattr(auth_cache, 'time', clock)
+    return ApiKeyCache(**options), clock
+
+
+def test_hit_until_the_ttl_runs_out(monkeypatch):
+    cache, clock = cache_with_clock(monkeypatch, ttl=60.0)
+    load = Loader({'good': (1, 'a@example.com')})
+    assert cache.lookup('good', load) == (1, 'a@example.com')
+    clock.now += 59
+    assert cache.lookup('good', load) == (1, 'a@example.com')
+    assert load.calls == ['good']
+    clock.now += 2
+    cache.lookup('good', load)
+    assert load.calls == ['good', 'good']
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+
+def test_unknown_key_is_cached_for_the_negative_ttl(monkeypatch):
+    cache, clock = cache_with_clock(monkeypatch, ttl=60.0, negative_ttl=5.0)
+    load = Loader({})
+    assert cache.lookup('bad', load) is None
+    assert cache.lookup('bad', load) is None
+    assert load.calls == ['bad'] and cache.stats()['negative_hits'] == 1
+    clock.now += 6
+    cache.lookup('bad', load)
+    assert load.calls == ['bad', 'bad']
+
+
+def test_invalidate_forces_a_reload(monkeypatch):
+    cache, _ = cache_with_clock(monkeypatch)
+    load = Loader({})
+    cache.lookup('key', load)
+    # The key now exists, but the negative entry would hide it
+    load.users['key'] = (2, 'b@example.com')
+    assert cache.lookup('key', load) is None
+    cache.invalidate('key')
+    assert cache.lookup('key', load) == (2, 'b@example.com')
+
+
+def test_least_recently_used_key_is_evicted(monkeypatch):
+    cache, _ = cache_with_clock(monkeypatch, max_size=2)
+    load = Loader({'a': (1, 'a'), 'b': (2, 'b'), 'c': (3, 'c')})
+    cache.lookup('a', load)
+    cache.lookup('b', load)
+    cache.lookup('a', load)
+    cache.lookup('c', load)
+    assert cache.stats()['evictions'] == 1
+    cache.lookup('a', load)
+    cache.lookup('b', load)
+    assert load.calls == ['a', 'b', 'c', 'b']
+
+
+def test_async_lookup_awaits_the_loader_once(monkeypatch):
+    cache, _ = cache_with_clock(monkeypatch)
+    calls = []
+
+    async def load(api_key):
+        calls.append(api_key)
+        return (1, 'a@example.com')
+
+    async def scenario():
+        return [await cache.lookup_async('good', load) for _ in range(3)]
+
+    assert asyncio.run(scenario()) == [(1, 'a@example.com')] * 3
+    assert calls == ['good']
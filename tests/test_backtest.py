@@ -0,0 +1,82 @@
+import asyncio
+
+from backend.agents.arbitrage_agent import ArbitrageAgent
+from backend.agents.backtest import Backtester
+from backend.agents.market_stream import ReplayServer, synthetic_messages
+from backend.agents.opportunity_buffer import OpportunityBuffer
+from backend.agents.tick_store import TickRecorder, TickStore
+
+EXCHANGES = ['alpha', 'beta']
+SYMBOLS = ['BTC/USDT', 'ETH/USDT']
+ORIGIN = 1.7e12
+
+
+def session():
+    return synthetic_messages(EXCHANGES, SYMBOLS, 2000, interval_ms=1.0, seed=1)
+
+
+def record(path, messages):
+    with TickRecorder(str(path)) as recorder:
+        for message in messages:
+            recorder.record_book(dict(message, ts=ORIGIN + message['ts']))
+        recorder.record_scan({'BTC/USDT': {'alpha': {'bid': 99.0, 'ask': 99.1}, 'beta': {'bid': 101.0, 'ask': 101.1}}},
+                             ts=ORIGIN + 10000)
+    return TickStore(str(path))
+
+
+def agent():
+    replay = ArbitrageAgent('replay', exchanges={}, symbols=SYMBOLS, buffer=OpportunityBuffer())
+    replay.fee_overrides = {name: 0.0 for name in EXCHANGES}
+    replay.min_profit_pct = 0.0
+    return replay
+
+
+def signal(opp):
+    return opp['symbol'], opp['buy_exchange'], opp['sell_exchange'], opp['buy_price'], opp['sell_price']
+
+
+def test_recording_round_trips_the_feed(tmp_path):
+    messages = session()
+    store = record(tmp_path / 'ticks', messages)
+    replayed = list(store.messages())
+    assert len(replayed) == len(messages) + 1
+    for original, message in zip(messages, replayed):
+        assert message['type'] == original['type']
+        assert (message['exchange'], message['symbol']) == (original['exchange'], original['symbol'])
+        assert message['ts'] == ORIGIN + original['ts']
+        assert [list(level) for level in message['bids']] == original['bids']
+        assert [list(level) for level in message['asks']] == original['asks']
+    assert replayed[-1]['type'] == 'scan'
+
+
+def test_replaying_a_recording_gives_the_same_signals_every_time(tmp_path):
+    messages = session()
+    store = record(tmp_path / 'ticks', messages)
+    runs = [Backtester(store, agent=agent()) for _ in range(2)]
+    results = [run.run() for run in runs]
+    assert results[0]['opportunities'] > 0
+    assert results[0]['messages'] == results[1]['messages'] == len(messages) + 1
+    assert runs[0].opportunities == runs[1].opportunities
+    # Stamped with the recording's clock, so reruns agree to the millisecond
+    assert all(ORIGIN / 1000 <= opp['timestamp'] <= ORIGIN / 1000 + 10 for opp in runs[0].opportunities)
+    # The trailing scan went through evaluate(): alpha -> beta at 2%
+    assert signal(runs[0].opportunities[-1]) == ('BTC/USDT', 'alpha', 'beta', 99.1, 101.0)
+
+
+def test_backtest_matches_the_live_streaming_path(tmp_path):
+    messages = session()
+    backtest = Backtester(record(tmp_path / 'ticks', messages), agent=agent())
+    backtest.run()
+
+    async def stream():
+        live = agent()
+        found = []
+        live.report = found.append
+        async with ReplayServer(messages, speed=None) as server:
+            feed = await live.run_streaming(server.url, duration=5.0)
+        return found, feed
+
+    found, feed = asyncio.run(stream())
+    assert feed.messages == len(messages)
+    streamed = [signal(opp) for opp in backtest.opportunities if 'quantity' in opp]
+    assert [signal(opp) for opp in found] == streamed
@@ -0,0 +1,139 @@
+import asyncio
+import time
+
+import aiohttp
+
+from backend.agents.agent_runtime import AgentRuntime
+from backend.agents.apy_history import ApyHistory
+from backend.agents.defi_agent import DeFiYieldAgent
+from backend.agents.defi_protocols import build_adapters, fetch_all
+from backend.agents.opportunity_buffer import OpportunityBuffer
+from backend.http_cache import HttpCache
+from benchmarks.stub_defi import StubProtocolServer, aave_payload, compound_payload
+
+
+def payloads():
+    return {
+        'Aave': aave_payload({'USDC': 0.04, 'DAI': 0.03}),
+        'Compound': compound_payload({'USDC': 0.05, 'ETH': 0.01}),
+    }
+
+
+def agent(server, buffer=None, **options):
+    return DeFiYieldAgent('defi-test', buffer=buffer or OpportunityBuffer(), adapters=build_adapters(urls=server.urls()),
+                          http_cache=HttpCache(directory=None), history=ApyHistory(), **options)
+
+
+def test_protocol_that_times_out_only_loses_its_own_yields():
+    async def scenario():
+        async with StubProtocolServer(payloads(), latency={'Compound': 1.0}) as server:
+            adapters = build_adapters(urls=server.urls(), timeouts={'Compound': 0.2})
+            async with aiohttp.ClientSession() as session:
+                start = time.monotonic()
+                yields, statuses = await fetch_all(session, adapters)
+                return yields, statuses, time.monotonic() - start
+
+    yields, statuses, elapsed = asyncio.run(scenario())
+    assert sorted((y['protocol'], y['asset']) for y in yields) == [('Aave', 'DAI'), ('Aave', 'USDC')]
+    assert statuses['Aave'] == {'ok': True, 'count': 2, 'seconds': statuses['Aave']['seconds']}
+    assert not statuses['Compound']['ok'] and 'timed out' in statuses['Compound']['error']
+    # Bounded by the timeout, not by the slow protocol
+    assert elapsed < 0.8
+
+
+def test_agent_ranks_yields_and_publishes_only_what_changed():
+    async def scenario():
+        async with StubProtocolServer(payloads()) as server:
+            buffer = OpportunityBuffer()
+            async with agent(server, buffer) as defi:
+                top = await defi.find_best_yields()
+                first = defi.publish()
+                await defi.find_best_yields()
+                unchanged = defi.publish()
+                server.payloads['Aave'] = aave_payload({'USDC': 0.06, 'DAI': 0.03})
+                await defi.find_best_yields()
+                moved = defi.publish()
+                return top, first, unchanged, moved, defi.top.current(), buffer.latest(10)
+
+    top, first, unchanged, moved, after, records = asyncio.run(scenario())
+    assert [(y['protocol'], y['asset']) for y in top] == [
+        ('Compound', 'USDC'), ('Aave', 'USDC'), ('Aave', 'DAI'), ('Compound', 'ETH')]
+    assert (first, unchanged) == (4, 0)
+    # Compound USDC only changed rank; the record at its APY already exists
+    assert moved == 1
+    assert (after[0]['protocol'], after[0]['asset'], round(after[0]['apy'], 6)) == ('Aave', 'USDC', 6.0)
+    assert len(records) == 5 and all(r.kind == 'yield' for r in records)
+
+
+def test_failed_protocol_keeps_its_last_known_pools():
+    async def scenario():
+        async with StubProtocolServer(payloads()) as server:
+            async with agent(server) as defi:
+                await defi.find_best_yields()
+                server.fail.add('Compound')
+                top = await defi.find_best_yields()
+                return top, defi.last_scan
+
+    top, last_scan = asyncio.run(scenario())
+    assert not last_scan['Compound']['ok']
+    assert ('Compound', 'USDC') in [(y['protocol'], y['asset']) for y in top]
+
+
+def test_unchanged_payload_is_not_downloaded_again():
+    async def scenario():
+        async with StubProtocolServer(payloads()) as server:
+            async with agent(server) as defi:
+                await defi.find_best_yields()
+                sent = server.bytes_sent
+                await defi.find_best_yields()
+                return sent, server.bytes_sent, server.requests
+
+    sent, resent, requests = asyncio.run(scenario())
+    assert sent > 0 and resent == sent
+    assert requests == {'Aave': 2, 'Compound': 2}
+
+
+def test_runtime_agents_share_one_fetch_per_protocol():
+    async def scenario():
+        async with StubProtocolServer(payloads(), latency=0.05) as server:
+            buffer = OpportunityBuffer()
+            runtime = AgentRuntime(adapters=build_adapters(urls=server.urls()), buffer=buffer,
+                                   http_cache=HttpCache(directory=None), history=ApyHistory(),
+                                   tick=0.05, max_age=60.0, seed=1)
+            async with runtime:
+                agents = [runtime.spawn(f"defi-{i}", interval=0.2) for i in range(50)]
+                agents.append(runtime.spawn('aave-only', protocols=['Aave'], interval=0.2))
+                await asyncio.sleep(0.6)
+            return runtime.stats(), server.requests, agents, buffer
+
+    stats, requests, agents, buffer = asyncio.run(scenario())
+    assert requests == {'Aave': 1, 'Compound': 1}
+    assert stats['groups'] == 2 and stats['errors'] == 0
+    assert all(a.opportunities_found == 4 for a in agents[:-1])
+    assert agents[-1].opportunities_found == 2
+
+
+def test_runtime_logs_and_counts_a_failing_publish(caplog):
+    async def scenario():
+        async with StubProtocolServer(payloads()) as server:
+            runtime = AgentRuntime(adapters=build_adapters(urls=server.urls()), buffer=OpportunityBuffer(),
+                                   http_cache=HttpCache(directory=None), history=ApyHistory(),
+                                   tick=0.05, max_age=60.0, seed=1)
+            async with runtime:
+                broken = runtime.spawn('broken', interval=0.1)
+                healthy = runtime.spawn('healthy', interval=0.1)
+
+                def publish():
+                    raise RuntimeError("buffer gone")
+
+                broken.publish = publish
+                await asyncio.sleep(0.4)
+            return runtime.stats(), healthy
+
+    with caplog.at_level('ERROR', logger='backend.agents.agent_runtime'):
+        stats, healthy = asyncio.run(scenario())
+    assert stats['errors'] >= 1
+    assert healthy.opportunities_found == 4
+    failures = [r for r in caplog.records if r.getMessage() == "broken publish failed"]
+    assert len(failures) == stats['errors']
+    assert failures[0].exc_info[1].args == ("buffer gone",)
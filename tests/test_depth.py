@@ -0,0 +1,60 @@
+import pytest
+
+from backend.agents.depth import size_opportunity, walk_books
+from backend.agents.order_book import OrderBook
+
+ASKS = [[100.0, 1.0], [101.0, 1.0], [102.0, 5.0]]
+BIDS = [[105.0, 1.5], [103.0, 3.0]]
+
+
+def walk(asks=ASKS, bids=BIDS, **options):
+    return walk_books([p for p, _ in asks], [q for _, q in asks], [p for p, _ in bids], [q for _, q in bids], **options)
+
+
+def test_walks_every_profitable_level_at_their_vwap():
+    result = walk()
+    # Bids run out first: 4.5 units, asks taken at 100 x1, 101 x1, 102 x2.5
+    assert result['quantity'] == 4.5
+    assert result['buy_cost'] == pytest.approx(456.0)
+    assert result['sell_proceeds'] == pytest.approx(466.5)
+    assert result['buy_vwap'] == pytest.approx(456.0 / 4.5)
+    assert result['sell_vwap'] == pytest.approx(466.5 / 4.5)
+    assert result['net_profit'] == pytest.approx(10.5)
+    assert (result['buy_levels'], result['sell_levels']) == (3, 2)
+
+
+def test_fees_stop_the_walk_where_a_unit_no_longer_pays():
+    result = walk(buy_fee=0.01, sell_fee=0.01)
+    # 103 * 0.99 < 101 * 1.01: only the 105 bid is worth selling into
+    assert result['quantity'] == 1.5
+    assert result['fees'] == pytest.approx(150.5 * 0.01 + 157.5 * 0.01)
+    assert result['net_profit'] == pytest.approx(157.5 - 150.5 - 3.08)
+    assert result['net_profit_pct'] == pytest.approx(result['net_profit'] / (150.5 * 1.01) * 100)
+
+
+def test_withdrawal_is_charged_at_the_sell_vwap():
+    plain, charged = walk(), walk(withdrawal_fee=0.1)
+    assert charged['quantity'] == plain['quantity']
+    assert charged['withdrawal_cost'] == pytest.approx(0.1 * plain['sell_vwap'])
+    assert charged['net_profit'] == pytest.approx(plain['net_profit'] - charged['withdrawal_cost'])
+
+
+def test_max_qty_caps_the_size():
+    result = walk(max_qty=0.5)
+    assert result['quantity'] == 0.5
+    assert result['buy_cost'] == pytest.approx(50.0) and result['sell_proceeds'] == pytest.approx(52.5)
+
+
+def test_nothing_to_fill_is_none_not_an_error():
+    assert walk(max_qty=0) is None
+    assert walk(asks=[[106.0, 1.0]]) is None
+    assert walk(asks=[]) is None
+    assert walk(asks=[[100.0, 0.0]], bids=[[105.0, 0.0]]) is None
+
+
+def test_size_opportunity_reads_the_order_books():
+    buy, sell = OrderBook('cheap', 'BTC/USDT'), OrderBook('rich', 'BTC/USDT')
+    buy.apply_snapshot([[99.0, 1.0]], ASKS)
+    sell.apply_snapshot(BIDS, [[110.0, 1.0]])
+    assert size_opportunity(buy, sell)['quantity'] == 4.5
+    assert size_opportunity(buy, sell, depth=1)['quantity'] == 1.0
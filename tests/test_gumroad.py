@@ -0,0 +1,43 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from backend.gumroad_integration import GumroadIntegration
+
+PURCHASE = {'success': True, 'purchase': {'email': 'buyer@example.com', 'product_name': 'APEX', 'refunded': False}}
+
+
+class VerifyHandler(BaseHTTPRequestHandler):
+    posts = 0
+
+    def do_POST(self):
+        type(self).posts += 1
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = json.dumps(PURCHASE).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_license_checks_are_cached_in_memory_only(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    server = HTTPServer(('127.0.0.1', 0), VerifyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        gumroad = GumroadIntegration('apex-swarm')
+        gumroad.verify_url = f"http://127.0.0.1:{server.server_port}/v2/licenses/verify"
+        first = gumroad.verify_license('KEY-1')
+        second = gumroad.verify_license('KEY-1')
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert first == second and first['valid'] and first['email'] == 'buyer@example.com'
+    assert VerifyHandler.posts == 1
+    # Buyer details never touch the disk
+    assert gumroad.http_cache.directory is None
+    assert list(tmp_path.iterdir()) == []
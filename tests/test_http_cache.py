@@ -0,0 +1,49 @@
+import asyncio
+import os
+import threading
+
+import aiohttp
+
+from backend.http_cache import HttpCache
+from benchmarks.stub_defi import StubProtocolServer, aave_payload
+
+
+def test_async_disk_tier_runs_off_the_loop_and_survives_a_restart(tmp_path, monkeypatch):
+    disk_threads = []
+    load, write = HttpCache._load, HttpCache._write
+
+    def recording_load(self, key):
+        disk_threads.append(threading.get_ident())
+        return load(self, key)
+
+    def recording_write(self, *args):
+        disk_threads.append(threading.get_ident())
+        return write(self, *args)
+
+    monkeypatch.setattr(HttpCache, '_load', recording_load)
+    monkeypatch.setattr(HttpCache, '_write', recording_write)
+
+    async def scenario():
+        async with StubProtocolServer({'Aave': aave_payload({'USDC': 0.04})}, max_age=60) as server:
+            url = server.urls()['Aave']
+            async with aiohttp.ClientSession() as session:
+                first = await HttpCache(directory=str(tmp_path)).get(session, url)
+                # A new cache on the same directory: memory is empty, disk is warm
+                restarted = await HttpCache(directory=str(tmp_path)).get(session, url)
+            return first, restarted, server.requests['Aave'], threading.get_ident()
+
+    first, restarted, requests, loop_thread = asyncio.run(scenario())
+    assert first.cache_status == 'miss' and restarted.cache_status == 'hit'
+    assert restarted.body == first.body
+    assert requests == 1
+    # load (miss), write, load (hit): all in the executor
+    assert len(disk_threads) == 3 and loop_thread not in disk_threads
+
+
+def test_clear_removes_only_cache_files(tmp_path):
+    cache = HttpCache(directory=str(tmp_path))
+    key = HttpCache._key('GET', 'http://example.test/a', None, None)
+    for name in (key + '.json', key + '.body', key + '.body.12.34.tmp', 'notes.txt', 'config.json'):
+        (tmp_path / name).write_text('x')
+    cache.clear()
+    assert sorted(os.listdir(tmp_path)) == ['config.json', 'notes.txt']
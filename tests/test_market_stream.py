@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from backend.agents.arbitrage_agent import ArbitrageAgent
+from backend.agents.market_stream import BookFeed, ccxt_pro_messages
+from backend.agents.opportunity_buffer import OpportunityBuffer
+
+
+class FakeProClient:
+    """watch_order_book() walks a script of books (or exceptions) per symbol, then blocks"""
+
+    def __init__(self, scripts):
+        self.scripts = {symbol: list(script) for symbol, script in scripts.items()}
+        self.calls = 0
+
+    async def watch_order_book(self, symbol, limit=None):
+        self.calls += 1
+        script = self.scripts[symbol]
+        if not script:
+            await asyncio.Event().wait()
+        step = script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        await asyncio.sleep(0)
+        return step
+
+
+def book(bids, asks, ts=1):
+    return {'bids': bids, 'asks': asks, 'timestamp': ts}
+
+
+async def take(source, n, timeout=2.0):
+    messages = []
+    async for message in source:
+        messages.append(message)
+        if len(messages) == n:
+            break
+    return messages
+
+
+def test_messages_are_a_snapshot_then_only_the_changed_levels():
+    client = FakeProClient({'BTC/USDT': [
+        book([[100, 1], [99, 2]], [[101, 1]]),
+        book([[100, 1], [99, 3]], [[101, 1]]),
+        book([[100, 1]], [[101, 1], [102, 5]]),
+    ]})
+    messages = asyncio.run(asyncio.wait_for(take(ccxt_pro_messages(client, 'binance', ['BTC/USDT']), 3), 2.0))
+    assert messages[0]['type'] == 'snapshot'
+    assert messages[1] == {'type': 'update', 'exchange': 'binance', 'symbol': 'BTC/USDT', 'ts': 1,
+                           'bids': [[99.0, 3.0]], 'asks': []}
+    assert messages[2]['bids'] == [[99.0, 0.0]] and messages[2]['asks'] == [[102.0, 5.0]]
+
+    feed = BookFeed(lambda book, received: None)
+    for message in messages:
+        feed.handle(message, 0.0)
+    assert feed.books[('binance', 'BTC/USDT')].top() == (100.0, 101.0)
+
+
+def test_failed_watch_reconnects_with_a_fresh_snapshot():
+    client = FakeProClient({'BTC/USDT': [
+        book([[100, 1]], [[101, 1]]),
+        ConnectionError("socket closed"),
+        book([[100, 2]], [[101, 1]]),
+    ]})
+    source = ccxt_pro_messages(client, 'binance', ['BTC/USDT'], backoff=0.01)
+    messages = asyncio.run(asyncio.wait_for(take(source, 2), 2.0))
+    assert [m['type'] for m in messages] == ['snapshot', 'snapshot']
+    assert messages[1]['bids'] == [[100.0, 2.0]]
+
+
+def test_watch_that_keeps_failing_raises_instead_of_hanging():
+    client = FakeProClient({'NOPE/USDT': [ValueError("unknown symbol")] * 10})
+    source = ccxt_pro_messages(client, 'binance', ['NOPE/USDT'], retries=2, backoff=0.01)
+    with pytest.raises(ValueError):
+        asyncio.run(asyncio.wait_for(take(source, 1), 2.0))
+    assert client.calls == 3
+
+
+def test_run_streaming_evaluates_live_sources():
+    cheap = FakeProClient({'BTC/USDT': [book([[99.0, 5]], [[100.0, 5]])]})
+    rich = FakeProClient({'BTC/USDT': [book([[103.0, 5]], [[104.0, 5]])]})
+    agent = ArbitrageAgent('stream-test', exchanges={}, symbols=['BTC/USDT'], buffer=OpportunityBuffer())
+    agent.fee_overrides = {'cheap': 0.001, 'rich': 0.001}
+    sources = [ccxt_pro_messages(cheap, 'cheap', ['BTC/USDT']), ccxt_pro_messages(rich, 'rich', ['BTC/USDT'])]
+    feed = asyncio.run(agent.run_streaming(sources, duration=0.3))
+    assert feed.messages == 2
+    found = agent.buffer.latest(10)
+    assert [(r.data['buy_exchange'], r.data['sell_exchange']) for r in found] == [('cheap', 'rich')]
@@ -0,0 +1,124 @@
+import asyncio
+import time
+
+from backend.agents.market_cache import LazyExchange
+from backend.agents.market_hub import MarketDataHub
+from backend.agents.scan_scheduler import ScanScheduler
+from benchmarks.stub_exchange import StubExchangeServer, stub_clients
+
+PRICES = {
+    'binance': {'BTC/USDT': {'bid': 100.0, 'ask': 100.1, 'last': 100.05}},
+    'kraken': {'BTC/USDT': {'bid': 101.0, 'ask': 101.1, 'last': 101.05}},
+}
+
+
+def test_run_cycle_returns_fresh_quotes_then_waits_out_the_cycle():
+    async def scenario():
+        async with StubExchangeServer(PRICES) as server:
+            clients = stub_clients(server.url, list(PRICES))
+            scheduler = ScanScheduler(clients, ['BTC/USDT'], cycle_seconds=1.0, rate_limits={'binance': 50, 'kraken': 50})
+            start = time.monotonic()
+            snapshot = await scheduler.run_cycle()
+            returned = time.monotonic() - start
+            await scheduler.wait_next_cycle()
+            cycle = time.monotonic() - start
+            await asyncio.gather(*(client.close() for client in clients.values()))
+            return snapshot, returned, cycle
+
+    snapshot, returned, cycle = asyncio.run(scenario())
+    assert returned < 0.5
+    assert {q['bid'] for q in snapshot['BTC/USDT'].values()} == {100.0, 101.0}
+    assert all(q['age'] < 0.5 for q in snapshot['BTC/USDT'].values())
+    assert 0.9 <= cycle < 1.5
+
+
+def test_hub_publishes_each_cycle_while_fresh():
+    async def scenario():
+        async with StubExchangeServer(PRICES) as server:
+            clients = stub_clients(server.url, list(PRICES))
+            hub = MarketDataHub(exchanges=clients, cycle_seconds=0.5, rate_limits={'binance': 50, 'kraken': 50})
+            await hub.open()
+            subscription = hub.subscribe(['BTC/USDT'])
+            snapshots = [await asyncio.wait_for(subscription.get(), 2.0) for _ in range(3)]
+            hub.unsubscribe(subscription)
+            await hub.close()
+            await asyncio.gather(*(client.close() for client in clients.values()))
+            return snapshots
+
+    snapshots = asyncio.run(scenario())
+    for snapshot in snapshots:
+        assert set(snapshot['BTC/USDT']) == {'binance', 'kraken'}
+        assert all(q['age'] < 0.3 for q in snapshot['BTC/USDT'].values())
+
+
+def test_hub_keeps_polling_after_a_failed_cycle(monkeypatch):
+    run_cycle = ScanScheduler.run_cycle
+    calls = []
+
+    async def flaky_cycle(self):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("cycle blew up")
+        return await run_cycle(self)
+
+    monkeypatch.setattr(ScanScheduler, 'run_cycle', flaky_cycle)
+
+    async def scenario():
+        async with StubExchangeServer(PRICES) as server:
+            clients = stub_clients(server.url, list(PRICES))
+            hub = MarketDataHub(exchanges=clients, cycle_seconds=0.2, rate_limits={'binance': 50, 'kraken': 50})
+            subscription = hub.subscribe(['BTC/USDT'])
+            snapshots = [await asyncio.wait_for(subscription.get(), 2.0) for _ in range(2)]
+            stats = hub.stats()
+            hub.unsubscribe(subscription)
+            await hub.close()
+            await asyncio.gather(*(client.close() for client in clients.values()))
+            return snapshots, stats
+
+    snapshots, stats = asyncio.run(scenario())
+    assert stats['poll_errors'] == 1
+    assert all(set(snapshot['BTC/USDT']) == {'binance', 'kraken'} for snapshot in snapshots)
+
+
+def test_hub_that_cannot_open_fails_its_subscribers(monkeypatch):
+    async def broken_open(self):
+        raise RuntimeError("no exchanges")
+
+    monkeypatch.setattr(MarketDataHub, 'open', broken_open)
+
+    async def scenario():
+        hub = MarketDataHub(exchanges={}, cycle_seconds=0.2)
+        subscription = hub.subscribe(['BTC/USDT'])
+        errors = []
+        for _ in range(2):
+            try:
+                await asyncio.wait_for(subscription.get(), 2.0)
+            except RuntimeError as e:
+                errors.append(str(e))
+        return errors, hub._task
+
+    errors, task = asyncio.run(scenario())
+    assert errors == ["no exchanges", "no exchanges"]
+    assert task is None
+
+
+def test_clients_are_built_only_when_a_scan_touches_them():
+    async def scenario():
+        async with StubExchangeServer(PRICES) as server:
+            stubs = stub_clients(server.url, list(PRICES))
+            clients = {name: LazyExchange(name, lambda stub=stub: stub) for name, stub in stubs.items()}
+            scheduler = ScanScheduler(clients, [])
+            built_at_start = {name: client.built for name, client in clients.items()}
+            await scheduler.run_cycle()
+            built_after_empty_cycle = {name: client.built for name, client in clients.items()}
+            book = await scheduler.fetch_order_book('kraken', 'BTC/USDT')
+            built = {name: client.built for name, client in clients.items()}
+            await asyncio.gather(*(client.close() for client in stubs.values()))
+            return built_at_start, built_after_empty_cycle, built, book, set(scheduler.buckets)
+
+    built_at_start, built_after_empty_cycle, built, book, buckets = asyncio.run(scenario())
+    assert not any(built_at_start.values())
+    assert not any(built_after_empty_cycle.values())
+    assert built == {'binance': False, 'kraken': True}
+    assert buckets == {'kraken'}
+    assert book is not None
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+from starlette.requests import Request
+
+import main
+from events import TaskEventBus
+
+
+def stream(api, count, last_event_id=None, header=None, during=None):
+    """
+    The first `count` SSE frames of /api/v1/tasks/stream, as (event, id, data)
+    The handler is driven directly: the test client buffers a response
+    until it ends, and this one never does.
+    """
+    headers = [(b'x-api-key', api.headers['x-api-key'].encode())]
+    if header is not None:
+        headers.append((b'last-event-id', str(header).encode()))
+
+    async def scenario():
+        request = Request({'type': 'http', 'method': 'GET', 'path': '/api/v1/tasks/stream', 'headers': headers, 'query_string': b''})
+        response = await main.stream_tasks(request, last_event_id=last_event_id)
+        body = response.body_iterator
+        frames = []
+        try:
+            while len(frames) < count:
+                chunk = await asyncio.wait_for(body.__anext__(), 2.0)
+                fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n') if ': ' in line)
+                if 'event' in fields:
+                    frames.append((fields['event'], int(fields['id']) if 'id' in fields else None, fields['data']))
+                elif during is not None:
+                    # Past the retry hint: the subscription is live
+                    during()
+        finally:
+            await body.aclose()
+        return frames
+
+    return asyncio.run(scenario())
+
+
+def publish(bus, user_id, task_id, status):
+    return bus.publish(user_id, "task", {"id": task_id, "agent_id": "agent", "status": status, "result": None}).id
+
+
+def user_id(pool):
+    with pool.connection() as conn:
+        return conn.execute("SELECT id FROM users").fetchone()[0]
+
+
+def test_reconnect_replays_only_events_after_last_event_id(api, pool, monkeypatch):
+    bus = TaskEventBus()
+    monkeypatch.setattr(main, 'task_events', bus)
+    me = user_id(pool)
+    seen = publish(bus, me, 1, 'queued')
+    publish(bus, me + 1, 9, 'queued')  # another user's task is never sent
+    later = [publish(bus, me, 1, 'running'), publish(bus, me, 1, 'completed')]
+    frames = stream(api, 2, header=seen)
+    assert [(event, event_id) for event, event_id, _ in frames] == [('task', later[0]), ('task', later[1])]
+    assert [json.loads(data)['status'] for _, _, data in frames] == ['running', 'completed']
+
+
+def test_id_older_than_the_history_gets_a_reset_then_what_is_left(api, pool, monkeypatch):
+    bus = TaskEventBus(history=2)
+    monkeypatch.setattr(main, 'task_events', bus)
+    me = user_id(pool)
+    first = publish(bus, me, 1, 'queued')
+    kept = [publish(bus, me, 1, 'running'), publish(bus, me, 1, 'completed'), publish(bus, me, 2, 'queued')][1:]
+    frames = stream(api, 3, last_event_id=first)
+    assert frames[0][0] == 'reset'
+    assert [event_id for _, event_id, _ in frames[1:]] == kept
+
+
+def test_resume_from_the_last_id_sends_nothing_old(api, pool, monkeypatch):
+    bus = TaskEventBus()
+    monkeypatch.setattr(main, 'task_events', bus)
+    me = user_id(pool)
+    last = [publish(bus, me, 1, 'queued'), publish(bus, me, 1, 'running')][-1]
+    # Published after connecting: the first frame must be this, not a replay
+    frames = stream(api, 1, header=last, during=lambda: publish(bus, me, 1, 'completed'))
+    assert json.loads(frames[0][2])['status'] == 'completed' and frames[0][1] > last
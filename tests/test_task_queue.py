@@ -0,0 +1,136 @@
+import sqlite3
+import threading
+import time
+
+from task_queue import TaskQueue
+
+
+def insert_task(pool, status, lease_until=None, attempts=0):
+    with pool.transaction() as conn:
+        return conn.execute(
+            "INSERT INTO tasks (agent_id, user_id, task_description, status, lease_until, attempts, enqueued_at) "
+            "VALUES ('agent', 1, 'work', ?, ?, ?, ?)", (status, lease_until, attempts, time.time())).lastrowid
+
+
+def status_of(pool, task_id):
+    with pool.connection() as conn:
+        return conn.execute("SELECT status FROM tasks WHERE id = ?", (task_id,)).fetchone()[0]
+
+
+def wait_for(predicate, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return predicate()
+
+
+def test_queued_task_runs_and_completes(pool):
+    task_id = insert_task(pool, 'queued')
+    queue = TaskQueue(lambda task: {"ok": task['id']}, workers=2, poll_interval=0.05)
+    queue.start()
+    try:
+        assert wait_for(lambda: status_of(pool, task_id) == 'completed')
+    finally:
+        queue.stop()
+
+
+def test_expired_lease_is_requeued_at_startup(pool):
+    task_id = insert_task(pool, 'running', lease_until=time.time() - 1, attempts=1)
+    queue = TaskQueue(lambda task: {}, workers=1, poll_interval=0.05)
+    assert queue.recover() == 1
+    assert status_of(pool, task_id) == 'queued'
+
+
+def test_lease_still_live_at_restart_is_reaped_once_it_lapses(pool):
+    # Restarted inside the lease: startup leaves it, the heartbeat must not
+    task_id = insert_task(pool, 'running', lease_until=time.time() + 0.3, attempts=1)
+    queue = TaskQueue(lambda task: {}, workers=1, heartbeat_interval=0.1, poll_interval=0.05)
+    queue.start()
+    try:
+        assert wait_for(lambda: status_of(pool, task_id) == 'completed')
+        assert queue.stats()['recovered'] == 1
+    finally:
+        queue.stop()
+
+
+def test_heartbeat_does_not_requeue_tasks_it_is_running(pool):
+    task_id = insert_task(pool, 'queued')
+    release = threading.Event()
+    runs = []
+
+    def handler(task):
+        runs.append(task['id'])
+        release.wait(2.0)
+        return {}
+
+    # Lease shorter than the task: only the heartbeat keeps it alive
+    queue = TaskQueue(handler, workers=2, lease_seconds=0.2, heartbeat_interval=0.05, poll_interval=0.05)
+    queue.start()
+    try:
+        time.sleep(0.6)
+        release.set()
+        assert wait_for(lambda: status_of(pool, task_id) == 'completed')
+        assert runs == [task_id]
+    finally:
+        queue.stop()
+
+
+def test_task_out_of_attempts_is_failed(pool):
+    task_id = insert_task(pool, 'running', lease_until=time.time() - 1, attempts=3)
+    queue = TaskQueue(lambda task: {}, max_attempts=3)
+    queue.recover()
+    assert status_of(pool, task_id) == 'failed'
+
+
+def test_worker_survives_a_failed_claim(pool):
+    task_id = insert_task(pool, 'queued')
+    queue = TaskQueue(lambda task: {}, workers=1, poll_interval=0.05)
+    claim = queue._claim
+    failures = []
+
+    def flaky_claim():
+        if not failures:
+            failures.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        return claim()
+
+    queue._claim = flaky_claim
+    queue.start()
+    try:
+        assert wait_for(lambda: status_of(pool, task_id) == 'completed')
+        assert failures == [1]
+    finally:
+        queue.stop()
+
+
+def test_heartbeat_survives_a_failed_lease_renewal(pool):
+    task_id = insert_task(pool, 'queued')
+    release = threading.Event()
+    runs = []
+
+    def handler(task):
+        runs.append(task['id'])
+        release.wait(2.0)
+        return {}
+
+    queue = TaskQueue(handler, workers=2, lease_seconds=0.3, heartbeat_interval=0.05, poll_interval=0.05)
+    renew = queue._renew_leases
+    failures = []
+
+    def flaky_renew(ids):
+        if not failures:
+            failures.append(ids)
+            raise sqlite3.OperationalError("database is locked")
+        renew(ids)
+
+    queue._renew_leases = flaky_renew
+    queue.start()
+    try:
+        # Well past the lease: only renewals after the failure keep the task ours
+        time.sleep(0.8)
+        release.set()
+        assert wait_for(lambda: status_of(pool, task_id) == 'completed')
+        assert failures == [[task_id]]
+        assert runs == [task_id]
+    finally:
+        queue.stop()
@@ -0,0 +1,70 @@
+import main
+
+
+def add_tasks(pool, created_at):
+    """One task per created_at value, in order; returns their ids"""
+    with pool.transaction() as conn:
+        user_id = conn.execute("SELECT id FROM users").fetchone()[0]
+        return [conn.execute("INSERT INTO tasks (agent_id, user_id, task_description, status, result_data, created_at) "
+                             "VALUES ('agent', ?, ?, 'completed', '{\"n\": 1}', ?)", (user_id, f"task {i}", ts)).lastrowid
+                for i, ts in enumerate(created_at)]
+
+
+def page_through(api, limit, **params):
+    ids, cursor, pages = [], None, 0
+    while True:
+        query = dict(params, limit=limit, **({"after": cursor} if cursor else {}))
+        body = api.get("/api/v1/tasks", params=query).json()
+        ids.extend(t["id"] for t in body["tasks"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return ids, pages
+
+
+def test_pages_cover_every_task_once_across_created_at_ties(api, pool):
+    # Three tasks share each timestamp, so pages split inside a tie
+    ids = add_tasks(pool, ["2024-01-01 00:00:0%d" % (i // 3) for i in range(9)])
+    seen, pages = page_through(api, 2)
+    assert pages == 5
+    assert seen == sorted(ids, reverse=True)
+
+
+def test_last_full_page_has_no_cursor(api, pool):
+    add_tasks(pool, ["2024-01-01 00:00:00"] * 4)
+    body = api.get("/api/v1/tasks", params={"limit": 4}).json()
+    assert len(body["tasks"]) == 4 and body["next_cursor"] is None
+
+
+def test_status_filter_pages_within_the_status(api, pool):
+    ids = add_tasks(pool, ["2024-01-01 00:00:00"] * 5)
+    with pool.transaction() as conn:
+        conn.execute("UPDATE tasks SET status = 'failed' WHERE id IN (?, ?)", (ids[1], ids[3]))
+    seen, _ = page_through(api, 1, status="failed")
+    assert seen == [ids[3], ids[1]]
+
+
+def test_bad_cursor_is_a_400(api, pool):
+    assert api.get("/api/v1/tasks", params={"after": "not-a-cursor"}).status_code == 400
+
+
+def test_fields_projects_the_tasks_in_the_order_asked(api, pool):
+    add_tasks(pool, ["2024-01-01 00:00:00"])
+    task = api.get("/api/v1/tasks", params={"fields": "status,id"}).json()["tasks"][0]
+    assert list(task) == ["status", "id"]
+    full = api.get("/api/v1/tasks").json()["tasks"][0]
+    assert list(full) == ["id", "agent_id", "description", "status", "result"]
+    # The stored JSON is passed through as JSON, not as a string
+    assert full["result"] == {"n": 1} and full["description"] == "task 0"
+
+
+def test_pending_completion_overrides_the_stored_row(api, pool, monkeypatch):
+    task_id = add_tasks(pool, ["2024-01-01 00:00:00"])[0]
+    monkeypatch.setattr(main.completions, 'pending', lambda ids: {task_id: ('failed', '{"error": "boom"}')})
+    task = api.get("/api/v1/tasks", params={"fields": "status,result"}).json()["tasks"][0]
+    assert task == {"status": "failed", "result": {"error": "boom"}}
+
+
+def test_empty_or_unknown_fields_are_a_400(api, pool):
+    for fields in (",", " , ", "id,secret"):
+        assert api.get("/api/v1/tasks", params={"fields": fields}).status_code == 400
@@ -0,0 +1,70 @@
+import pytest
+
+from backend.agents.triangular import CurrencyGraph
+
+
+def mispriced_triangle(fees=None):
+    graph = CurrencyGraph(fees)
+    graph.load_tickers('x', {
+        'BTC/USDT': {'bid': 100.0, 'ask': 100.01},
+        'ETH/USDT': {'bid': 10.0, 'ask': 10.001},
+        # ETH is cheap in BTC: BTC -> ETH -> USDT -> BTC pays
+        'ETH/BTC': {'bid': 0.0949, 'ask': 0.095},
+    })
+    return graph
+
+
+def rotations(cycle):
+    return [cycle[i:] + cycle[:i] for i in range(len(cycle))]
+
+
+def test_only_the_profitable_direction_of_a_triangle_is_returned():
+    graph = mispriced_triangle()
+    assert graph.triangle_count == 2
+    found = graph.triangles()
+    assert len(found) == 1
+    cycle = found[0]
+    assert cycle['path'] == ['BTC', 'ETH', 'USDT', 'BTC']
+    assert cycle['markets'] == ['ETH/BTC', 'ETH/USDT', 'BTC/USDT']
+    assert cycle['sides'] == ['buy', 'sell', 'buy']
+    assert cycle['profit_pct'] == pytest.approx((10.0 / (0.095 * 100.01) - 1) * 100)
+
+
+def test_fees_and_thresholds_filter_triangles():
+    assert mispriced_triangle({'x': 0.02}).triangles() == []
+    assert mispriced_triangle().triangles(min_profit_pct=6.0) == []
+
+
+def test_quote_update_rescores_the_triangle():
+    graph = mispriced_triangle()
+    assert graph.triangles()
+    graph.update('x', 'ETH/BTC', 0.09999, 0.10001)
+    assert graph.triangles() == []
+    assert graph.negative_cycle() is None
+
+
+def four_currency_ring(edge_ask):
+    """A -> B -> C -> D -> A through four markets, so it contains no triangle"""
+    graph = CurrencyGraph()
+    graph.load_tickers('x', {
+        'B/A': {'bid': edge_ask - 0.001, 'ask': edge_ask},
+        'C/B': {'bid': 0.999, 'ask': 1.001},
+        'D/C': {'bid': 0.999, 'ask': 1.001},
+        'A/D': {'bid': 0.999, 'ask': 1.001},
+    })
+    return graph
+
+
+def test_bellman_ford_finds_a_cycle_longer_than_a_triangle():
+    graph = four_currency_ring(0.9)
+    assert graph.triangle_count == 0 and graph.triangles() == []
+    cycle = graph.negative_cycle()
+    assert cycle is not None
+    assert cycle['markets'] in rotations(['B/A', 'C/B', 'D/C', 'A/D'])
+    assert set(cycle['sides']) == {'buy'}
+    assert cycle['path'][0] == cycle['path'][-1]
+    assert cycle['profit_pct'] == pytest.approx((1 / 0.9 / 1.001 ** 3 - 1) * 100)
+
+
+def test_bellman_ford_finds_nothing_in_a_fair_ring():
+    assert four_currency_ring(1.001).negative_cycle() is None
@@ -0,0 +1,56 @@
+import time
+
+from task_queue import FINISH_SQL
+from write_behind import WriteBehindCommitter
+
+
+def insert_task(pool, status='running'):
+    with pool.transaction() as conn:
+        return conn.execute("INSERT INTO tasks (agent_id, user_id, task_description, status) VALUES ('a', 1, 't', ?)",
+                            (status,)).lastrowid
+
+
+def status_of(pool, task_id):
+    with pool.connection() as conn:
+        return conn.execute("SELECT status, result_data FROM tasks WHERE id = ?", (task_id,)).fetchone()
+
+
+def test_single_submit_is_committed_within_max_delay(pool):
+    task_id = insert_task(pool)
+    committer = WriteBehindCommitter(FINISH_SQL, batch_size=256, max_delay=0.05)
+    committer.start()
+    try:
+        committer.submit(task_id, ('completed', '{}', task_id))
+        deadline = time.monotonic() + 1.0
+        while committer.stats()['pending'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert committer.stats()['pending'] == 0
+        assert committer.stats()['batches'] == 1
+        assert status_of(pool, task_id) == ('completed', '{}')
+    finally:
+        committer.close()
+
+
+def test_full_batch_is_committed_at_once(pool):
+    ids = [insert_task(pool) for _ in range(8)]
+    committer = WriteBehindCommitter(FINISH_SQL, batch_size=8, max_delay=60.0)
+    committer.start()
+    try:
+        for task_id in ids:
+            committer.submit(task_id, ('completed', None, task_id))
+        deadline = time.monotonic() + 1.0
+        while committer.stats()['pending'] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert committer.stats()['rows_written'] == 8
+    finally:
+        committer.close()
+
+
+def test_pending_rows_are_visible_and_newest_wins(pool):
+    task_id = insert_task(pool)
+    committer = WriteBehindCommitter(FINISH_SQL)
+    committer.submit(task_id, ('running', None, task_id))
+    committer.submit(task_id, ('completed', 'done', task_id))
+    assert committer.pending([task_id, 999]) == {task_id: ('completed', 'done', task_id)}
+    committer.close()
+    assert status_of(pool, task_id) == ('completed', 'done')
@@ -0,0 +1,121 @@
+"""
+WRITE-BEHIND COMMITTER
+Collects row updates in memory and commits them in batched transactions
+
+One executemany() per flush replaces one connection + commit + fsync per
+update. Pending rows stay readable through pending() until they are
+committed, and close() flushes whatever is left. Updates still in memory
+when the process dies are lost, so callers must be able to redo them
+(the task queue re-runs tasks whose lease expired).
+"""
+import logging
+import threading
+import time
+
+import db
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindCommitter:
+    """
+    Batches parameter tuples for a single UPDATE statement
+    Flushes once `batch_size` rows are waiting or the oldest has waited
+    `max_delay` seconds. Rows are keyed so a newer update to the same key
+    replaces an older one that has not been written yet.
+    """
+
+    def __init__(self, sql: str, batch_size: int = 256, max_delay: float = 0.05):
+        self.sql = sql
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self._pending = {}
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = None
+
+        self.batches = 0
+        self.rows_written = 0
+        self.errors = 0
+
+    def start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float = 5.0):
+        """Stop the flush thread and commit everything still pending"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def submit(self, key, params: tuple):
+        with self._cond:
+            first = not self._pending
+            if first:
+                self._oldest = time.monotonic()
+            self._pending[key] = params
+            # The flush thread waits without a deadline while nothing is
+            # pending, so the first row has to wake it to start the clock
+            if first or len(self._pending) >= self.batch_size:
+                self._cond.notify()
+
+    def pending(self, keys):
+        """{key: params} for the given keys that are not committed yet"""
+        with self._cond:
+            return {k: self._pending[k] for k in keys if k in self._pending}
+
+    def flush(self):
+        with self._cond:
+            batch = dict(self._pending)
+        if not batch:
+            return 0
+        try:
+            with db.pool.transaction() as conn:
+                conn.executemany(self.sql, list(batch.values()))
+        except Exception:
+            self.errors += 1
+            logger.exception("Write-behind flush of %d rows failed, will retry", len(batch))
+            return 0
+        with self._cond:
+            for key, params in batch.items():
+                # Leave the key if it was updated again while we were writing
+                if self._pending.get(key) is params:
+                    del self._pending[key]
+            self._oldest = time.monotonic() if self._pending else None
+        self.batches += 1
+        self.rows_written += len(batch)
+        return len(batch)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    if len(self._pending) >= self.batch_size:
+                        break
+                    if self._oldest is None:
+                        self._cond.wait()
+                        continue
+                    remaining = self._oldest + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._stopping:
+                    return
+            if not self.flush():
+                # Nothing written (error or raced empty); back off briefly
+                time.sleep(self.max_delay)
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'batches': self.batches,
+            'rows_written': self.rows_written,
+            'avg_batch_size': self.rows_written / self.batches if self.batches else 0.0,
+            'errors': self.errors,
+        }